@@ -10,10 +10,14 @@ import uuid
 import numpy as np
 import matplotlib.pyplot as plt
 import rasterio
-from services.classification import load_model_wrapper , predict
-from model.image_processing import preprocess_image, plot_ndvi_overlay
+from model.backends import load_backend, resolve_backend, predict_batch
+from model.image_processing import preprocess_image
+from model.visualization import plot_ndvi_tiles
+from model.indices import pseudo_ndvi, to_model_channels
 from streamlit_folium import folium_static
 import cv2
+from config import (INFERENCE_BACKEND, INFERENCE_BACKEND_PATH, MODEL_VARIANT, MODEL_VARIANTS_DIR, INFERENCE_THREADS,
+                    INFERENCE_INTER_OP_THREADS, TFLITE_SHARED_WEIGHTS)
 
 # API endpoint configuration
 API_URL = "http://localhost:8000"  
@@ -55,6 +59,7 @@ def clear_authentication():
     st.session_state.current_page = "login"
     st.session_state.images = []
     st.session_state.selected_image = None
+    st.session_state.previews = {}
     if st.session_state.video_capture is not None:
         st.session_state.video_capture.release()
         st.session_state.video_capture = None
@@ -109,6 +114,29 @@ def logout_user(access_token: str) -> bool:
 def get_auth_headers():
     return {"Authorization": f"Bearer {st.session_state.access_token}"}
 
+def refresh_access_token() -> bool:
+    """Swap the stored refresh token for a new access token; False when the session can't be renewed."""
+    refresh_token = st.session_state.get("refresh_token")
+    if not refresh_token:
+        return False
+    try:
+        response = requests.post(f"{API_URL}/auth/refresh", params={"refresh_token": refresh_token})
+    except Exception:
+        return False
+    if response.status_code != 200:
+        return False
+    tokens = response.json()
+    st.session_state.access_token = tokens["access_token"]
+    st.session_state.refresh_token = tokens["refresh_token"]
+    return True
+
+def api_request(method, url, headers=None, **kwargs):
+    """An authenticated API call; on 401 (access tokens expire after an hour) refresh once and retry."""
+    response = requests.request(method, url, headers={**get_auth_headers(), **(headers or {})}, **kwargs)
+    if response.status_code == 401 and refresh_access_token():
+        response = requests.request(method, url, headers={**get_auth_headers(), **(headers or {})}, **kwargs)
+    return response
+
 def upload_image(file, metadata=None):
     try:
         files = {"file": (file.name, file.getvalue(), file.type)}
@@ -116,9 +144,9 @@ def upload_image(file, metadata=None):
         if metadata:
             data["metadata"] = json.dumps(metadata)
         
-        response = requests.post(
+        response = api_request(
+            "POST",
             f"{API_URL}/images/?user_id={st.session_state.user_id}",
-            headers=get_auth_headers(),
             files=files,
             data=data
         )
@@ -134,25 +162,34 @@ def upload_image(file, metadata=None):
 
 def get_all_images():
     try:
-        response = requests.get(
-            f"{API_URL}/images/?user_id={st.session_state.user_id}",
-            headers=get_auth_headers()
-        )
-        
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.error(f"Failed to retrieve images: {response.json().get('detail', 'Unknown error')}")
-            return []
+        # The API returns a page at a time; follow X-Next-Cursor to the end
+        images = []
+        # Each image comes with its latest classification, so the page needs no per-image lookups
+        params = {"user_id": st.session_state.user_id, "limit": 500, "with_classification": "true"}
+        while True:
+            response = api_request(
+                "GET",
+                f"{API_URL}/images/",
+                params=params
+            )
+            
+            if response.status_code != 200:
+                st.error(f"Failed to retrieve images: {response.json().get('detail', 'Unknown error')}")
+                return images
+            images.extend(response.json())
+            next_cursor = response.headers.get("X-Next-Cursor")
+            if not next_cursor:
+                return images
+            params["cursor"] = next_cursor
     except Exception as e:
         st.error(f"Error retrieving images: {str(e)}")
         return []
 
 def get_image_by_id(image_id):
     try:
-        response = requests.get(
-            f"{API_URL}/images/{image_id}?user_id={st.session_state.user_id}",
-            headers=get_auth_headers()
+        response = api_request(
+            "GET",
+            f"{API_URL}/images/{image_id}?user_id={st.session_state.user_id}"
         )
         
         if response.status_code == 200:
@@ -166,9 +203,9 @@ def get_image_by_id(image_id):
 
 def delete_image(image_id):
     try:
-        response = requests.delete(
-            f"{API_URL}/images/{image_id}?user_id={st.session_state.user_id}",
-            headers=get_auth_headers()
+        response = api_request(
+            "DELETE",
+            f"{API_URL}/images/{image_id}?user_id={st.session_state.user_id}"
         )
         
         if response.status_code == 200:
@@ -182,9 +219,9 @@ def delete_image(image_id):
 
 def classify_image(image_id):
     try:
-        response = requests.post(
-            f"{API_URL}/classifications/{image_id}?user_id={st.session_state.user_id}",
-            headers=get_auth_headers()
+        response = api_request(
+            "POST",
+            f"{API_URL}/classifications/{image_id}?user_id={st.session_state.user_id}"
         )
         
         if response.status_code == 200:
@@ -196,11 +233,55 @@ def classify_image(image_id):
         st.error(f"Error classifying image: {str(e)}")
         return None
 
-def get_classification_result(image_id):
+def classify_images_batch(image_ids):
+    """Classify several images in one request; returns the per-image NDJSON status lines."""
     try:
-        response = requests.get(
-            f"{API_URL}/classifications/{image_id}/result?user_id={st.session_state.user_id}",
-            headers=get_auth_headers()
+        response = api_request(
+            "POST",
+            f"{API_URL}/classifications/batch?user_id={st.session_state.user_id}",
+            json={"image_ids": image_ids},
+            stream=True
+        )
+        if response.status_code != 200:
+            st.error(f"Batch classification failed: {response.json().get('detail', 'Unknown error')}")
+            return []
+        return [json.loads(line) for line in response.iter_lines() if line]
+    except Exception as e:
+        st.error(f"Error classifying images: {str(e)}")
+        return []
+
+def get_image_preview(image_id, size=512):
+    # Revalidate with the ETag so reruns don't download the same preview again
+    previews = st.session_state.setdefault("previews", {})
+    key = f"{image_id}:{size}"
+    cached = previews.get(key)
+    headers = {}
+    if cached:
+        headers["If-None-Match"] = cached["etag"]
+    try:
+        response = api_request(
+            "GET",
+            f"{API_URL}/images/{image_id}/preview?size={size}&user_id={st.session_state.user_id}",
+            headers=headers
+        )
+        
+        if response.status_code == 304 and cached:
+            return cached["content"]
+        if response.status_code == 200:
+            previews[key] = {"etag": response.headers.get("ETag", ""), "content": response.content}
+            return response.content
+        else:
+            st.warning(f"Failed to load preview: {response.json().get('detail', 'Unknown error')}")
+            return None
+    except Exception as e:
+        st.error(f"Error retrieving preview: {str(e)}")
+        return None
+
+def get_tilejson(image_id):
+    try:
+        response = api_request(
+            "GET",
+            f"{API_URL}/tiles/{image_id}/tilejson.json?user_id={st.session_state.user_id}"
         )
         
         if response.status_code == 200:
@@ -208,7 +289,7 @@ def get_classification_result(image_id):
         else:
             return None
     except Exception as e:
-        st.error(f"Error retrieving classification: {str(e)}")
+        st.error(f"Error retrieving map tiles: {str(e)}")
         return None
 
 # UI Components
@@ -393,7 +474,8 @@ def render_images_page():
                 "ID": img["id"],
                 "Type": img.get("file_type", "Unknown"),
                 "Location": metadata.get("location", ""),
-                "Uploaded": img.get("created_at", "")[:10]  # Just the date part
+                "Uploaded": img.get("created_at", "")[:10],  # Just the date part
+                "Classification": (img.get("latest_classification") or {}).get("classification", "")
             })
         
         # Convert to dataframe
@@ -401,6 +483,21 @@ def render_images_page():
         
         # Use AgGrid or similar for better interaction if available
         st.dataframe(df, use_container_width=True, height=300)
+
+        # Classify several images in one request
+        batch_ids = st.multiselect("Select images to classify together",
+                                   options=[img["id"] for img in st.session_state.images],
+                                   format_func=lambda x: f"Image {x[:8]}...")
+        if batch_ids and st.button("Classify Selected"):
+            with st.spinner(f"Classifying {len(batch_ids)} images..."):
+                statuses = classify_images_batch(batch_ids)
+            summary = next((s for s in statuses if s.get("status") == "done"), None)
+            errors = [s for s in statuses if s.get("status") == "error" and "image_id" in s]
+            if summary:
+                st.success(f"Classified {summary['classified']} of {summary['requested']} images")
+                st.session_state.images = get_all_images()
+            for error in errors:
+                st.warning(f"Image {error['image_id'][:8]}...: {error['detail']}")
         
         # Image selection
         selected_id = st.selectbox("Select an image to view details", 
@@ -419,49 +516,27 @@ def render_images_page():
                 with col1:
                     st.subheader("Image Preview")
                     try:
-                        # Download the image content
-                        image_url = selected_image["image_url"]
                         file_type = selected_image.get("file_type", "rgb")
-                        image_response = requests.get(image_url)
-                        if image_response.status_code == 200:
-                            image_content = image_response.content
-                            
-                            # Get classification result for the title
-                            classification = get_classification_result(selected_id)
+                        # Preview rendered, stored and cached by the API instead of downloading the original
+                        preview = get_image_preview(selected_id)
+                        if preview:
+                            # Classification result for the title, embedded in the image listing
+                            classification = selected_image.get("latest_classification")
                             title = "Image Preview"
                             if classification:
                                 result = classification["classification"]
                                 confidence = classification["confidence"]
                                 title = f"{result} ({confidence:.1%})"
-                            
-                            # Display based on file_type
+                            st.image(preview, caption=title, use_container_width=True)
+
                             if file_type == "ndvi":
-                                # NDVI image (TIFF)
-                                with io.BytesIO(image_content) as f:
-                                    m = plot_ndvi_overlay(f)
-                                    with rasterio.open(f) as src:
-                                        data = src.read()  # Shape: (bands, height, width)
-                                ndvi_display = data[0, :, :] if data.ndim == 3 else data[:, :]
-                                fig, ax = plt.subplots()
-                                im = ax.imshow(ndvi_display, cmap='RdYlGn', vmin=-1, vmax=1)
-                                plt.colorbar(im, label="NDVI")
-                                ax.set_title(title)
-                                st.pyplot(fig)
-                                with io.BytesIO(image_content) as f:
-                                    m = plot_ndvi_overlay(f)
-                                    if m:
-                                        st.subheader("Geospatial Visualization")
-                                        folium_static(m)
-                            else:
-                                # RGB image (JPEG/PNG)
-                                image = Image.open(io.BytesIO(image_content))
-                                fig, ax = plt.subplots()
-                                ax.imshow(np.array(image))
-                                ax.set_title(title)
-                                ax.axis('off')
-                                st.pyplot(fig)
-                        else:
-                            st.warning(f"Failed to download image: {image_response.status_code}")
+                                st.caption("NDVI from -1 (red) to 1 (green)")
+                                # Map overlay tiles are rendered and cached by the API
+                                tilejson = get_tilejson(selected_id)
+                                m = plot_ndvi_tiles(tilejson) if tilejson else None
+                                if m:
+                                    st.subheader("Geospatial Visualization")
+                                    folium_static(m)
                     except Exception as e:
                         st.warning(f"Cannot preview this image: {str(e)}")
                 
@@ -477,7 +552,7 @@ def render_images_page():
                     st.subheader("Classification")
                     
                     # Check if classification exists
-                    classification = get_classification_result(selected_id)
+                    classification = selected_image.get("latest_classification")
                     
                     if classification:
                         # Display classification result
@@ -498,6 +573,7 @@ def render_images_page():
                                 result = classify_image(selected_id)
                                 if result:
                                     st.success("Classification complete!")
+                                    st.session_state.images = get_all_images()
                                     st.rerun()
                 
                 # Actions
@@ -522,8 +598,7 @@ def render_webcam_page():
             img_rgb = np.array(img)
             data = preprocess_image(img_rgb)
     
-            model = load_model_wrapper()
-            class_idx, confidence = predict(model, data)
+            class_idx, confidence = predict_locally(data)
             print(class_idx, confidence)
     
             col1, col2 = st.columns(2)
@@ -548,16 +623,28 @@ def ndvi_calculation(bgr_frame):
     Approximate an NDVI-like index from a BGR webcam frame
     using green and red channels as a proxy.
     """
-    frame_rgb = cv2.cvtColor(bgr_frame, cv2.COLOR_BGR2RGB)
-    # Extract red and green channels
-    red = frame_rgb[:, :, 0].astype(np.float32)
-    green = frame_rgb[:, :, 1].astype(np.float32)
-    # Compute pseudo-NDVI: (green - red) / (green + red)
-    denominator = green + red + 1e-8  # Avoid division by zero
-    ndvi = (green - red) / denominator
-    # Clamp to [-1, 1] to ensure valid NDVI range
-    ndvi = np.clip(ndvi, -1.0, 1.0)
-    return ndvi
+    # Pseudo-NDVI (green - red) / (green + red), read straight from the BGR channels
+    return pseudo_ndvi(bgr_frame, channel_order="bgr")
+
+@st.cache_resource
+def load_local_model():
+    """
+    The webcam pages classify in the Streamlit process, so they load their own copy
+    of the configured model once, independent of how the API runs inference.
+    """
+    backend, model_path = resolve_backend(INFERENCE_BACKEND, INFERENCE_BACKEND_PATH, MODEL_VARIANT, MODEL_VARIANTS_DIR)
+    return load_backend(
+        backend, model_path,
+        num_threads=INFERENCE_THREADS,
+        inter_op_threads=INFERENCE_INTER_OP_THREADS,
+        shared_weights=TFLITE_SHARED_WEIGHTS
+    )
+
+def predict_locally(data: np.ndarray) -> tuple:
+    """(class_idx, confidence) for one preprocessed sample, with or without a batch axis."""
+    if data.ndim == 3:
+        data = np.expand_dims(data, axis=0)
+    return predict_batch(load_local_model(), data)[0]
 
 def predict_image(model, data: np.ndarray) -> tuple:
     """
@@ -582,14 +669,15 @@ def preprocess_for_model(ndvi):
     TARGET_SIZE = (299, 299)  # (height, width)
     resized = cv2.resize(ndvi, TARGET_SIZE)
     # Replace NaNs with a safe value (e.g., -2, outside typical NDVI range)
-    safe = np.nan_to_num(resized, nan=-2)
-    # Normalize to [0, 1]
-    norm = (safe - safe.min()) / (safe.max() - safe.min() + 1e-8)
+    safe = np.nan_to_num(resized, copy=False, nan=-2)
+    # Normalize to [0, 1] in place
+    low = safe.min()
+    safe -= low
+    safe /= (safe.max() + 1e-8)
     # Explicitly clamp to [0, 1] to avoid numerical issues
-    norm = np.clip(norm, 0.0, 1.0)
-    # Stack into 3 channels
-    stacked = np.stack([norm, norm, norm], axis=-1).astype(np.float32)
-    return stacked
+    norm = np.clip(safe, 0.0, 1.0, out=safe)
+    # Present as 3 channels without copying
+    return to_model_channels(norm.astype(np.float32, copy=False))
 
 def render_live_feed_page():
     st.header("Live Feed Capture")
@@ -622,9 +710,8 @@ def render_live_feed_page():
             ndvi = ndvi_calculation(frame_sq)
             # Preprocess for model
             processed = preprocess_for_model(ndvi)
-            # Load model and predict
-            model = load_model_wrapper()
-            label, conf = predict(model, processed)
+            # Predict with the page's own copy of the model
+            label, conf = predict_locally(processed)
             
             # Choose text color by label
             colors = {
@@ -0,0 +1,89 @@
+# benchmarks/bench_auth.py
+"""
+Measure requests/sec of authenticated endpoints against a local Supabase
+stand-in under three ways of authenticating:
+
+- lookup: the users row is fetched on every request (user cache TTL 0)
+- cached: the users row comes from the in-process cache
+- jwt: the bearer token is verified locally with JWT_SECRET, and the user
+  comes from the cache
+
+    python -m benchmarks.bench_auth --requests 400 --concurrency 16 --request-delay-ms 5
+
+The app runs in-process over ASGI, so the numbers show what authentication costs
+per request, not HTTP serving. The endpoints are the image listing and the
+classification result lookup.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import time
+import uuid
+from cryptography.fernet import Fernet
+from benchmarks.standins import StandInServer, FAKE_SUPABASE_KEY
+
+
+async def run(client, path, params, headers, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            response = await client.get(path, params=params, headers=headers)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(total)])
+    return total / (time.perf_counter() - start)
+
+
+async def main(args):
+    user_id = str(uuid.uuid4())
+    tables = {
+        "users": {"id": user_id, "auth_user_id": user_id, "email": "bench@example.com", "is_admin": False},
+        "images": {"user_id": user_id, "image_url": "https://example.com/x.png", "file_type": "rgb", "metadata": {},
+                   "latest_classification": [{"classification": "Healthy", "confidence": 0.9}]},
+    }
+    with StandInServer(request_delay_ms=args.request_delay_ms, tables=tables) as server:
+        os.environ["SUPABASE_URL"] = server.url
+        os.environ["SUPABASE_KEY"] = FAKE_SUPABASE_KEY
+        os.environ["JWT_SECRET"] = "bench-secret-with-at-least-32-bytes!!"
+        os.environ.setdefault("ENCRYPTION_KEY", Fernet.generate_key().decode())
+        os.environ["MODEL_LOAD_MODE"] = "lazy"
+        import httpx
+        import jwt
+        from main import app
+        from services import auth
+
+        token = jwt.encode({"sub": user_id, "aud": "authenticated", "exp": int(time.time()) + 3600}, os.environ["JWT_SECRET"], algorithm="HS256")
+        endpoints = {
+            "GET /images/": "/images/",
+            "GET /classifications/{id}/result": f"/classifications/{uuid.uuid4()}/result",
+        }
+        modes = {
+            "lookup": ({"user_id": user_id}, {}, 0),
+            "cached": ({"user_id": user_id}, {}, auth.AUTH_USER_CACHE_TTL),
+            "jwt": ({}, {"Authorization": f"Bearer {token}"}, auth.AUTH_USER_CACHE_TTL),
+        }
+
+        print(f"{args.requests} requests, concurrency {args.concurrency}, {args.request_delay_ms} ms per stand-in request")
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for label, path in endpoints.items():
+                for mode, (params, headers, ttl) in modes.items():
+                    auth._users.ttl = ttl
+                    auth.invalidate_user()
+                    before = server.requests
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        rps = await run(client, path, params, headers, args.requests, args.concurrency)
+                    round_trips = (server.requests - before) / args.requests
+                    print(f"{label:>34} {mode:>7}: {rps:8.1f} req/s  {round_trips:4.2f} DB round trips/request")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--request-delay-ms", type=float, default=5.0)
+    asyncio.run(main(parser.parse_args()))
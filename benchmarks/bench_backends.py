@@ -0,0 +1,53 @@
+# benchmarks/bench_backends.py
+"""
+Latency and throughput of each inference backend at batch sizes 1-64.
+
+    python -m benchmarks.bench_backends --tflite model/Inception.tflite --savedmodel model/Inception_savedmodel
+    python -m benchmarks.bench_backends --onnx model/Inception.onnx --threads 4
+
+The Keras model is always included as the baseline. Export the other artifacts
+first with model/export.py; backends whose path is not given are skipped.
+"""
+import argparse
+import time
+import numpy as np
+from model.backends import load_backend
+from model.export import load_samples
+
+BATCH_SIZES = (1, 2, 4, 8, 16, 32, 64)
+
+
+def measure(model, samples, batch_size, repeat):
+    batch = samples[:batch_size]
+    model.predict_on_batch(batch)  # warm-up: graph tracing, tensor allocation
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model.predict_on_batch(batch)
+        times.append(time.perf_counter() - start)
+    return np.median(times) * 1000, np.percentile(times, 95) * 1000
+
+
+def main(args):
+    backends = [("keras", args.keras)] + [
+        (name, path) for name, path in (("savedmodel", args.savedmodel), ("tflite", args.tflite), ("onnx", args.onnx)) if path
+    ]
+    samples = load_samples(count=max(BATCH_SIZES))
+    for name, path in backends:
+        start = time.perf_counter()
+        model = load_backend(name, path, num_threads=args.threads)
+        print(f"\n{name} ({path}) loaded in {time.perf_counter() - start:.1f} s")
+        for batch_size in BATCH_SIZES:
+            p50, p95 = measure(model, samples, batch_size, args.repeat)
+            print(f"  batch {batch_size:>2}: p50 {p50:8.1f} ms  p95 {p95:8.1f} ms  {batch_size / p50 * 1000:7.1f} tiles/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keras", default="model/Inception.keras")
+    parser.add_argument("--savedmodel")
+    parser.add_argument("--tflite")
+    parser.add_argument("--onnx")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=10)
+    main(parser.parse_args())
@@ -0,0 +1,84 @@
+# benchmarks/bench_indices.py
+"""
+Per-frame cost of the vegetation index kernels in model/indices.py against the
+copy-heavy versions they replaced.
+
+    python -m benchmarks.bench_indices --height 1080 --width 1920 --frames 50
+
+Peak is the highest tracemalloc reading (NumPy + Python allocations) during one
+frame, i.e. how much temporary memory a frame needs on top of its input.
+"""
+import argparse
+import time
+import tracemalloc
+import cv2
+import numpy as np
+from model.indices import vari, pseudo_ndvi, to_model_channels
+
+
+def legacy_preprocess_image(img):
+    r = img[:, :, 0].astype(np.float32)
+    g = img[:, :, 1].astype(np.float32)
+    b = img[:, :, 2].astype(np.float32)
+    denominator = r + g - b
+    denominator[denominator == 0] = 1e-10
+    index = np.clip((g - r) / denominator, -1, 1)
+    resized = cv2.resize(index, (299, 299))
+    return np.stack([resized] * 3, axis=-1)
+
+
+def kernel_preprocess_image(img, out):
+    resized = cv2.resize(vari(img, out=out), (299, 299))
+    return to_model_channels(resized)
+
+
+def legacy_pseudo_ndvi(bgr):
+    rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+    red = rgb[:, :, 0].astype(np.float32)
+    green = rgb[:, :, 1].astype(np.float32)
+    return np.clip((green - red) / (green + red + 1e-8), -1.0, 1.0)
+
+
+def kernel_pseudo_ndvi(bgr, out):
+    return pseudo_ndvi(bgr, out=out, channel_order="bgr")
+
+
+def measure(fn, frames):
+    # One warm-up call so per-thread scratch buffers exist, as they would in a running server
+    fn(frames[0])
+    times = []
+    for frame in frames:
+        start = time.perf_counter()
+        fn(frame)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn(frames[0])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return np.median(times) * 1000, peak / 2**20
+
+
+def main(args):
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8) for _ in range(args.frames)]
+    out = np.empty((args.height, args.width), dtype=np.float32)
+
+    cases = [
+        ("VARI preprocess (legacy)", legacy_preprocess_image),
+        ("VARI preprocess (kernel)", lambda frame: kernel_preprocess_image(frame, out)),
+        ("pseudo-NDVI (legacy)", legacy_pseudo_ndvi),
+        ("pseudo-NDVI (kernel)", lambda frame: kernel_pseudo_ndvi(frame, out)),
+    ]
+    print(f"{args.frames} frames of {args.height}x{args.width} uint8")
+    for name, fn in cases:
+        ms, peak_mb = measure(fn, frames)
+        print(f"{name:>26}: {ms:7.2f} ms/frame  peak {peak_mb:7.2f} MiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--frames", type=int, default=50)
+    main(parser.parse_args())
@@ -0,0 +1,70 @@
+# benchmarks/bench_listing.py
+"""
+Compare the ways the images page can get the latest classification of N images
+against a local PostgREST stand-in:
+
+- per_image: one get_result call per image, as before. That is two round trips
+  each: the image row for the ownership check, then the classifications query.
+- get_result: the single-request get_result (image row with its embedded latest
+  classification), once per image.
+- get_results: one batched request for all N images.
+- listing: the image listing with with_classification=true, which returns the
+  images and their classifications together.
+
+    python -m benchmarks.bench_listing --images 50 --request-delay-ms 5
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from cryptography.fernet import Fernet
+from benchmarks.standins import StandInServer, FAKE_SUPABASE_KEY
+
+
+async def main(args):
+    user_id = str(uuid.uuid4())
+    tables = {"images": {"user_id": user_id, "latest_classification": [{"classification": "Healthy", "confidence": 0.9}]}}
+    with StandInServer(request_delay_ms=args.request_delay_ms, tables=tables) as server:
+        os.environ["SUPABASE_URL"] = server.url
+        os.environ["SUPABASE_KEY"] = FAKE_SUPABASE_KEY
+        os.environ.setdefault("ENCRYPTION_KEY", Fernet.generate_key().decode())
+        from database.supabase import init_supabase, close_supabase, get_supabase
+        from services.image import get_image, get_all_images
+        from services.classification import get_result, get_results
+
+        async def old_get_result(image_id):
+            supabase = await get_supabase()
+            image = await get_image(image_id)
+            if str(image["user_id"]) != user_id:
+                raise ValueError("Unauthorized: Image does not belong to this user")
+            response = await supabase.table("classifications").select("*").eq("image_id", str(image_id)).order("created_at", desc=True).limit(1).execute()
+            return response.data[0]
+
+        image_ids = [uuid.uuid4() for _ in range(args.images)]
+        flows = {
+            "per_image": lambda: asyncio.gather(*[old_get_result(image_id) for image_id in image_ids]),
+            "get_result": lambda: asyncio.gather(*[get_result(image_id, user_id) for image_id in image_ids]),
+            "get_results": lambda: get_results(image_ids, user_id),
+            "listing": lambda: get_all_images(user_id, limit=args.images, with_classification=True),
+        }
+
+        await init_supabase()
+        print(f"{args.images} images, {args.request_delay_ms} ms per stand-in request")
+        for name, flow in flows.items():
+            before = server.requests
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                await flow()
+            elapsed = (time.perf_counter() - start) / args.repeat
+            round_trips = (server.requests - before) / args.repeat
+            print(f"{name:>12}: {elapsed * 1000:8.1f} ms  {round_trips:6.0f} round trips")
+        await close_supabase()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=50)
+    parser.add_argument("--request-delay-ms", type=float, default=5.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,69 @@
+# benchmarks/bench_log_sink.py
+"""
+Measure what record_action costs the caller, and how many inserts reach the
+database, against a local PostgREST stand-in:
+
+- inline: each entry is inserted before record_action returns (no log sink
+  running, as before)
+- queued: entries go to the log sink, which inserts them in batches of up to
+  LOG_FLUSH_SIZE
+
+    python -m benchmarks.bench_log_sink --entries 1000 --concurrency 16 --request-delay-ms 5
+
+Calls run concurrently, like the requests that log. Times for queued include
+the final flush on stop, so they cover writing every entry, not just enqueueing.
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from cryptography.fernet import Fernet
+from benchmarks.standins import StandInServer, FAKE_SUPABASE_KEY
+
+
+async def run(record_action, user_id, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await record_action(user_id, "bench", {"i": i})
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*[one(i) for i in range(total)])
+    latencies.sort()
+    return latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.99)] * 1000
+
+
+async def main(args):
+    with StandInServer(request_delay_ms=args.request_delay_ms, tables={"logs": []}) as server:
+        os.environ["SUPABASE_URL"] = server.url
+        os.environ["SUPABASE_KEY"] = FAKE_SUPABASE_KEY
+        os.environ.setdefault("ENCRYPTION_KEY", Fernet.generate_key().decode())
+        from database.supabase import init_supabase, close_supabase
+        from services import log
+
+        await init_supabase()
+        user_id = str(uuid.uuid4())
+        print(f"{args.entries} entries, concurrency {args.concurrency}, {args.request_delay_ms} ms per stand-in request")
+        for mode in ("inline", "queued"):
+            if mode == "queued":
+                await log.start_log_sink()
+            before = server.requests
+            start = time.perf_counter()
+            p50, p99 = await run(log.record_action, user_id, args.entries, args.concurrency)
+            await log.stop_log_sink()
+            total = time.perf_counter() - start
+            inserts = server.requests - before
+            print(f"{mode:>7}: p50 {p50:7.3f} ms  p99 {p99:7.3f} ms  all written in {total * 1000:8.1f} ms  {inserts} inserts")
+        await close_supabase()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--request-delay-ms", type=float, default=5.0)
+    asyncio.run(main(parser.parse_args()))
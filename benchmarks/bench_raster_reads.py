@@ -0,0 +1,103 @@
+# benchmarks/bench_raster_reads.py
+"""
+Full-resolution vs decimated (overview-aware) reads for NDVI preprocessing and
+overlays, over synthetic GeoTIFFs.
+
+    python -m benchmarks.bench_raster_reads --size 4800 --repeat 3
+
+Two rasters are generated: a plain striped GeoTIFF and a tiled one with internal
+overviews. Peak memory is Python/NumPy allocations as seen by tracemalloc; the
+GDAL block cache is not included.
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+import cv2
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.transform import from_origin
+from model.image_processing import preprocess_ndvi, read_decimated, fit_shape, OVERLAY_MAX_SIZE
+
+
+def write_raster(path, size, overviews):
+    rng = np.random.default_rng(0)
+    profile = {
+        "driver": "GTiff", "height": size, "width": size, "count": 1, "dtype": "float32",
+        "crs": "EPSG:4326", "transform": from_origin(30.0, 30.0, 0.0001, 0.0001),
+    }
+    if overviews:
+        profile.update(tiled=True, blockxsize=512, blockysize=512)
+    with rasterio.open(path, "w", **profile) as dst:
+        for row in range(0, size, 512):
+            height = min(512, size - row)
+            block = rng.uniform(-1, 1, (height, size)).astype(np.float32)
+            dst.write(block, 1, window=((row, row + height), (0, size)))
+        if overviews:
+            dst.build_overviews([2, 4, 8, 16], Resampling.average)
+
+
+def full_resolution_preprocess(path):
+    """preprocess_ndvi as it was before decimated reads."""
+    with rasterio.open(path) as src:
+        ndvi = src.read(1).astype(np.float32)
+    valid_mean = np.nanmean(ndvi)
+    processed = np.where(np.isnan(ndvi), valid_mean, ndvi)
+    smoothed = cv2.GaussianBlur(processed, (5, 5), 0)
+    resized = cv2.resize(smoothed, (299, 299))
+    return np.stack([resized] * 3, axis=-1)
+
+
+def full_resolution_overlay_read(path):
+    with rasterio.open(path) as src:
+        return src.read(1).astype(np.float32)
+
+
+def decimated_overlay_read(path):
+    with rasterio.open(path) as src:
+        return read_decimated(src, fit_shape(src.height, src.width, OVERLAY_MAX_SIZE))
+
+
+def measure(fn, path, repeat):
+    times = []
+    peak = 0
+    for _ in range(repeat):
+        tracemalloc.start()
+        start = time.perf_counter()
+        fn(path)
+        times.append(time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return min(times) * 1000, peak / 2**20
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        rasters = {
+            "striped, no overviews": (os.path.join(tmp, "plain.tif"), False),
+            "tiled + overviews": (os.path.join(tmp, "overviews.tif"), True),
+        }
+        for path, overviews in rasters.values():
+            write_raster(path, args.size, overviews)
+
+        cases = [
+            ("preprocess full read", full_resolution_preprocess),
+            ("preprocess decimated", lambda path: preprocess_ndvi(path)),
+            ("overlay full read", full_resolution_overlay_read),
+            ("overlay decimated", decimated_overlay_read),
+        ]
+        print(f"{args.size}x{args.size} float32, best of {args.repeat}")
+        for raster_name, (path, _) in rasters.items():
+            print(f"\n{raster_name}")
+            for case_name, fn in cases:
+                ms, peak_mb = measure(fn, path, args.repeat)
+                print(f"  {case_name:>22}: {ms:9.1f} ms  peak {peak_mb:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=4800)
+    parser.add_argument("--repeat", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,90 @@
+# benchmarks/bench_startup.py
+"""
+Import time of the API modules and cold start under each MODEL_LOAD_MODE.
+
+    python -m benchmarks.bench_startup --repeat 3
+    python -m benchmarks.bench_startup --imports-only
+
+Every measurement runs in a fresh interpreter so nothing is already imported.
+Cold start reports three times per mode: the lifespan reaching yield (the server
+accepts requests), the model being ready, and the first inference completing.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from cryptography.fernet import Fernet
+from benchmarks.standins import FAKE_SUPABASE_KEY
+
+MODULES = ("model.image_processing", "model.visualization", "services.classification", "main")
+
+IMPORT_PROBE = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+COLD_START_PROBE = """
+import asyncio, json, time
+start = time.perf_counter()
+import main
+from services.classification import ensure_model, run_prediction, model_status
+import numpy as np
+
+async def probe():
+    async with main.lifespan(main.app):
+        serving = time.perf_counter() - start
+        await ensure_model()
+        ready = time.perf_counter() - start
+        await run_prediction(np.zeros((299, 299, 3), dtype=np.float32))
+        first = time.perf_counter() - start
+        print(json.dumps({{"serving": serving, "ready": ready, "first_inference": first}}))
+
+asyncio.run(probe())
+"""
+
+
+def run_probe(code, env):
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "probe failed")
+    return result.stdout.strip().splitlines()[-1]
+
+
+def main(args):
+    env = dict(os.environ)
+    env.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+    env.setdefault("SUPABASE_KEY", FAKE_SUPABASE_KEY)
+    env.setdefault("ENCRYPTION_KEY", Fernet.generate_key().decode())
+
+    print(f"Import time, median of {args.repeat} fresh interpreters")
+    for module in MODULES:
+        try:
+            times = [float(run_probe(IMPORT_PROBE.format(module=module), env)) for _ in range(args.repeat)]
+            print(f"  {module:>24}: {statistics.median(times) * 1000:8.0f} ms")
+        except RuntimeError as e:
+            print(f"  {module:>24}: failed ({e})")
+    if args.imports_only:
+        return
+
+    print(f"\nCold start (s), median of {args.repeat}")
+    for mode in ("eager", "background", "lazy"):
+        for warmup in ("true", "false"):
+            mode_env = dict(env, MODEL_LOAD_MODE=mode, MODEL_WARMUP=warmup)
+            try:
+                runs = [json.loads(run_probe(COLD_START_PROBE, mode_env)) for _ in range(args.repeat)]
+            except RuntimeError as e:
+                print(f"  {mode:>10} warmup={warmup:<5}: failed ({e})")
+                continue
+            serving, ready, first = (statistics.median(run[key] for run in runs) for key in ("serving", "ready", "first_inference"))
+            print(f"  {mode:>10} warmup={warmup:<5}: serving {serving:6.2f}  ready {ready:6.2f}  first inference {first:6.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--imports-only", action="store_true")
+    main(parser.parse_args())
@@ -0,0 +1,87 @@
+# benchmarks/bench_supabase_client.py
+"""
+Compare the per-call Supabase client (the old get_supabase) with the shared,
+pooled client against a local PostgREST stand-in.
+
+    python -m benchmarks.bench_supabase_client --requests 200 --concurrency 16 --connect-delay-ms 20
+
+Each simulated classify request does the same four round trips as the real
+endpoint: user lookup, image lookup, classification insert and log insert.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from cryptography.fernet import Fernet
+from benchmarks.standins import StandInServer, FAKE_SUPABASE_KEY
+
+
+async def classify_flow(get_client):
+    supabase = await get_client()
+    await supabase.table("users").select("*").eq("auth_user_id", "bench").execute()
+    supabase = await get_client()
+    await supabase.table("images").select("*").eq("id", "bench").limit(1).execute()
+    supabase = await get_client()
+    await supabase.table("classifications").insert({"image_id": "bench", "classification": "Healthy", "confidence": 0.9}).execute()
+    supabase = await get_client()
+    await supabase.table("logs").insert({"user_id": "bench", "action": "classification", "details": {}}).execute()
+
+
+async def run(get_client, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await classify_flow(get_client)
+            latencies.append(time.perf_counter() - start)
+
+    wall = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(total)])
+    wall = time.perf_counter() - wall
+    latencies.sort()
+    return {
+        "rps": total / wall,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+    }
+
+
+async def main(args):
+    with StandInServer(connect_delay_ms=args.connect_delay_ms, request_delay_ms=args.request_delay_ms) as server:
+        os.environ["SUPABASE_URL"] = server.url
+        os.environ["SUPABASE_KEY"] = FAKE_SUPABASE_KEY
+        os.environ.setdefault("ENCRYPTION_KEY", Fernet.generate_key().decode())
+        from supabase import create_async_client
+        from database import supabase as db
+
+        async def per_call_client():
+            return await create_async_client(server.url, FAKE_SUPABASE_KEY)
+
+        results = {}
+        server.connections = 0
+        results["per-call client"] = await run(per_call_client, args.requests, args.concurrency)
+        results["per-call client"]["connections"] = server.connections
+
+        server.connections = 0
+        await db.init_supabase()
+        results["shared pooled client"] = await run(db.get_supabase, args.requests, args.concurrency)
+        results["shared pooled client"]["connections"] = server.connections
+        await db.close_supabase()
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, connect delay {args.connect_delay_ms} ms")
+    for name, r in results.items():
+        print(f"{name:>22}: {r['rps']:8.1f} req/s  mean {r['mean_ms']:7.2f} ms  p50 {r['p50_ms']:7.2f} ms  "
+              f"p99 {r['p99_ms']:7.2f} ms  connections {r['connections']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--connect-delay-ms", type=float, default=20.0, help="simulated TLS handshake cost per new connection")
+    parser.add_argument("--request-delay-ms", type=float, default=1.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,113 @@
+# benchmarks/bench_upload.py
+"""
+Compare peak memory and time of the buffered upload (create_image reads the whole
+file) with the streaming upload (create_image_stream pipes TUS chunks to storage)
+against a local Storage stand-in.
+
+    python -m benchmarks.bench_upload --size-mb 200 --body-chunk-kb 64
+
+Peak memory is measured with tracemalloc, so it counts Python allocations made
+during the upload (the request body, copies, hashing buffers), not the interpreter.
+The stand-in runs in a child process so the objects it stores aren't counted.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+import tracemalloc
+import uuid
+from cryptography.fernet import Fernet
+from benchmarks.standins import StandInServer, FAKE_SUPABASE_KEY
+
+
+def serve(urls):
+    with StandInServer() as server:
+        urls.put(server.url)
+        server._thread.join()
+
+
+def make_tiff(path, size):
+    # Only the magic number matters to the upload path; the rest is filler
+    with open(path, "wb") as f:
+        f.write(b"II*\x00")
+        remaining = size - 4
+        block = os.urandom(1024 * 1024)
+        while remaining > 0:
+            f.write(block[:remaining])
+            remaining -= len(block)
+
+
+async def body_chunks(path, chunk_size):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+async def measure(coro_factory):
+    tracemalloc.start()
+    start = time.perf_counter()
+    image = await coro_factory()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return image, elapsed, peak
+
+
+async def main(args):
+    urls = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(urls,), daemon=True)
+    server.start()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["SUPABASE_URL"] = urls.get()
+        os.environ["SUPABASE_KEY"] = FAKE_SUPABASE_KEY
+        os.environ.setdefault("ENCRYPTION_KEY", Fernet.generate_key().decode())
+        from starlette.datastructures import Headers, UploadFile
+        from database.supabase import init_supabase, close_supabase
+        from services.executor import start_executors, shutdown_executors
+        from services.image import create_image, create_image_stream
+        from utils.http import init_http_client, close_http_client
+        from config import UPLOAD_CHUNK_SIZE
+
+        path = os.path.join(tmp, "scene.tif")
+        size = int(args.size_mb * 1024 * 1024)
+        make_tiff(path, size)
+        user_id = uuid.uuid4()
+        await init_supabase()
+        await init_http_client()
+        start_executors()
+
+        async def buffered():
+            with open(path, "rb") as f:
+                upload = UploadFile(f, filename="buffered.tif", headers=Headers({"content-type": "image/tiff"}))
+                return await create_image(user_id, upload)
+
+        async def streamed():
+            return await create_image_stream(user_id, body_chunks(path, args.body_chunk_kb * 1024), "streamed.tif", "image/tiff", size)
+
+        results = {}
+        for name, factory in (("buffered", buffered), ("streamed", streamed)):
+            image, elapsed, peak = await measure(factory)
+            results[name] = (elapsed, peak, image["metadata"]["content_sha256"])
+
+        shutdown_executors()
+        await close_http_client()
+        await close_supabase()
+    server.terminate()
+
+    print(f"{args.size_mb} MB TIFF, request body chunks {args.body_chunk_kb} KB, upload chunk {UPLOAD_CHUNK_SIZE // (1024 * 1024)} MB")
+    for name, (elapsed, peak, digest) in results.items():
+        print(f"{name:>9}: {elapsed * 1000:8.1f} ms  peak traced memory {peak / 1024 / 1024:8.1f} MB  sha256 {digest[:12]}")
+    if results["buffered"][2] != results["streamed"][2]:
+        print("WARNING: content hashes differ")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=200)
+    parser.add_argument("--body-chunk-kb", type=int, default=64, help="size of the chunks the request body arrives in")
+    asyncio.run(main(parser.parse_args()))
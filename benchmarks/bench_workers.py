@@ -0,0 +1,78 @@
+# benchmarks/bench_workers.py
+"""
+Total memory of a multi-worker gunicorn deployment, with and without preloading
+the model in the master.
+
+    python -m benchmarks.bench_workers --workers 4
+    INFERENCE_BACKEND=tflite INFERENCE_BACKEND_PATH=model/Inception.tflite python -m benchmarks.bench_workers --workers 4
+
+Starts gunicorn -c gunicorn.conf.py for each configuration, waits until /ready
+succeeds, then reads /proc/<pid>/smaps_rollup for the master and every worker.
+Summed RSS counts shared pages once per worker; summed PSS is the real footprint.
+Needs Supabase env vars (any reachable-or-not URL works, nothing is queried).
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+import httpx
+from utils.process import memory_usage
+
+
+def children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def wait_ready(url, workers, timeout):
+    # Each request lands on an arbitrary worker; require a run of successes
+    deadline = time.monotonic() + timeout
+    successes = 0
+    while time.monotonic() < deadline:
+        try:
+            successes = successes + 1 if httpx.get(f"{url}/ready", timeout=5).status_code == 200 else 0
+        except httpx.HTTPError:
+            successes = 0
+        if successes >= workers * 4:
+            return True
+        time.sleep(0.25)
+    return False
+
+
+def measure(args, preload):
+    env = dict(os.environ, WEB_CONCURRENCY=str(args.workers), MODEL_PRELOAD=str(preload).lower(), BIND=f"127.0.0.1:{args.port}")
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_ready(f"http://127.0.0.1:{args.port}", args.workers, args.timeout):
+            return None
+        pids = [server.pid] + children(server.pid)
+        usages = [memory_usage(pid) for pid in pids]
+        return len(pids) - 1, sum(u["rss_bytes"] for u in usages), sum(u["pss_bytes"] for u in usages)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+
+def main(args):
+    print(f"{args.workers} workers, backend {os.getenv('INFERENCE_BACKEND', 'keras')}")
+    for preload in (False, True):
+        result = measure(args, preload)
+        if result is None:
+            print(f"  preload={preload!s:<5}: server did not become ready within {args.timeout}s")
+            continue
+        workers, rss, pss = result
+        print(f"  preload={preload!s:<5}: {workers} workers  sum RSS {rss / 2**20:8.0f} MiB  sum PSS {pss / 2**20:8.0f} MiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=300)
+    main(parser.parse_args())
@@ -6,8 +6,125 @@ load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-JWT_SECRET = os.getenv("JWT_SECRET")
+JWT_SECRET = os.getenv("JWT_SECRET")  # when set, expired access tokens get 401; clients renew them with POST /auth/refresh
 ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY")
 
 # Initialize encryption
-cipher = Fernet(ENCRYPTION_KEY.encode())
\ No newline at end of file
+cipher = Fernet(ENCRYPTION_KEY.encode())
+
+# Inference micro-batching
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "10"))
+
+# Executors for blocking work
+MODEL_PATH = os.getenv("MODEL_PATH", "model/Inception.keras")
+EXECUTOR_IO_WORKERS = int(os.getenv("EXECUTOR_IO_WORKERS", "8"))
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread")  # "thread" or "process"
+INFERENCE_PROCESSES = int(os.getenv("INFERENCE_PROCESSES", "1"))
+
+# Inference runtime; non-keras backends load the artifact written by model/export.py
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "keras")  # "keras", "savedmodel", "tflite" or "onnx"
+INFERENCE_BACKEND_PATH = os.getenv("INFERENCE_BACKEND_PATH", MODEL_PATH)
+# Per-process thread caps; with several workers keep workers x threads <= cores. 0 lets the runtime decide
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "0")) or None  # intra-op
+INFERENCE_INTER_OP_THREADS = int(os.getenv("INFERENCE_INTER_OP_THREADS", "0")) or None
+TFLITE_SHARED_WEIGHTS = os.getenv("TFLITE_SHARED_WEIGHTS", "false").lower() == "true"
+MODEL_VARIANT = os.getenv("MODEL_VARIANT", "float32")  # or a quantized variant: "dynamic", "float16", "int8"
+MODEL_VARIANTS_DIR = os.getenv("MODEL_VARIANTS_DIR", "model/variants")
+
+# Model registry: extra versions must live under MODEL_REGISTRY_DIR
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "model")
+SHADOW_MAX_PENDING = int(os.getenv("SHADOW_MAX_PENDING", "4"))  # shadow batches in flight before new ones are dropped
+
+# Model startup
+MODEL_LOAD_MODE = os.getenv("MODEL_LOAD_MODE", "eager")  # "eager", "background" or "lazy"
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() == "true"
+# Load the model in the gunicorn master before forking workers (fork-safe backends only)
+MODEL_PRELOAD = os.getenv("MODEL_PRELOAD", "false").lower() == "true"
+
+# Shared Supabase HTTP connection pool
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "20"))
+SUPABASE_MAX_KEEPALIVE = int(os.getenv("SUPABASE_MAX_KEEPALIVE", "10"))
+SUPABASE_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", "30"))
+
+# Pooled HTTP client for object downloads
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+MAX_DOWNLOAD_BYTES = int(os.getenv("MAX_DOWNLOAD_BYTES", str(200 * 1024 * 1024)))
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", str(256 * 1024)))
+
+# Streaming uploads (POST /images/stream) through Storage's resumable (TUS) endpoint
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(6 * 1024 * 1024)))  # Supabase expects 6 MB chunks
+UPLOAD_RETRIES = int(os.getenv("UPLOAD_RETRIES", "3"))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+# Classification result cache
+MODEL_VERSION = os.getenv("MODEL_VERSION", "inception-v1")
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "10000"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "86400"))
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR")  # unset disables the on-disk tier
+
+# Rewrite NDVI GeoTIFF uploads as Cloud-Optimized GeoTIFFs (tiled, compressed, with overviews)
+COG_ON_INGEST = os.getenv("COG_ON_INGEST", "true").lower() == "true"
+COG_BLOCK_SIZE = int(os.getenv("COG_BLOCK_SIZE", "512"))
+COG_COMPRESS = os.getenv("COG_COMPRESS", "deflate")
+COG_OVERVIEW_RESAMPLING = os.getenv("COG_OVERVIEW_RESAMPLING", "average")
+
+# XYZ map tiles for NDVI overlays (GET /tiles/{image_id}/{z}/{x}/{y}.png)
+MAP_TILE_CACHE_MAX_ENTRIES = int(os.getenv("MAP_TILE_CACHE_MAX_ENTRIES", "4096"))
+MAP_TILE_CACHE_TTL = float(os.getenv("MAP_TILE_CACHE_TTL", "86400"))
+MAP_TILE_CACHE_DIR = os.getenv("MAP_TILE_CACHE_DIR")  # unset disables the on-disk tier
+MAP_TILE_MAX_AGE = int(os.getenv("MAP_TILE_MAX_AGE", "3600"))  # Cache-Control max-age for browsers
+MAP_TILE_SOURCES_MAX_OPEN = int(os.getenv("MAP_TILE_SOURCES_MAX_OPEN", "16"))
+
+# Rendered image previews (GET /images/{image_id}/preview), stored next to the original in Storage
+PREVIEW_SIZES = sorted(int(s) for s in os.getenv("PREVIEW_SIZES", "256,512,1024").split(","))  # requested sizes snap up to one of these
+PREVIEW_FORMAT = os.getenv("PREVIEW_FORMAT", "webp")  # default format: "webp" or "png"
+PREVIEW_ON_INGEST = os.getenv("PREVIEW_ON_INGEST", "true").lower() == "true"  # render after buffered uploads
+PREVIEW_CACHE_MAX_ENTRIES = int(os.getenv("PREVIEW_CACHE_MAX_ENTRIES", "512"))
+PREVIEW_CACHE_TTL = float(os.getenv("PREVIEW_CACHE_TTL", "86400"))
+PREVIEW_CACHE_DIR = os.getenv("PREVIEW_CACHE_DIR")  # unset disables the on-disk tier
+PREVIEW_MAX_AGE = int(os.getenv("PREVIEW_MAX_AGE", "86400"))  # Cache-Control max-age for browsers
+
+# Authentication: Supabase access tokens are verified locally with the project's JWT secret (JWT_SECRET)
+JWT_AUDIENCE = os.getenv("JWT_AUDIENCE", "authenticated")
+AUTH_USER_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_USER_CACHE_MAX_ENTRIES", "10000"))
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "30"))  # per worker, so also the bound on staleness across workers
+
+# Keyset-paginated listings (GET /images/, /logs/, /admin/images, /admin/users)
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "100"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "1000"))
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "1000"))  # rows per query when streaming ?format=ndjson
+
+# Classify uploads in the background from the bytes already in memory (POST /images/?classify=)
+CLASSIFY_ON_UPLOAD = os.getenv("CLASSIFY_ON_UPLOAD", "false").lower() == "true"
+
+# POST /classifications/batch
+BATCH_CLASSIFY_MAX_ITEMS = int(os.getenv("BATCH_CLASSIFY_MAX_ITEMS", "64"))
+BATCH_CLASSIFY_CONCURRENCY = int(os.getenv("BATCH_CLASSIFY_CONCURRENCY", "8"))
+
+# Background classification jobs (?async=true)
+JOB_BACKEND = os.getenv("JOB_BACKEND", "memory")  # "memory" or "sqlite" (shared by all workers on the host)
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "100"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "2"))
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "3600"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))  # sqlite: a running job whose worker stops renewing this long is requeued
+
+# Audit log writer: record_action queues entries, a background task bulk-inserts them into logs
+LOG_SINK_ENABLED = os.getenv("LOG_SINK_ENABLED", "true").lower() == "true"  # false inserts each entry inline
+LOG_QUEUE_MAX = int(os.getenv("LOG_QUEUE_MAX", "10000"))
+LOG_QUEUE_POLICY = os.getenv("LOG_QUEUE_POLICY", "spill")  # when full: "drop", "block" (backpressure) or "spill" (to LOG_SPILL_PATH)
+LOG_FLUSH_SIZE = int(os.getenv("LOG_FLUSH_SIZE", "200"))  # rows per insert
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "1.0"))  # seconds the oldest queued entry waits at most
+LOG_WRITE_RETRIES = int(os.getenv("LOG_WRITE_RETRIES", "2"))
+LOG_SPILL_PATH = os.getenv("LOG_SPILL_PATH", "log_spill.jsonl")  # JSONL of entries the DB didn't take; replayed when it's back
+
+# Tiled full-scene NDVI inference
+TILE_SIZE = int(os.getenv("TILE_SIZE", "500"))  # training chunk size
+TILE_STRIDE = int(os.getenv("TILE_STRIDE", os.getenv("TILE_SIZE", "500")))
+TILE_BATCH_SIZE = int(os.getenv("TILE_BATCH_SIZE", "16"))
+MAX_SCENE_TILES = int(os.getenv("MAX_SCENE_TILES", "10000"))
@@ -0,0 +1,4 @@
+-- Record which model version produced each classification
+ALTER TABLE classifications ADD COLUMN IF NOT EXISTS model_version text;
+
+CREATE INDEX IF NOT EXISTS classifications_model_version_idx ON classifications (model_version, created_at);
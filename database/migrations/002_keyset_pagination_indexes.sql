@@ -0,0 +1,8 @@
+-- Keyset pagination: listings are ordered by (created_at desc, id desc), per user or across all users
+CREATE INDEX IF NOT EXISTS images_user_created_idx ON images (user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS images_created_idx ON images (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS logs_user_created_idx ON logs (user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS users_created_idx ON users (created_at DESC, id DESC);
+
+-- ?classification= filter joins classifications on image_id
+CREATE INDEX IF NOT EXISTS classifications_image_id_idx ON classifications (image_id, classification);
@@ -0,0 +1,8 @@
+-- Each image's newest classification, so ?classification= filters on the current label
+-- rather than on any label the image ever had
+CREATE OR REPLACE VIEW latest_classifications WITH (security_invoker = true) AS
+SELECT DISTINCT ON (image_id) id, image_id, classification, confidence, model_version, created_at
+FROM classifications
+ORDER BY image_id, created_at DESC, id DESC;
+
+CREATE INDEX IF NOT EXISTS classifications_image_created_idx ON classifications (image_id, created_at DESC, id DESC);
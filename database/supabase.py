@@ -1,7 +1,111 @@
-from supabase import create_async_client, AsyncClient
-from config import SUPABASE_URL, SUPABASE_KEY
+import asyncio
+import httpx
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Union
+from gotrue import AsyncMemoryStorage
+from postgrest import AsyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_TIMEOUT
+from storage3 import AsyncStorageClient
+from storage3.constants import DEFAULT_TIMEOUT as DEFAULT_STORAGE_CLIENT_TIMEOUT
+from supabase import AsyncClient
+from supabase._async.auth_client import AsyncSupabaseAuthClient
+from config import SUPABASE_URL, SUPABASE_KEY, SUPABASE_MAX_CONNECTIONS, SUPABASE_MAX_KEEPALIVE, SUPABASE_KEEPALIVE_EXPIRY
+
+# Bounded, keep-alive connection pool shared by every PostgREST and Storage call in the process
+HTTP_LIMITS = httpx.Limits(
+    max_connections=SUPABASE_MAX_CONNECTIONS,
+    max_keepalive_connections=SUPABASE_MAX_KEEPALIVE,
+    keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY
+)
+
+class PooledPostgrestClient(AsyncPostgrestClient):
+    def create_session(self, base_url: str, headers: Dict[str, str], timeout: Union[int, float, httpx.Timeout], verify: bool = True, proxy: Optional[str] = None) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            verify=verify,
+            proxy=proxy,
+            limits=HTTP_LIMITS,
+            follow_redirects=True,
+            http2=True,
+        )
+
+class PooledStorageClient(AsyncStorageClient):
+    def _create_session(self, base_url: str, headers: Dict[str, str], timeout: int, verify: bool = True, proxy: Optional[str] = None) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            verify=bool(verify),
+            proxy=proxy,
+            limits=HTTP_LIMITS,
+            follow_redirects=True,
+            http2=True,
+        )
+
+class PooledAsyncClient(AsyncClient):
+    """Supabase AsyncClient whose PostgREST and Storage sessions use a bounded keep-alive pool."""
+
+    @staticmethod
+    def _init_postgrest_client(rest_url, headers, schema, timeout=DEFAULT_POSTGREST_CLIENT_TIMEOUT, verify=True, proxy=None):
+        return PooledPostgrestClient(rest_url, headers=headers, schema=schema, timeout=timeout, verify=verify, proxy=proxy)
+
+    @staticmethod
+    def _init_storage_client(storage_url, headers, storage_client_timeout=DEFAULT_STORAGE_CLIENT_TIMEOUT, verify=True, proxy=None):
+        return PooledStorageClient(storage_url, headers, storage_client_timeout, verify, proxy)
+
+    def _listen_to_auth_events(self, event, session):
+        # Never switch the shared client to a signed-in user's token: every PostgREST and
+        # Storage call in the process would then run as that user. Auth goes through supabase_auth()
+        pass
+
+# One client per process, created in main.lifespan
+_client: Optional[AsyncClient] = None
+_client_lock = asyncio.Lock()
+
+async def init_supabase() -> AsyncClient:
+    global _client
+    async with _client_lock:
+        if _client is None:
+            print("Creating shared Supabase client with service role key")
+            _client = await PooledAsyncClient.create(SUPABASE_URL, SUPABASE_KEY)
+    return _client
+
+async def close_supabase() -> None:
+    global _client
+    async with _client_lock:
+        if _client is None:
+            return
+        if _client._postgrest is not None:
+            await _client._postgrest.aclose()
+        if _client._storage is not None:
+            await _client._storage.aclose()
+        _client = None
+
+@asynccontextmanager
+async def supabase_auth() -> AsyncIterator[AsyncSupabaseAuthClient]:
+    """
+    A short-lived Supabase Auth client with the service role key, for sign-up, sign-in,
+    sign-out and admin user calls. Its session lives and dies with it, apart from the
+    shared data client.
+    """
+    client = AsyncSupabaseAuthClient(
+        url=f"{SUPABASE_URL}/auth/v1",
+        headers={"apiKey": SUPABASE_KEY, "Authorization": f"Bearer {SUPABASE_KEY}"},
+        auto_refresh_token=False,
+        persist_session=False,
+        storage=AsyncMemoryStorage(),
+    )
+    try:
+        yield client
+    finally:
+        await client.close()
 
 async def get_supabase() -> AsyncClient:
-    print("Creating Supabase client with service role key")
-    supabase: AsyncClient = await create_async_client(SUPABASE_URL, SUPABASE_KEY)
-    return supabase
\ No newline at end of file
+    """
+    Return the process-wide Supabase client. Usable directly or as a FastAPI dependency.
+    """
+    if _client is None:
+        return await init_supabase()
+    return _client
@@ -0,0 +1,34 @@
+# gunicorn.conf.py
+"""
+Multi-worker serving with uvicorn workers under gunicorn.
+
+    WEB_CONCURRENCY=4 gunicorn -c gunicorn.conf.py main:app
+    WEB_CONCURRENCY=4 MODEL_PRELOAD=true INFERENCE_BACKEND=tflite INFERENCE_BACKEND_PATH=model/Inception.tflite gunicorn -c gunicorn.conf.py main:app
+
+With MODEL_PRELOAD=true and a fork-safe backend (tflite), the master loads the model
+once before forking and the workers share its pages copy-on-write. Other backends
+fall back to one model per worker. INFERENCE_THREADS defaults to cores / workers so
+the workers' inference thread pools don't oversubscribe the CPU.
+"""
+import os
+
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = os.getenv("BIND", "0.0.0.0:8000")
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+preload_app = True
+
+# Must be set before the app (and config.py) is imported below
+os.environ.setdefault("INFERENCE_THREADS", str(max(1, (os.cpu_count() or 1) // workers)))
+os.environ.setdefault("INFERENCE_INTER_OP_THREADS", "1")
+
+def on_starting(server):
+    from config import MODEL_PRELOAD
+    if MODEL_PRELOAD:
+        from services.classification import preload_model
+        preload_model()
+
+def post_fork(server, worker):
+    from utils.process import memory_usage
+    memory = memory_usage()
+    server.log.info(f"Worker {worker.pid} forked: rss={memory.get('rss_bytes')} pss={memory.get('pss_bytes')} shared={memory.get('shared_bytes')}")
@@ -1,20 +1,50 @@
 from fastapi import FastAPI, Request
-from routers import users, images, classifications, auth, logs
-from services.classification import load_model_wrapper
+from fastapi.responses import JSONResponse
+from routers import users, images, classifications, auth, logs, models, tiles, admin
+from services.classification import load_model_wrapper, start_model_loading, model_status, start_batching, stop_batching, classification_job, scene_job
+from services.image import convert_image_job
+from services.jobs import start_jobs, stop_jobs
+from services.log import start_log_sink, stop_log_sink
+from services.executor import start_executors, shutdown_executors
+from database.supabase import init_supabase, close_supabase
+from utils.http import init_http_client, close_http_client
+from utils.process import memory_usage
+from config import MODEL_LOAD_MODE
 from contextlib import asynccontextmanager
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Inside lifespan - before loading model")
-    try:
-        load_model_wrapper()
-        print("Model loaded successfully")
-    except Exception as e:
-        print(f"Failed to load model: {str(e)}")
-        raise 
+    await init_supabase()
+    await init_http_client()
+    if MODEL_LOAD_MODE == "eager":
+        try:
+            load_model_wrapper()
+            print("Model loaded successfully")
+        except Exception as e:
+            print(f"Failed to load model: {str(e)}")
+            raise 
+    elif MODEL_LOAD_MODE == "background":
+        # Serve non-model routes right away; /ready reports when the model is in
+        start_model_loading()
+    elif MODEL_LOAD_MODE != "lazy":
+        raise ValueError(f"Unsupported MODEL_LOAD_MODE: {MODEL_LOAD_MODE}")
+    start_executors()
+    await start_log_sink()
+    await start_batching()
+    await start_jobs({"classification": classification_job, "scene": scene_job, "cog": convert_image_job})
+    memory = memory_usage()
+    print(f"Worker {memory['pid']} memory: rss={memory.get('rss_bytes')} pss={memory.get('pss_bytes')} shared={memory.get('shared_bytes')}")
     print("Yielding from lifespan")
     yield
     print("Lifespan shutdown")
+    await stop_jobs()
+    await stop_batching()
+    # After the jobs, which log too, and before the Supabase client goes away
+    await stop_log_sink()
+    shutdown_executors()
+    await close_http_client()
+    await close_supabase()
 
 app = FastAPI(
     title="Crop Health Analysis Backend",
@@ -26,7 +56,10 @@ app = FastAPI(
         {"name": "Users", "description": "User management endpoints"},
         {"name": "Images", "description": "Image upload and management endpoints"},
         {"name": "Classifications", "description": "Image classification endpoints"},
+        {"name": "Models", "description": "Model version registry and routing (admin)"},
+        {"name": "Tiles", "description": "NDVI map tiles for web map overlays"},
         {"name": "Logs", "description": "Log management endpoints"},
+        {"name": "Admin", "description": "Listing and management of all users and images (admin)"},
     ],
     openapi_extra={
         "security": [{"BearerAuth": []}],
@@ -52,8 +85,19 @@ app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(images.router)
 app.include_router(classifications.router)
+app.include_router(models.router)
+app.include_router(tiles.router)
 app.include_router(logs.router)
+app.include_router(admin.router)
 
 @app.get("/")
 async def root():
-    return {"message": "Welcome to the Crop Health Analysis Backend"}
\ No newline at end of file
+    return {"message": "Welcome to the Crop Health Analysis Backend"}
+
+@app.get("/ready")
+async def ready():
+    status = model_status()
+    # Lazy mode loads on the first classification, so an unloaded model is still ready to serve
+    if status["state"] == "ready" or (MODEL_LOAD_MODE == "lazy" and status["state"] == "not_loaded"):
+        return status
+    return JSONResponse(status_code=503, content=status)
\ No newline at end of file
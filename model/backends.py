@@ -0,0 +1,168 @@
+import threading
+import numpy as np
+
+# Placeholder the NaNHandler layer maps back to 0 inside the graph
+NAN_PLACEHOLDER = -2
+BACKENDS = ("keras", "savedmodel", "tflite", "onnx")
+# Backends that can be built in a parent process and used after fork(). TF and ONNX
+# Runtime start thread pools while loading, which forked children can't use.
+FORK_SAFE_BACKENDS = ("tflite",)
+
+def sanitize(batch):
+    """Host-side half of NaNHandler: float32 input with NaNs replaced by the -2 placeholder."""
+    return np.nan_to_num(np.asarray(batch, dtype=np.float32), nan=NAN_PLACEHOLDER)
+
+def predict_batch(model, batch):
+    """Run one forward pass over a stacked batch and return (class_idx, confidence) per sample"""
+    batch = sanitize(batch)
+    probs = np.asarray(model.predict_on_batch(batch))
+    class_idx = np.argmax(probs, axis=1)
+    confidence = probs[np.arange(len(probs)), class_idx]
+    return [(int(idx), float(conf)) for idx, conf in zip(class_idx, confidence)]
+
+def warm_up(model, batch_sizes=(1,), input_size=299):
+    """Run throwaway batches so graph tracing and tensor allocation happen before real traffic."""
+    for batch_size in batch_sizes:
+        predict_batch(model, np.zeros((batch_size, input_size, input_size, 3), dtype=np.float32))
+
+class InferenceBackend:
+    """
+    Common interface for exported model runtimes. Exposes the same predict /
+    predict_on_batch calls as a Keras model, so model_script.predict and
+    predict_batch work unchanged whichever backend is loaded.
+    """
+    name = None
+
+    def run(self, batch):
+        """Return class probabilities for a sanitized (N, H, W, 3) float32 batch."""
+        raise NotImplementedError
+
+    def predict_on_batch(self, batch):
+        return self.run(sanitize(batch))
+
+    def predict(self, data, verbose=0):
+        data = np.asarray(data)
+        if data.ndim == 3:
+            data = np.expand_dims(data, axis=0)
+        return self.predict_on_batch(data)
+
+class SavedModelBackend(InferenceBackend):
+    """TF SavedModel exported with model.export(); runs the traced concrete function directly."""
+    name = "savedmodel"
+
+    def __init__(self, path):
+        import tensorflow as tf
+        self._tf = tf
+        loaded = tf.saved_model.load(path)
+        self._loaded = loaded  # keep the trackable alive for the function's variables
+        if hasattr(loaded, "serve"):
+            self._fn = loaded.serve
+        else:
+            signature = loaded.signatures["serving_default"]
+            self._fn = lambda x: next(iter(signature(x).values()))
+
+    def run(self, batch):
+        return np.asarray(self._fn(self._tf.constant(batch)))
+
+class TFLiteBackend(InferenceBackend):
+    """TFLite flatbuffer; uses tflite_runtime when installed, else the TF bundled interpreter."""
+    name = "tflite"
+
+    def __init__(self, path, num_threads=None, shared_weights=False):
+        try:
+            from tflite_runtime.interpreter import Interpreter, OpResolverType
+        except ImportError:
+            import tensorflow as tf
+            Interpreter, OpResolverType = tf.lite.Interpreter, tf.lite.experimental.OpResolverType
+        # model_path is mmap'ed read-only, so workers share the flatbuffer pages. The default
+        # XNNPACK delegate repacks weights into private memory; shared_weights turns it off
+        # to keep the weights shared at the cost of slower kernels.
+        resolver = OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES if shared_weights else OpResolverType.AUTO
+        self._interpreter = Interpreter(model_path=path, num_threads=num_threads, experimental_op_resolver_type=resolver)
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._batch_size = None
+        # The interpreter is stateful; one call at a time
+        self._lock = threading.Lock()
+
+    def _quantize(self, batch):
+        scale, zero_point = self._input["quantization"]
+        if self._input["dtype"] == np.float32 or not scale:
+            return batch.astype(self._input["dtype"], copy=False)
+        return np.round(batch / scale + zero_point).astype(self._input["dtype"])
+
+    def _dequantize(self, output):
+        scale, zero_point = self._output["quantization"]
+        if self._output["dtype"] == np.float32 or not scale:
+            return output.astype(np.float32, copy=False)
+        return (output.astype(np.float32) - zero_point) * scale
+
+    def run(self, batch):
+        with self._lock:
+            if len(batch) != self._batch_size:
+                self._interpreter.resize_tensor_input(self._input["index"], batch.shape)
+                self._interpreter.allocate_tensors()
+                self._batch_size = len(batch)
+            self._interpreter.set_tensor(self._input["index"], self._quantize(batch))
+            self._interpreter.invoke()
+            return self._dequantize(self._interpreter.get_tensor(self._output["index"]))
+
+class OnnxBackend(InferenceBackend):
+    """ONNX Runtime session on the CPU execution provider. Requires the optional onnxruntime package."""
+    name = "onnx"
+
+    def __init__(self, path, num_threads=None, inter_op_threads=None):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("INFERENCE_BACKEND=onnx requires the onnxruntime package")
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        if inter_op_threads:
+            options.inter_op_num_threads = inter_op_threads
+        self._session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self._input_name = self._session.get_inputs()[0].name
+
+    def run(self, batch):
+        return self._session.run(None, {self._input_name: batch})[0]
+
+def resolve_backend(backend, path, variant=None, variants_dir=None):
+    """
+    (backend, path) to serve. A quantized variant other than float32 overrides the
+    configured backend with the TFLite file accepted by model/quantize.py.
+    """
+    if not variant or variant == "float32":
+        return backend, path
+    from model.quantize import resolve_variant
+    return "tflite", resolve_variant(variant, variants_dir)
+
+def configure_tf_threads(intra_op_threads=None, inter_op_threads=None):
+    """Cap TensorFlow's thread pools. Only takes effect before TF runs its first op."""
+    import tensorflow as tf
+    try:
+        if intra_op_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        if inter_op_threads:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    except RuntimeError as e:
+        print(f"TensorFlow already initialized, thread caps not applied: {e}")
+
+def load_backend(backend, path, num_threads=None, inter_op_threads=None, shared_weights=False):
+    """
+    Load a model for the given backend. "keras" returns the Keras model itself;
+    the others wrap an exported artifact produced by model/export.py. num_threads
+    caps intra-op parallelism for every backend.
+    """
+    if backend in ("keras", "savedmodel"):
+        configure_tf_threads(num_threads, inter_op_threads)
+    if backend == "keras":
+        from model.model_script import load_model
+        return load_model(model_path=path)
+    if backend == "savedmodel":
+        return SavedModelBackend(path)
+    if backend == "tflite":
+        return TFLiteBackend(path, num_threads=num_threads, shared_weights=shared_weights)
+    if backend == "onnx":
+        return OnnxBackend(path, num_threads=num_threads, inter_op_threads=inter_op_threads)
+    raise ValueError(f"Unsupported inference backend: {backend}")
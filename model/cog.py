@@ -0,0 +1,56 @@
+import math
+import rasterio
+from rasterio.io import MemoryFile
+from rasterio.shutil import copy as copy_dataset
+
+def raster_info(src):
+    """Layout and georeferencing of an open dataset, as JSON-serializable values for images.metadata."""
+    return {
+        "width": src.width,
+        "height": src.height,
+        "count": src.count,
+        "dtype": src.dtypes[0],
+        # JSON has no NaN; a NaN nodata is recorded as the string "nan"
+        "nodata": "nan" if src.nodata is not None and math.isnan(src.nodata) else src.nodata,
+        "crs": src.crs.to_string() if src.crs else None,
+        "bounds": list(src.bounds),
+        "transform": list(src.transform)[:6],
+        "block_shape": list(src.block_shapes[0]),
+        "tiled": bool(src.profile.get("tiled", False)),
+        "compression": src.compression.value if src.compression else None,
+        "overviews": src.overviews(1),
+    }
+
+def write_cog(src, dst_path, block_size=512, compress="deflate", overview_resampling="average"):
+    """
+    Rewrite an open dataset as a Cloud-Optimized GeoTIFF: internally tiled and
+    compressed, with overviews down to one block, laid out so a reader can fetch
+    the header, then only the tiles and overview level it needs, with range requests.
+    """
+    copy_dataset(
+        src, dst_path,
+        driver="COG",
+        BLOCKSIZE=block_size,
+        COMPRESS=compress.upper(),
+        PREDICTOR="YES",
+        OVERVIEWS="AUTO",
+        OVERVIEW_RESAMPLING=overview_resampling.upper(),
+        NUM_THREADS="ALL_CPUS",
+    )
+    with rasterio.open(dst_path) as cog:
+        return raster_info(cog)
+
+def convert_to_cog(content, block_size=512, compress="deflate", overview_resampling="average"):
+    """Convert GeoTIFF bytes to COG bytes. Returns (cog_bytes, {"source": ..., "cog": ...})."""
+    with MemoryFile(content) as memfile, memfile.open() as src:
+        source = raster_info(src)
+        with MemoryFile(ext=".tif") as out:
+            cog = write_cog(src, out.name, block_size, compress, overview_resampling)
+            return out.read(), {"source": source, "cog": cog}
+
+def convert_file_to_cog(src_path, dst_path, block_size=512, compress="deflate", overview_resampling="average"):
+    """Like convert_to_cog, but between paths/URLs, so a large scene never has to fit in memory."""
+    with rasterio.open(src_path) as src:
+        source = raster_info(src)
+        cog = write_cog(src, dst_path, block_size, compress, overview_resampling)
+    return {"source": source, "cog": cog}
@@ -0,0 +1,34 @@
+import numpy as np
+
+# Same stops as the map legend (model/visualization.py), red (bare) to green (dense)
+NDVI_COLORS = ['#d73027', '#fee08b', '#ffffbf', '#d9ef8b', '#1a9850']
+NDVI_RANGE = (-1.0, 1.0)
+
+def build_lut(colors, size=256):
+    """Linearly interpolate hex colour stops into a (size, 4) uint8 RGBA lookup table."""
+    stops = np.array([[int(c[i:i + 2], 16) for i in (1, 3, 5)] for c in colors], dtype=np.float32)
+    positions = np.linspace(0, 1, len(stops))
+    samples = np.linspace(0, 1, size)
+    lut = np.empty((size, 4), dtype=np.uint8)
+    for channel in range(3):
+        lut[:, channel] = np.round(np.interp(samples, positions, stops[:, channel]))
+    lut[:, 3] = 255
+    return lut
+
+NDVI_LUT = build_lut(NDVI_COLORS)
+
+def apply_colormap(values, lut=NDVI_LUT, value_range=NDVI_RANGE, mask=None):
+    """
+    Map a 2-D array to RGBA with one table lookup per pixel. NaN and masked
+    pixels come out fully transparent.
+    """
+    vmin, vmax = value_range
+    values = np.asarray(values, dtype=np.float32)
+    invalid = np.isnan(values)
+    if mask is not None:
+        invalid |= mask
+    scaled = (np.nan_to_num(values, nan=vmin) - vmin) * ((len(lut) - 1) / (vmax - vmin))
+    indices = np.clip(scaled, 0, len(lut) - 1).astype(np.uint8 if len(lut) <= 256 else np.intp)
+    rgba = lut[indices]
+    rgba[invalid, 3] = 0
+    return rgba
@@ -0,0 +1,92 @@
+"""
+Export the Keras model to the optimized inference backends and check them against it.
+
+    python -m model.export --format tflite --out model/Inception.tflite
+    python -m model.export --format savedmodel --out model/Inception_savedmodel --samples data/chunks
+    python -m model.export --check tflite --out model/Inception.tflite
+
+Every export is followed by a parity check on sample tiles: .npy NDVI chunks from
+--samples (preprocessed exactly as the API does), or seeded random NDVI tiles with
+NaN holes when no samples are given. The command exits non-zero if top-1 agreement
+or the probability error is outside tolerance.
+"""
+import argparse
+import glob
+import os
+import sys
+import numpy as np
+from model.backends import load_backend, sanitize
+from model.image_processing import preprocess_ndvi_array
+
+def load_samples(samples_dir=None, count=64, input_size=299):
+    """Return a (count, input_size, input_size, 3) batch of model-ready sample tiles."""
+    if samples_dir:
+        paths = sorted(glob.glob(os.path.join(samples_dir, "**", "*.npy"), recursive=True))[:count]
+        if not paths:
+            raise ValueError(f"No .npy samples found under {samples_dir}")
+        tiles = [preprocess_ndvi_array(np.load(path).astype(np.float32), input_size) for path in paths]
+    else:
+        rng = np.random.default_rng(0)
+        tiles = []
+        for _ in range(count):
+            tile = rng.uniform(-0.2, 0.9, (500, 500)).astype(np.float32)
+            tile[rng.random((500, 500)) < 0.05] = np.nan  # cloud-masked pixels
+            tiles.append(preprocess_ndvi_array(tile, input_size))
+    return np.stack(tiles)
+
+def export_model(keras_path, fmt, out):
+    import tensorflow as tf
+    from model.model_script import load_model
+    model = load_model(model_path=keras_path)
+    if fmt == "savedmodel":
+        model.export(out, format="tf_saved_model")
+    elif fmt == "tflite":
+        converter = tf.lite.TFLiteConverter.from_keras_model(model)
+        converter.optimizations = []
+        with open(out, "wb") as f:
+            f.write(converter.convert())
+    elif fmt == "onnx":
+        model.export(out, format="onnx")  # needs tf2onnx
+    else:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    print(f"Exported {fmt} model to {out}")
+
+def check_parity(keras_path, backend, path, samples, batch_size=16):
+    """Compare backend predictions with the Keras model. Returns (top1_agreement, max_abs_prob_diff)."""
+    reference = load_backend("keras", keras_path)
+    candidate = load_backend(backend, path)
+    ref_probs, cand_probs = [], []
+    for start in range(0, len(samples), batch_size):
+        batch = samples[start:start + batch_size]
+        ref_probs.append(np.asarray(reference.predict_on_batch(sanitize(batch))))
+        cand_probs.append(np.asarray(candidate.predict_on_batch(batch)))
+    ref_probs = np.concatenate(ref_probs)
+    cand_probs = np.concatenate(cand_probs)
+    agreement = float(np.mean(ref_probs.argmax(axis=1) == cand_probs.argmax(axis=1)))
+    max_diff = float(np.max(np.abs(ref_probs - cand_probs)))
+    return agreement, max_diff
+
+def main(args):
+    if args.format:
+        export_model(args.keras, args.format, args.out)
+    backend = args.format or args.check
+    samples = load_samples(args.samples, args.count)
+    agreement, max_diff = check_parity(args.keras, backend, args.out, samples)
+    print(f"{backend}: top-1 agreement {agreement:.2%} over {len(samples)} tiles, max |dp| {max_diff:.2e}")
+    if agreement < args.min_agreement or max_diff > args.max_diff:
+        print(f"Parity check failed (need >= {args.min_agreement:.2%} agreement and max |dp| <= {args.max_diff})")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--format", choices=["savedmodel", "tflite", "onnx"], help="export and then check")
+    action.add_argument("--check", choices=["savedmodel", "tflite", "onnx"], help="only check an existing export")
+    parser.add_argument("--out", required=True, help="exported artifact path")
+    parser.add_argument("--keras", default="model/Inception.keras")
+    parser.add_argument("--samples", help="directory of .npy NDVI chunks")
+    parser.add_argument("--count", type=int, default=64)
+    parser.add_argument("--min-agreement", type=float, default=1.0)
+    parser.add_argument("--max-diff", type=float, default=1e-4)
+    sys.exit(main(parser.parse_args()))
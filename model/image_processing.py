@@ -1,125 +1,110 @@
 import numpy as np
 import cv2
 import rasterio
-import tempfile
-import os
-import matplotlib.pyplot as plt
-from rasterio.crs import CRS
+import io
+from rasterio.enums import Resampling
+from rasterio.io import MemoryFile
 from shapely.geometry import box, mapping
-from streamlit_folium import folium_static
-from branca.colormap import LinearColormap
-import folium
+from model.indices import vari, to_model_channels
 
-def rgb_to_vari(img):
+def rgb_to_vari(img, out=None):
     """Calculate VARI from RGB image."""
-    r = img[:, :, 0].astype(np.float32)
-    g = img[:, :, 1].astype(np.float32)
-    b = img[:, :, 2].astype(np.float32)
-
-    denominator = r + g - b
-    denominator[denominator == 0] = 1e-10  # Avoid division by zero
-
-    vari = (g - r) / denominator
-    return np.clip(vari, -1, 1)
-
-ndvi_legend = LinearColormap(
-    colors=['#d73027', '#fee08b', '#ffffbf', '#d9ef8b', '#1a9850'],
-    vmin=-1, vmax=1,
-    caption='NDVI value'
-)
+    return vari(img, out=out)
+
+# Decimated reads stay this many times above the target size so the blur/resize
+# that follows still sees some detail
+READ_OVERSAMPLE = 2
+READ_RESAMPLING = Resampling.average
+OVERLAY_MAX_SIZE = 1024  # longest side of the raster read for map overlays
+
+def read_decimated(src, out_shape, band=1):
+    """
+    Read a band at out_shape (height, width) instead of full resolution. GDAL serves
+    the read from the closest internal/external overview when one exists.
+    """
+    out_shape = (min(out_shape[0], src.height), min(out_shape[1], src.width))
+    if out_shape == (src.height, src.width):
+        return src.read(band).astype(np.float32)
+    return src.read(band, out_shape=out_shape, resampling=READ_RESAMPLING).astype(np.float32)
+
+def fit_shape(height, width, max_size):
+    """Largest (height, width) with the same aspect ratio whose longest side is <= max_size."""
+    scale = max(height, width) / max_size
+    if scale <= 1:
+        return height, width
+    return max(1, round(height / scale)), max(1, round(width / scale))
 
 def preprocess_image(img_rgb):
     """Convert RGB image to VARI, resize, and format for model."""
-    vari = rgb_to_vari(img_rgb)
-    resized = cv2.resize(vari, (299, 299))
-    return np.stack([resized] * 3, axis=-1)
+    resized = cv2.resize(rgb_to_vari(img_rgb), (299, 299))
+    return to_model_channels(resized)
+
+def geodata_from_dataset(src):
+    """Extract geospatial metadata from an open GeoTIFF dataset."""
+    if not src.crs or not src.bounds:
+        return None  # Not a valid GeoTIFF
+
+    bounds = src.bounds
+    geojson = {
+        "type": "FeatureCollection",
+        "features": [{
+            "type": "Feature",
+            "geometry": mapping(box(bounds.left, bounds.bottom, bounds.right, bounds.top)),
+            "properties": {"CRS": str(src.crs)}
+        }]
+    }
+    return geojson
 
 def get_geodata(file_path):
     """Extract geospatial metadata from GeoTIFF."""
     try:
         with rasterio.open(file_path) as src:
-            if not src.crs or not src.bounds:
-                return None  # Not a valid GeoTIFF
-
-            bounds = src.bounds
-            geojson = {
-                "type": "FeatureCollection",
-                "features": [{
-                    "type": "Feature",
-                    "geometry": mapping(box(bounds.left, bounds.bottom, bounds.right, bounds.top)),
-                    "properties": {"CRS": str(src.crs)}
-                }]
-            }
-            return geojson
+            return geodata_from_dataset(src)
     except Exception as e:
         print(f"Error reading geodata: {e}")
         return None
     
-def plot_ndvi_overlay(tiff_path, zoom=14):
+def preprocess_ndvi_array(ndvi, input_size=299):
+    """Fill NaNs, smooth, resize and format a single-band NDVI array for the model."""
+    ndvi = ndvi.astype(np.float32, copy=False)
+    valid_mean = np.nanmean(ndvi)
+    processed = np.where(np.isnan(ndvi), valid_mean, ndvi)
+    smoothed = cv2.GaussianBlur(processed, (5, 5), 0)
+    resized = cv2.resize(smoothed, (input_size, input_size))
+    return to_model_channels(resized)
+
+NPY_MAGIC = b"\x93NUMPY"
+
+def _read_ndvi_dataset(src):
+    """Read the NDVI band and geodata from one open dataset."""
+    target = 299 * READ_OVERSAMPLE
+    return read_decimated(src, (target, target)), geodata_from_dataset(src)
+
+def decode_ndvi(content):
+    """Decode in-memory .npy or GeoTIFF bytes into (ndvi, geo_data) without touching disk."""
+    if bytes(memoryview(content)[:len(NPY_MAGIC)]) == NPY_MAGIC:
+        return np.load(io.BytesIO(content), allow_pickle=False), None
     try:
-        with rasterio.open(tiff_path) as src:
-            ndvi = src.read(1).astype(np.float32)
-            bounds = src.bounds
-
-        norm_ndvi = (ndvi + 1) / 2
-        cmap = plt.get_cmap('RdYlGn')
-        rgba = cmap(norm_ndvi)
-        rgb = (rgba[..., :3] * 255).astype(np.uint8)
-
-        center_lat = (bounds.bottom + bounds.top) / 2
-        center_lon = (bounds.left + bounds.right) / 2
-
-        m = folium.Map(
-            location=[center_lat, center_lon],
-            zoom_start=zoom,
-            tiles='https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
-            attr='Esri World Imagery'
-        )
-
-        folium.raster_layers.ImageOverlay(
-            image=rgb,
-            bounds=[[bounds.bottom, bounds.left], [bounds.top, bounds.right]],
-            opacity=0.6
-        ).add_to(m)
+        with MemoryFile(bytes(content)) as memfile, memfile.open() as src:
+            return _read_ndvi_dataset(src)
+    except rasterio.errors.RasterioIOError as e:
+        raise ValueError(f"Unsupported file format: {e}")
 
-        ndvi_legend.add_to(m)
-        return m
-    except Exception as e:
-        print(f"Geospatial visualization error: {e}")
-        return None
-    
 def preprocess_ndvi(input_data):
-    """Process NDVI files and return processed data with geodata."""
-    geo_data = None
-
+    """Process NDVI files (path, bytes or file-like) and return processed data with geodata."""
     if isinstance(input_data, str):  # It's a file path
-        file_path = input_data
         file_name = input_data.lower()
-    else:  # It's an uploaded file (file-like object)
-        with tempfile.NamedTemporaryFile(delete=False) as tmp_file:
-            tmp_file.write(input_data.read())
-            file_path = tmp_file.name
-        file_name = input_data.name.lower()
-
-    try:
         if file_name.endswith('.npy'):
-            ndvi = np.load(file_path)
+            ndvi, geo_data = np.load(input_data), None
         elif file_name.endswith(('.tif', '.tiff')):
-            geo_data = get_geodata(file_path)
-            with rasterio.open(file_path) as src:
-                ndvi = src.read(1).astype(np.float32)
+            with rasterio.open(input_data) as src:
+                ndvi, geo_data = _read_ndvi_dataset(src)
         else:
             raise ValueError("Unsupported file format")
+    else:  # Raw bytes or an uploaded file (file-like object), decoded in memory
+        content = input_data if isinstance(input_data, (bytes, bytearray, memoryview)) else input_data.read()
+        ndvi, geo_data = decode_ndvi(content)
 
-        valid_mean = np.nanmean(ndvi)
-        processed = np.where(np.isnan(ndvi), valid_mean, ndvi)
-        smoothed = cv2.GaussianBlur(processed, (5, 5), 0)
-        resized = cv2.resize(smoothed, (299, 299))
-        processed_data = np.stack([resized]*3, axis=-1)
-
-        return processed_data, geo_data
-
-    finally:
-        if not isinstance(input_data, str):  # Clean up only if we created a temp file
-            os.unlink(file_path)
+    processed_data = preprocess_ndvi_array(ndvi)
 
+    return processed_data, geo_data
@@ -0,0 +1,83 @@
+import threading
+import numpy as np
+
+# Per-thread scratch space so kernels running on executor threads don't share buffers
+_workspace = threading.local()
+# Largest buffer a thread keeps between calls (16 MB of float32); bigger images get a throwaway one
+SCRATCH_MAX_PIXELS = 2048 * 2048
+
+def _scratch(name, shape):
+    """Return a float32 buffer of the given shape, reused by the current thread unless it is oversized."""
+    if np.prod(shape) > SCRATCH_MAX_PIXELS:
+        return np.empty(shape, dtype=np.float32)
+    buffers = getattr(_workspace, "buffers", None)
+    if buffers is None:
+        buffers = _workspace.buffers = {}
+    buffer = buffers.get(name)
+    if buffer is None or buffer.shape != shape:
+        buffer = buffers[name] = np.empty(shape, dtype=np.float32)
+    return buffer
+
+def _output(out, shape):
+    if out is None:
+        return np.empty(shape, dtype=np.float32)
+    if out.shape != shape or out.dtype != np.float32:
+        raise ValueError(f"out must be float32 with shape {shape}, got {out.dtype} {out.shape}")
+    return out
+
+def _channels(img, channel_order):
+    if channel_order == "rgb":
+        return img[..., 0], img[..., 1], img[..., 2]
+    if channel_order == "bgr":
+        return img[..., 2], img[..., 1], img[..., 0]
+    raise ValueError(f"Unsupported channel order: {channel_order}")
+
+def vari(img, out=None, channel_order="rgb"):
+    """
+    Visible Atmospherically Resistant Index (G - R) / (R + G - B), clipped to [-1, 1].
+    Channels are read as strided views and cast inside the ufuncs, so the only
+    allocations are the output (unless `out` is given) and a boolean zero mask.
+    """
+    r, g, b = _channels(img, channel_order)
+    shape = r.shape
+    out = _output(out, shape)
+    denominator = _scratch("denominator", shape)
+
+    np.subtract(g, r, out=out, dtype=np.float32)
+    np.add(r, g, out=denominator, dtype=np.float32)
+    np.subtract(denominator, b, out=denominator, dtype=np.float32)
+    denominator[denominator == 0] = 1e-10  # Avoid division by zero
+    np.divide(out, denominator, out=out)
+    return np.clip(out, -1, 1, out=out)
+
+def pseudo_ndvi(img, out=None, channel_order="rgb"):
+    """NDVI-like index from visible bands, (G - R) / (G + R), clipped to [-1, 1]."""
+    r, g, _ = _channels(img, channel_order)
+    shape = r.shape
+    out = _output(out, shape)
+    denominator = _scratch("denominator", shape)
+
+    np.subtract(g, r, out=out, dtype=np.float32)
+    np.add(g, r, out=denominator, dtype=np.float32)
+    denominator += 1e-8  # Avoid division by zero
+    np.divide(out, denominator, out=out)
+    return np.clip(out, -1, 1, out=out)
+
+def ndvi(nir, red, out=None):
+    """NDVI from separate NIR and red bands, (NIR - Red) / (NIR + Red); 0 where both are 0."""
+    shape = np.broadcast_shapes(np.shape(nir), np.shape(red))
+    out = _output(out, shape)
+    denominator = _scratch("denominator", shape)
+
+    np.subtract(nir, red, out=out, dtype=np.float32)
+    np.add(nir, red, out=denominator, dtype=np.float32)
+    np.divide(out, denominator, out=out, where=denominator != 0)
+    out[denominator == 0] = 0
+    return np.clip(out, -1, 1, out=out)
+
+def to_model_channels(index):
+    """
+    Present a single-band (H, W) index as (H, W, 3) for Inception without copying.
+    The result is a read-only view; predict/batching copy it when they stack inputs.
+    """
+    return np.broadcast_to(index[..., np.newaxis], index.shape + (3,))
@@ -0,0 +1,170 @@
+import math
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+import numpy as np
+import cv2
+import rasterio
+from rasterio.crs import CRS
+from rasterio.enums import Resampling
+from rasterio.vrt import WarpedVRT
+from rasterio.warp import calculate_default_transform, transform_bounds
+from rasterio.windows import from_bounds
+from model.colormap import apply_colormap
+
+# XYZ (slippy map) tiles in Web Mercator, as used by Leaflet/folium TileLayer
+WEB_MERCATOR = CRS.from_epsg(3857)
+MERCATOR_ORIGIN = 20037508.342789244
+MAP_TILE_SIZE = 256
+
+def tile_bounds(z, x, y):
+    """(left, bottom, right, top) of tile z/x/y in Web Mercator metres."""
+    span = 2 * MERCATOR_ORIGIN / 2 ** z
+    left = -MERCATOR_ORIGIN + x * span
+    top = MERCATOR_ORIGIN - y * span
+    return left, top - span, left + span, top
+
+def encode_png(rgba):
+    ok, encoded = cv2.imencode(".png", cv2.cvtColor(rgba, cv2.COLOR_RGBA2BGRA))
+    if not ok:
+        raise ValueError("PNG encoding failed")
+    return encoded.tobytes()
+
+EMPTY_TILE = encode_png(np.zeros((MAP_TILE_SIZE, MAP_TILE_SIZE, 4), dtype=np.uint8))
+
+class TileSource:
+    """
+    A single-band raster warped on the fly to Web Mercator. Tiles are windowed,
+    decimated reads of the warped view, so GDAL fetches only the blocks (and, for
+    COGs, the overview level) a tile covers. Datasets aren't thread-safe, so reads
+    are serialized per source.
+    """
+    def __init__(self, path):
+        with rasterio.Env(GDAL_DISABLE_READDIR_ON_OPEN="EMPTY_DIR", VSI_CACHE=True):
+            self.src = rasterio.open(path)
+        if self.src.crs is None:
+            self.src.close()
+            raise ValueError("Image is not georeferenced")
+        transform, width, height = calculate_default_transform(
+            self.src.crs, WEB_MERCATOR, self.src.width, self.src.height, *self.src.bounds
+        )
+        self.vrt = WarpedVRT(
+            self.src, crs=WEB_MERCATOR, transform=transform, width=width, height=height,
+            resampling=Resampling.bilinear, dtype="float32", nodata=np.nan
+        )
+        self.bounds = self.vrt.bounds
+        self.lonlat_bounds = transform_bounds(self.src.crs, "EPSG:4326", *self.src.bounds)
+        # Deepest zoom with tiles no finer than the source; shallowest that still shows the scene as ~one tile
+        self.max_zoom = max(0, math.ceil(math.log2(2 * MERCATOR_ORIGIN / (MAP_TILE_SIZE * transform.a))))
+        extent = max(self.bounds.right - self.bounds.left, self.bounds.top - self.bounds.bottom)
+        self.min_zoom = min(self.max_zoom, max(0, math.floor(math.log2(2 * MERCATOR_ORIGIN / extent))))
+        self.lock = threading.Lock()
+
+    def read_tile(self, z, x, y, size=MAP_TILE_SIZE):
+        """NDVI values for the tile (NaN outside the raster), or None if the tile misses it."""
+        left, bottom, right, top = tile_bounds(z, x, y)
+        b = self.bounds
+        if left >= b.right or right <= b.left or bottom >= b.top or top <= b.bottom:
+            return None
+        # WarpedVRT doesn't allow boundless reads: read the overlap into its part of the tile
+        span = right - left
+        x0 = round((max(left, b.left) - left) / span * size)
+        x1 = round((min(right, b.right) - left) / span * size)
+        y0 = round((top - min(top, b.top)) / span * size)
+        y1 = round((top - max(bottom, b.bottom)) / span * size)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        window = from_bounds(max(left, b.left), max(bottom, b.bottom), min(right, b.right), min(top, b.top), self.vrt.transform)
+        with self.lock:
+            data = self.vrt.read(1, window=window, out_shape=(y1 - y0, x1 - x0), resampling=Resampling.average)
+        tile = np.full((size, size), np.nan, dtype=np.float32)
+        tile[y0:y1, x0:x1] = data
+        return tile
+
+    def render(self, z, x, y, size=MAP_TILE_SIZE):
+        """Colour-mapped PNG bytes for tile z/x/y; EMPTY_TILE where there's no data."""
+        tile = self.read_tile(z, x, y, size)
+        if tile is None or np.isnan(tile).all():
+            return EMPTY_TILE
+        return encode_png(apply_colormap(tile))
+
+    def tilejson(self, tile_url):
+        west, south, east, north = self.lonlat_bounds
+        return {
+            "tilejson": "2.2.0",
+            "tiles": [tile_url],
+            "bounds": [west, south, east, north],
+            "center": [(west + east) / 2, (south + north) / 2, self.min_zoom],
+            "minzoom": self.min_zoom,
+            "maxzoom": self.max_zoom,
+        }
+
+    def close(self):
+        with self.lock:
+            self.vrt.close()
+            self.src.close()
+
+class TileSourcePool:
+    """
+    Keeps the most recently used TileSources open, so a map pan doesn't reopen (and
+    re-fetch the header of) the raster per tile. Sources are leased: one evicted
+    while another thread is still reading from it is closed when that lease ends.
+    """
+    def __init__(self, max_open=16):
+        self.max_open = max(1, max_open)
+        self._sources = OrderedDict()
+        self._leases = {}  # id(source) -> open leases
+        self._evicted = set()  # ids of evicted sources still leased
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def lease(self, key, path):
+        """Yield the open TileSource for key, opening it if needed."""
+        source = self._acquire(key, path)
+        try:
+            yield source
+        finally:
+            self._release(source)
+
+    def _acquire(self, key, path):
+        with self._lock:
+            source = self._sources.get(key)
+            if source is not None:
+                self._sources.move_to_end(key)
+                self._leases[id(source)] += 1
+                return source
+        opened = TileSource(path)
+        to_close = []
+        with self._lock:
+            source = self._sources.get(key)
+            if source is not None:
+                # Another thread opened it first
+                to_close.append(opened)
+            else:
+                source = self._sources[key] = opened
+                self._leases[id(source)] = 0
+                while len(self._sources) > self.max_open:
+                    old = self._sources.popitem(last=False)[1]
+                    if self._leases[id(old)]:
+                        self._evicted.add(id(old))
+                    else:
+                        del self._leases[id(old)]
+                        to_close.append(old)
+            self._sources.move_to_end(key)
+            self._leases[id(source)] += 1
+        for old in to_close:
+            old.close()
+        return source
+
+    def _release(self, source):
+        with self._lock:
+            self._leases[id(source)] -= 1
+            close = id(source) in self._evicted and not self._leases[id(source)]
+            if close:
+                self._evicted.discard(id(source))
+                del self._leases[id(source)]
+        if close:
+            source.close()
+
+    def __len__(self):
+        return len(self._sources)
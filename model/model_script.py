@@ -27,4 +27,4 @@ def predict(model, data):
     probs = model.predict(data, verbose=0)
     class_idx = np.argmax(probs)
     confidence = float(probs[0][class_idx])
-    return class_idx, confidence
\ No newline at end of file
+    return class_idx, confidence
@@ -0,0 +1,70 @@
+import numpy as np
+import cv2
+import rasterio
+from rasterio.io import MemoryFile
+from model.colormap import apply_colormap
+from model.image_processing import read_decimated, fit_shape
+
+# Encoded preview formats: (media type, cv2 extension, encoder params)
+PREVIEW_FORMATS = {
+    "png": ("image/png", ".png", [cv2.IMWRITE_PNG_COMPRESSION, 6]),
+    "webp": ("image/webp", ".webp", [cv2.IMWRITE_WEBP_QUALITY, 90]),
+}
+
+def encode_image(pixels, fmt="png"):
+    """Encode an RGB or RGBA uint8 array as PNG/WebP bytes."""
+    if fmt not in PREVIEW_FORMATS:
+        raise ValueError(f"Unsupported preview format: {fmt}. Allowed formats: {list(PREVIEW_FORMATS)}")
+    _, ext, params = PREVIEW_FORMATS[fmt]
+    code = cv2.COLOR_RGBA2BGRA if pixels.shape[-1] == 4 else cv2.COLOR_RGB2BGR
+    ok, encoded = cv2.imencode(ext, cv2.cvtColor(pixels, code), params)
+    if not ok:
+        raise ValueError(f"{fmt.upper()} encoding failed")
+    return encoded.tobytes()
+
+def ndvi_preview(src, max_size):
+    """Colour-mapped RGBA of band 1, read once at preview size (from an overview when the file has one)."""
+    ndvi = read_decimated(src, fit_shape(src.height, src.width, max_size))
+    mask = None
+    if src.nodata is not None and not np.isnan(src.nodata):
+        mask = ndvi == src.nodata
+    return apply_colormap(ndvi, mask=mask)
+
+def rgb_preview(content, max_size):
+    """RGB(A) of a JPEG/PNG/TIFF, shrunk so the longest side is at most max_size."""
+    img = cv2.imdecode(np.frombuffer(content, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    if img is None:
+        raise ValueError("Unsupported file format for preview")
+    if img.dtype != np.uint8:
+        img = cv2.normalize(img, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+    if img.ndim == 2:
+        img = cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
+    elif img.shape[2] == 4:
+        img = cv2.cvtColor(img, cv2.COLOR_BGRA2RGBA)
+    else:
+        img = cv2.cvtColor(img[:, :, :3], cv2.COLOR_BGR2RGB)
+    return downscale(img, max_size)
+
+def downscale(pixels, max_size):
+    height, width = fit_shape(pixels.shape[0], pixels.shape[1], max_size)
+    if (height, width) == pixels.shape[:2]:
+        return pixels
+    return cv2.resize(pixels, (width, height), interpolation=cv2.INTER_AREA)
+
+def render_previews(source, file_type, sizes, fmt="png"):
+    """
+    Render previews of one image at several sizes, decoding it once at the largest.
+    source is the file's bytes, or for NDVI GeoTIFFs also a path/URL, which GDAL
+    reads with range requests. Returns {size: encoded bytes}.
+    """
+    largest = max(sizes)
+    if file_type == "ndvi":
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            with MemoryFile(bytes(source)) as memfile, memfile.open() as src:
+                pixels = ndvi_preview(src, largest)
+        else:
+            with rasterio.Env(GDAL_DISABLE_READDIR_ON_OPEN="EMPTY_DIR"), rasterio.open(source) as src:
+                pixels = ndvi_preview(src, largest)
+    else:
+        pixels = rgb_preview(source, largest)
+    return {size: encode_image(downscale(pixels, size), fmt) for size in sizes}
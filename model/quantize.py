@@ -0,0 +1,137 @@
+"""
+Post-training quantized TFLite variants of the Keras model, gated on agreement.
+
+    python -m model.quantize --samples data/chunks --variants dynamic float16 int8
+    python -m model.quantize --samples data/chunks --variants int8 --min-agreement 0.97
+
+The .npy NDVI chunks under --samples are preprocessed as the API does. The first
+--calibration tiles feed the int8 representative dataset; the following --eval
+tiles are held out for the agreement check against the float32 Keras model.
+Variants below --min-agreement are not written. Results go to manifest.json in
+--out-dir, which serving reads when MODEL_VARIANT selects a variant.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+import numpy as np
+from model.backends import TFLiteBackend, sanitize
+from model.export import load_samples
+
+VARIANTS = ("dynamic", "float16", "int8")
+MANIFEST_NAME = "manifest.json"
+
+def convert(model, variant, calibration):
+    """Convert a loaded Keras model to TFLite bytes for the given quantization variant."""
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if variant == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant == "int8":
+        def representative_dataset():
+            for tile in calibration:
+                yield [sanitize(tile[np.newaxis])]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    elif variant != "dynamic":
+        raise ValueError(f"Unsupported quantization variant: {variant}")
+    return converter.convert()
+
+def evaluate(reference, candidate, samples, batch_size=16):
+    """Return (top1_agreement, max_abs_prob_diff, ms_per_tile) of candidate against reference."""
+    ref_probs, cand_probs, elapsed = [], [], 0.0
+    for start in range(0, len(samples), batch_size):
+        batch = samples[start:start + batch_size]
+        ref_probs.append(np.asarray(reference.predict_on_batch(sanitize(batch))))
+        begin = time.perf_counter()
+        cand_probs.append(np.asarray(candidate.predict_on_batch(batch)))
+        elapsed += time.perf_counter() - begin
+    ref_probs = np.concatenate(ref_probs)
+    cand_probs = np.concatenate(cand_probs)
+    agreement = float(np.mean(ref_probs.argmax(axis=1) == cand_probs.argmax(axis=1)))
+    max_diff = float(np.max(np.abs(ref_probs - cand_probs)))
+    return agreement, max_diff, elapsed / len(samples) * 1000
+
+def read_manifest(out_dir):
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"variants": {}}
+    with open(path) as f:
+        return json.load(f)
+
+def resolve_variant(variant, out_dir):
+    """Path of an accepted quantized variant, from the manifest written by this tool."""
+    entry = read_manifest(out_dir)["variants"].get(variant)
+    if entry is None or not entry.get("accepted"):
+        raise RuntimeError(f"Model variant {variant} has not passed the agreement check in {out_dir}")
+    return os.path.join(out_dir, entry["file"])
+
+def main(args):
+    from model.model_script import load_model
+    os.makedirs(args.out_dir, exist_ok=True)
+    samples = load_samples(args.samples, args.calibration + args.eval)
+    calibration, held_out = samples[:args.calibration], samples[args.calibration:]
+    if not len(held_out):
+        raise ValueError("No held-out tiles left for the agreement check; add samples or lower --calibration")
+
+    with open(args.keras, "rb") as f:
+        source_sha256 = hashlib.sha256(f.read()).hexdigest()
+    reference = load_model(model_path=args.keras)
+    keras_ms = evaluate(reference, reference, held_out[:args.batch_size])[2]
+
+    manifest = read_manifest(args.out_dir)
+    manifest.update(source=args.keras, source_sha256=source_sha256, eval_tiles=len(held_out))
+    failed = []
+    for variant in args.variants:
+        print(f"Converting {variant}...")
+        flatbuffer = convert(reference, variant, calibration)
+        filename = f"Inception_{variant}.tflite"
+        path = os.path.join(args.out_dir, filename)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(flatbuffer)
+
+        agreement, max_diff, ms_per_tile = evaluate(reference, TFLiteBackend(tmp_path, num_threads=args.threads), held_out, args.batch_size)
+        accepted = agreement >= args.min_agreement
+        if accepted:
+            os.replace(tmp_path, path)
+        else:
+            os.remove(tmp_path)
+            failed.append(variant)
+        manifest["variants"][variant] = {
+            "file": filename,
+            "accepted": accepted,
+            "agreement": agreement,
+            "max_prob_diff": max_diff,
+            "size_bytes": len(flatbuffer),
+            "ms_per_tile": ms_per_tile,
+            "keras_ms_per_tile": keras_ms,
+            "min_agreement": args.min_agreement,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        status = "accepted" if accepted else "REJECTED"
+        print(f"  {variant}: {status}, agreement {agreement:.2%}, max |dp| {max_diff:.3f}, "
+              f"{len(flatbuffer) / 2**20:.1f} MiB, {ms_per_tile:.1f} ms/tile (keras {keras_ms:.1f})")
+
+    with open(os.path.join(args.out_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", required=True, help="directory of .npy NDVI chunks")
+    parser.add_argument("--variants", nargs="+", choices=VARIANTS, default=list(VARIANTS))
+    parser.add_argument("--keras", default="model/Inception.keras")
+    parser.add_argument("--out-dir", default="model/variants")
+    parser.add_argument("--calibration", type=int, default=200, help="tiles in the int8 representative dataset")
+    parser.add_argument("--eval", type=int, default=500, help="held-out tiles for the agreement check")
+    parser.add_argument("--min-agreement", type=float, default=0.98)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--threads", type=int, default=None)
+    sys.exit(main(parser.parse_args()))
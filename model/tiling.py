@@ -0,0 +1,80 @@
+import math
+import numpy as np
+import rasterio
+from rasterio.io import MemoryFile
+from rasterio.transform import Affine
+from rasterio.windows import Window
+from model.image_processing import preprocess_ndvi_array
+
+CLASS_MAP_NODATA = 255
+
+class SceneTiler:
+    """
+    Slide a tile_size window over a single-band NDVI raster with the given stride
+    and hand out preprocessed tiles in batches. Only one window is read at a time,
+    so memory stays bounded regardless of scene size.
+    """
+    def __init__(self, path, tile_size=500, stride=None, batch_size=16, input_size=299, max_tiles=None):
+        self.src = rasterio.open(path)
+        self.tile_size = tile_size
+        self.stride = stride or tile_size
+        self.batch_size = batch_size
+        self.input_size = input_size
+        self.rows = math.ceil(self.src.height / self.stride)
+        self.cols = math.ceil(self.src.width / self.stride)
+        if max_tiles is not None and self.rows * self.cols > max_tiles:
+            self.src.close()
+            raise ValueError(f"Scene needs {self.rows * self.cols} tiles, limit is {max_tiles}; use a larger stride")
+        self._positions = ((row, col) for row in range(self.rows) for col in range(self.cols))
+
+    def read_tile(self, row, col):
+        window = Window(col * self.stride, row * self.stride, self.tile_size, self.tile_size)
+        # Edge tiles extend past the raster; the padding is NaN like nodata
+        tile = self.src.read(1, window=window, boundless=True, masked=True, out_dtype="float32")
+        return tile.filled(np.nan)
+
+    def next_batch(self):
+        """Return (positions, batch) for the next non-empty tiles, or None when the scene is done."""
+        positions, tiles = [], []
+        for row, col in self._positions:
+            tile = self.read_tile(row, col)
+            if np.isnan(tile).all():
+                continue
+            positions.append((row, col))
+            tiles.append(preprocess_ndvi_array(tile, self.input_size))
+            if len(tiles) == self.batch_size:
+                break
+        if not tiles:
+            return None
+        return positions, np.stack(tiles)
+
+    def class_map_transform(self):
+        # Each grid cell covers the stride x stride block at its window origin
+        return self.src.transform * Affine.scale(self.stride, self.stride)
+
+    def close(self):
+        self.src.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def write_class_map(class_grid, transform, crs):
+    """Encode a per-tile class grid as a single-band uint8 GeoTIFF."""
+    profile = {
+        "driver": "GTiff",
+        "height": class_grid.shape[0],
+        "width": class_grid.shape[1],
+        "count": 1,
+        "dtype": "uint8",
+        "nodata": CLASS_MAP_NODATA,
+        "transform": transform,
+        "crs": crs,
+        "compress": "deflate",
+    }
+    with MemoryFile() as memfile:
+        with memfile.open(**profile) as dst:
+            dst.write(class_grid.astype(np.uint8), 1)
+        return memfile.read()
@@ -0,0 +1,43 @@
+import folium
+from branca.colormap import LinearColormap
+from model.colormap import NDVI_COLORS, NDVI_RANGE
+
+# Map rendering for the Streamlit pages. Kept out of model/image_processing.py so
+# the API server never imports matplotlib or folium.
+
+ndvi_legend = LinearColormap(
+    colors=NDVI_COLORS,
+    vmin=NDVI_RANGE[0], vmax=NDVI_RANGE[1],
+    caption='NDVI value'
+)
+
+def plot_ndvi_tiles(tilejson, opacity=0.6):
+    """
+    Folium map with the NDVI layer as server-rendered XYZ tiles (GET /tiles/{image_id}/tilejson.json),
+    so the browser only loads the tiles in view instead of one image of the whole raster.
+    """
+    try:
+        west, south, east, north = tilejson["bounds"]
+        m = folium.Map(
+            location=[(south + north) / 2, (west + east) / 2],
+            zoom_start=tilejson["center"][2],
+            tiles='https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
+            attr='Esri World Imagery'
+        )
+
+        folium.raster_layers.TileLayer(
+            tiles=tilejson["tiles"][0],
+            attr='NDVI',
+            name='NDVI',
+            overlay=True,
+            opacity=opacity,
+            max_native_zoom=tilejson["maxzoom"],
+            max_zoom=tilejson["maxzoom"] + 4
+        ).add_to(m)
+        m.fit_bounds([[south, west], [north, east]])
+
+        ndvi_legend.add_to(m)
+        return m
+    except Exception as e:
+        print(f"Geospatial visualization error: {e}")
+        return None
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from uuid import UUID
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 class Token(BaseModel):
@@ -61,6 +61,9 @@ class ClassificationResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class BatchClassificationRequest(BaseModel):
+    image_ids: List[UUID]
+
 class PredictionResponse(BaseModel):
     class_name: str
     confidence: float
@@ -78,4 +81,17 @@ class LogResponse(BaseModel):
     timestamp: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class ModelRegisterRequest(BaseModel):
+    version: str
+    backend: str = "keras"
+    path: str
+    class_names: Optional[List[str]] = None
+    activate: bool = False
+
+class ModelRoutingRequest(BaseModel):
+    primary: Optional[str] = None
+    canary: Optional[str] = None
+    canary_fraction: float = 0.0
+    shadow: Optional[str] = None
@@ -1,128 +1,138 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+from typing import List, Dict, Optional
 from uuid import UUID
-from database.supabase import get_supabase
-from models import UserResponse, ImageResponse, ImageCreate,UserSignUp
-from routers.auth import get_current_admin_user
-
-router = APIRouter(prefix="/admin", tags=["admin"])
-
-# Existing endpoint to get all images (not modified, included for context)
-@router.get("/images", response_model=List[ImageResponse])
-async def get_all_images(current_user: UserResponse = Depends(get_current_admin_user)):
+from database.supabase import get_supabase, supabase_auth
+from models import UserResponse, UserSignUp
+from utils.dependencies import get_current_admin_user
+from services.auth import invalidate_user
+from services.image import get_all_images as list_images, export_images, get_image, delete_image as remove_image
+from services.preview import delete_previews
+from services.pagination import projection, fetch_page, iter_rows, decode_cursor, ndjson_lines
+from config import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+# Users table columns that can be listed; the default projection
+USER_FIELDS = ("id", "auth_user_id", "email", "created_at", "is_admin")
+
+@router.get("/images", response_model=List[Dict])
+async def get_all_images(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    owner_id: Optional[UUID] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    file_type: Optional[str] = Query(None, pattern="^(rgb|ndvi)$"),
+    classification: Optional[str] = None,
+    with_classification: bool = False,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    current_user: UserResponse = Depends(get_current_admin_user)
+):
     """
-    Get all images and their associated users.
+    Get all images (all of them, or one page with limit/cursor), newest first, optionally of one owner.
     """
-    supabase = get_supabase()
+    filters = {"created_after": created_after, "created_before": created_before, "file_type": file_type, "classification": classification,
+               "with_classification": with_classification}
     try:
-        # Fetch all images
-        images_response = supabase.table("images").select("*").execute()
-        if not images_response.data:
-            return []
-
-        images = [
-            ImageResponse(
-                id=image["id"],
-                user_id=image["user_id"],
-                image_url=image["image_url"],
-                metadata=image["metadata"],
-                created_at=image["created_at"]
-            )
-            for image in images_response.data
-        ]
-        return images
+        if format == "ndjson":
+            rows = export_images(owner_id, cursor, fields, **filters)
+            return StreamingResponse(ndjson_lines(rows, "images"), media_type="application/x-ndjson")
+        if limit is None and cursor is None:
+            return [row async for row in export_images(owner_id, None, fields, **filters)]
+        page = await list_images(owner_id, limit or PAGE_SIZE_DEFAULT, cursor, fields, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch images: {str(e)}")
-
-# Endpoint to get all users (already implemented)
-@router.get("/users", response_model=List[UserResponse])
-async def get_all_users(current_user: UserResponse = Depends(get_current_admin_user)):
+    if page["next_cursor"]:
+        response.headers["X-Next-Cursor"] = page["next_cursor"]
+    return page["items"]
+
+def _users_query(supabase, fields: Optional[str], created_after: Optional[datetime], created_before: Optional[datetime], is_admin: Optional[bool]):
+    query = supabase.table("users").select(projection(fields, USER_FIELDS, ",".join(USER_FIELDS)))
+    if created_after:
+        query = query.gte("created_at", created_after.isoformat())
+    if created_before:
+        query = query.lt("created_at", created_before.isoformat())
+    if is_admin is not None:
+        query = query.eq("is_admin", is_admin)
+    return query
+
+@router.get("/users", response_model=List[Dict])
+async def get_all_users(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    is_admin: Optional[bool] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    current_user: UserResponse = Depends(get_current_admin_user)
+):
     """
-    Get all users.
+    Get all users (all of them, or one page with limit/cursor), newest first.
     """
-    supabase = get_supabase()
     try:
-        users_response = supabase.table("users").select("*").execute()
-        if not users_response.data:
-            return []
-
-        users = [
-            UserResponse(
-                id=user["id"],
-                auth_user_id=user["auth_user_id"],
-                email=user["email"],
-                created_at=user["created_at"],
-                is_admin=user.get("is_admin", False)
-            )
-            for user in users_response.data
-        ]
-        return users
+        if cursor:
+            decode_cursor(cursor)
+        async def make_query():
+            return _users_query(await get_supabase(), fields, created_after, created_before, is_admin)
+        if format == "ndjson":
+            projection(fields, USER_FIELDS)
+            return StreamingResponse(ndjson_lines(iter_rows(make_query, cursor), "users"), media_type="application/x-ndjson")
+        if limit is None and cursor is None:
+            return [row async for row in iter_rows(make_query)]
+        page = await fetch_page(await make_query(), cursor, limit or PAGE_SIZE_DEFAULT)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch users: {str(e)}")
+    if page["next_cursor"]:
+        response.headers["X-Next-Cursor"] = page["next_cursor"]
+    return page["items"]
 
-# Existing endpoint to create an image (not modified, included for context)
-@router.post("/images", response_model=ImageResponse)
-async def create_image(image: ImageCreate, current_user: UserResponse = Depends(get_current_admin_user)):
-    """
-    Create a new image (admin only).
-    """
-    supabase = get_supabase()
-    try:
-        # For simplicity, we'll assume the image is already uploaded to Supabase Storage
-        # and we're just creating a record in the images table.
-        # In a real scenario, you'd upload the image file and get its URL.
-        image_data = {
-            "user_id": str(current_user.id),  # Assign to the admin user
-            "image_url": "https://placeholder-url.com/image.jpg",  # Placeholder URL
-            "metadata": image.metadata
-        }
-        response = supabase.table("images").insert(image_data).execute()
-        if not response.data:
-            raise HTTPException(status_code=400, detail="Failed to create image")
-
-        image_record = response.data[0]
-        return ImageResponse(
-            id=image_record["id"],
-            user_id=image_record["user_id"],
-            image_url=image_record["image_url"],
-            metadata=image_record["metadata"],
-            created_at=image_record["created_at"]
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to create image: {str(e)}")
+# Admins add images through POST /images/ or /images/stream, which store the file, like any user
 
-# Existing endpoint to delete an image (not modified, included for context)
 @router.delete("/images/{image_id}")
-async def delete_image(image_id: str, current_user: UserResponse = Depends(get_current_admin_user)):
+async def delete_image(image_id: UUID, current_user: UserResponse = Depends(get_current_admin_user)):
     """
-    Delete an image by ID (admin only).
+    Delete an image by ID, with its stored file and previews (admin only).
     """
-    supabase = get_supabase()
     try:
-        # Check if the image exists
-        image_response = supabase.table("images").select("*").eq("id", image_id).execute()
-        if not image_response.data:
-            raise HTTPException(status_code=404, detail="Image not found")
-
-        # Delete the image record
-        supabase.table("images").delete().eq("id", image_id).execute()
+        image = await get_image(image_id)
+        await _delete_stored_image(image)
         return {"message": f"Image {image_id} deleted successfully"}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete image: {str(e)}")
 
+async def _delete_stored_image(image: Dict) -> None:
+    await remove_image(image["id"])
+    try:
+        await delete_previews(image)
+    except Exception as e:
+        print(f"Could not delete previews of image {image['id']}: {str(e)}")
+
 # Existing endpoint to create a user (not modified, included for context)
 @router.post("/users", response_model=UserResponse)
 async def create_user(user: UserSignUp, current_user: UserResponse = Depends(get_current_admin_user)):
     """
     Create a new user (admin only).
     """
-    supabase = get_supabase()
+    supabase = await get_supabase()
     try:
         # Sign up user with Supabase Auth
-        auth_response = supabase.auth.sign_up({
-            "email": user.email,
-            "password": user.password,
-        })
+        async with supabase_auth() as auth:
+            auth_response = await auth.sign_up({
+                "email": user.email,
+                "password": user.password,
+            })
         if not auth_response.user:
             raise HTTPException(status_code=400, detail="User creation failed")
 
@@ -132,7 +142,7 @@ async def create_user(user: UserSignUp, current_user: UserResponse = Depends(get
             "email": user.email,
             "is_admin": False  # New users created by admin are not admins by default
         }
-        response = supabase.table("users").insert(user_data).execute()
+        response = await supabase.table("users").insert(user_data).execute()
         if not response.data:
             raise HTTPException(status_code=400, detail="Failed to create user in database")
 
@@ -147,28 +157,60 @@ async def create_user(user: UserSignUp, current_user: UserResponse = Depends(get
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create user: {str(e)}")
 
+@router.patch("/users/{user_id}", response_model=UserResponse)
+async def set_user_admin(user_id: UUID, is_admin: bool, current_user: UserResponse = Depends(get_current_admin_user)):
+    """
+    Grant or revoke a user's admin flag (admin only).
+    """
+    supabase = await get_supabase()
+    try:
+        response = await supabase.table("users").update({"is_admin": is_admin}).eq("id", str(user_id)).execute()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to update user: {str(e)}")
+    if not response.data:
+        raise HTTPException(status_code=404, detail="User not found")
+    user_record = response.data[0]
+    # Cached copies would otherwise keep the old flag until they expire
+    invalidate_user(user_record["auth_user_id"])
+    return UserResponse(
+        id=user_record["id"],
+        auth_user_id=user_record["auth_user_id"],
+        email=user_record["email"],
+        created_at=user_record["created_at"],
+        is_admin=user_record.get("is_admin", False)
+    )
+
 # Endpoint to delete any user (already implemented)
 @router.delete("/users/{user_id}")
 async def delete_user(user_id: UUID, current_user: UserResponse = Depends(get_current_admin_user)):
     """
     Delete a user by ID (admin only).
     """
-    supabase = get_supabase()
+    supabase = await get_supabase()
     try:
         # Check if the user exists
-        user_response = supabase.table("users").select("*").eq("id", str(user_id)).execute()
+        user_response = await supabase.table("users").select("*").eq("id", str(user_id)).execute()
         if not user_response.data:
             raise HTTPException(status_code=404, detail="User not found")
 
         user = user_response.data[0]
         auth_user_id = user["auth_user_id"]
 
+        # Their files would otherwise stay in storage with nothing pointing at them
+        for image in [row async for row in export_images(user_id)]:
+            await _delete_stored_image(image)
+
         # Delete the user from the users table
-        supabase.table("users").delete().eq("id", str(user_id)).execute()
+        await supabase.table("users").delete().eq("id", str(user_id)).execute()
+        # Right away, so the cached row can't keep authenticating if the Auth call below fails
+        invalidate_user(auth_user_id)
 
         # Delete the user from Supabase Auth (requires admin privileges in Supabase)
-        supabase.auth.admin.delete_user(auth_user_id)
+        async with supabase_auth() as auth:
+            await auth.admin.delete_user(auth_user_id)
 
         return {"message": f"User {user_id} deleted successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete user: {str(e)}")
\ No newline at end of file
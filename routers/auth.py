@@ -2,7 +2,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import EmailStr
 from typing import Dict
-from services.auth import signup, signin, logout
+from services.auth import signup, signin, refresh, logout
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
@@ -22,6 +22,14 @@ async def signin_route(email: EmailStr, password: str) -> Dict:
     except Exception as e:
         raise HTTPException(status_code=401, detail=str(e))
 
+@router.post("/refresh")
+async def refresh_route(refresh_token: str) -> Dict:
+    try:
+        user_data = await refresh(refresh_token)
+        return user_data
+    except Exception as e:
+        raise HTTPException(status_code=401, detail=str(e))
+
 @router.post("/logout")
 async def logout_route(access_token: str):
     try:
@@ -1,23 +1,90 @@
 # routers/classifications.py
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse, JSONResponse
 from uuid import UUID
-from typing import Dict
-from utils.dependencies import get_current_user
-from services.classification import classify_image, get_result
-from services.log import record_action
+from typing import Dict, List, Optional
+from utils.dependencies import get_current_user, get_current_admin_user
+from services.classification import classify_image, classify_images, classify_scene, get_result, get_results, get_batching_stats, get_cache_stats
+from services.log import record_action, get_log_sink_stats
+from services.jobs import get_job_queue, QueueFullError
+from services.tiles import get_tile_stats
+from services.preview import get_preview_stats
+from services.auth import get_auth_cache_stats
+from models import BatchClassificationRequest, UserResponse
+from utils.process import memory_usage
+from config import BATCH_CLASSIFY_MAX_ITEMS, TILE_SIZE, TILE_STRIDE, PAGE_SIZE_MAX
+import json
 
 router = APIRouter(prefix="/classifications", tags=["Classifications"])
 
+@router.get("/stats")
+async def get_classification_stats(current_user: UserResponse = Depends(get_current_admin_user)):
+    # Stats are per worker process; each request lands on one worker
+    try:
+        jobs = await get_job_queue().stats()
+    except RuntimeError:
+        jobs = None
+    return {"batching": get_batching_stats(), "result_cache": get_cache_stats(), "map_tiles": get_tile_stats(), "previews": get_preview_stats(), "auth_users": get_auth_cache_stats(), "log_sink": get_log_sink_stats(), "jobs": jobs, "process": memory_usage()}
+
+async def _enqueue(kind: str, user_id: UUID, payload: Dict) -> JSONResponse:
+    try:
+        job = await get_job_queue().submit(kind, user_id, payload)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to queue job: {str(e)}")
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job["id"], "status": job["status"], "status_url": f"/classifications/jobs/{job['id']}"}
+    )
+
+@router.get("/jobs/{job_id}")
+async def get_job_route(
+    job_id: UUID,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    try:
+        job = await get_job_queue().get(str(job_id))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve job: {str(e)}")
+    # Other users' jobs are reported as missing rather than forbidden
+    if job is None or job["user_id"] != str(current_user.id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {key: job[key] for key in ("id", "kind", "status", "attempts", "max_attempts", "result", "error", "created_at", "started_at", "finished_at")}
+
+# Must be registered before /{image_id} so "batch" isn't parsed as an image id
+@router.post("/batch")
+async def classify_images_route(
+    request: BatchClassificationRequest,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    if not request.image_ids:
+        raise HTTPException(status_code=400, detail="No image_ids provided")
+    if len(request.image_ids) > BATCH_CLASSIFY_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_CLASSIFY_MAX_ITEMS} images can be classified per request")
+
+    async def ndjson():
+        try:
+            async for item in classify_images(request.image_ids, current_user.id):
+                yield json.dumps(item, default=str) + "\n"
+        except Exception as e:
+            yield json.dumps({"status": "error", "detail": f"Failed to classify images: {str(e)}"}) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
 @router.post("/{image_id}")
 async def classify_image_route(
     image_id: UUID,
-    current_user: dict = Depends(get_current_user)
+    run_async: bool = Query(False, alias="async"),
+    current_user: UserResponse = Depends(get_current_user)
 ):
+    if run_async:
+        return await _enqueue("classification", current_user.id, {"image_id": str(image_id)})
     try:
-        classification = await classify_image(image_id, UUID(current_user["user_id"]))
+        classification = await classify_image(image_id, current_user.id)
         # Log the action
         await record_action(
-            user_id=UUID(current_user["user_id"]),
+            user_id=current_user.id,
             action="classification",
             details={"image_id": str(image_id), "classification_id": str(classification["id"])}
         )
@@ -27,13 +94,48 @@ async def classify_image_route(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to classify image: {str(e)}")
 
+@router.post("/{image_id}/tiles")
+async def classify_scene_route(
+    image_id: UUID,
+    tile_size: int = Query(TILE_SIZE, ge=32, le=4096),
+    stride: Optional[int] = Query(TILE_STRIDE, ge=1, le=4096),
+    run_async: bool = Query(False, alias="async"),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    if run_async:
+        return await _enqueue("scene", current_user.id, {"image_id": str(image_id), "tile_size": tile_size, "stride": stride})
+    try:
+        result = await classify_scene(image_id, current_user.id, tile_size=tile_size, stride=stride)
+        await record_action(
+            user_id=current_user.id,
+            action="scene_classification",
+            details={"image_id": str(image_id), "tiles": result["rows"] * result["cols"], "class_map_url": result["class_map_url"]}
+        )
+        return result
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to classify scene: {str(e)}")
+
+@router.get("/results")
+async def get_classification_results(
+    image_ids: List[UUID] = Query(...),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    if len(image_ids) > PAGE_SIZE_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {PAGE_SIZE_MAX} image_ids can be looked up per request")
+    try:
+        return await get_results(image_ids, current_user.id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve classification results: {str(e)}")
+
 @router.get("/{image_id}/result")
 async def get_classification_result(
     image_id: UUID,
-    current_user: dict = Depends(get_current_user)
+    current_user: UserResponse = Depends(get_current_user)
 ):
     try:
-        result = await get_result(image_id, UUID(current_user["user_id"]))
+        result = await get_result(image_id, current_user.id)
         return result
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -1,33 +1,51 @@
 # routers/images.py
-from fastapi import APIRouter, HTTPException, Depends, File, UploadFile
+from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, BackgroundTasks, Query, Request, Response
 from uuid import UUID
 from typing import Optional, List, Dict, Any
 from utils.dependencies import get_current_user,get_current_admin_user
-from services.image import create_image, get_image, get_all_images, delete_image
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+from services.image import create_image, create_image_stream, get_image, get_all_images, export_images, delete_image, needs_cog
+from services.pagination import ndjson_lines
+from services.jobs import get_job_queue
+from services.upload import UploadTooLargeError
 from services.log import record_action
+from services.classification import classify_upload
+from services.preview import get_preview, render_upload_previews, delete_previews
+from model.preview import PREVIEW_FORMATS
 from models import UserResponse 
+from config import CLASSIFY_ON_UPLOAD, PREVIEW_ON_INGEST, PREVIEW_FORMAT, PREVIEW_MAX_AGE, PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
 import json
 
 router = APIRouter(prefix="/images", tags=["Images"])
 
 @router.post("/")
 async def add_image(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     user_id: str = None,
     metadata: Optional[str] = None,
+    classify: bool = Query(CLASSIFY_ON_UPLOAD),
     # current_user: dict = Depends(get_current_user)
     current_user: UserResponse = Depends(get_current_user)  # Update type hint  
 ):
     try:
         metadata_dict = json.loads(metadata) if metadata else None
+        # Classify and render previews after the response from the bytes already read, instead of downloading them again later
+        def after_response(image, content, content_type):
+            if classify:
+                background_tasks.add_task(classify_upload, image, content, content_type)
+            if PREVIEW_ON_INGEST:
+                background_tasks.add_task(render_upload_previews, image, content, content_type)
         image_data = await create_image(
-            UUID(current_user.id),  # Update to current_user.id
+            current_user.id,
             file,
-            metadata_dict
+            metadata_dict,
+            after_response
         )
         # Log the action
         await record_action(
-            user_id=UUID(current_user.id),  # Update to current_user.id
+            user_id=current_user.id,
             action="image_upload",
             details={"image_id": str(image_data["id"])}
         )
@@ -37,6 +55,50 @@ async def add_image(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to upload image: {str(e)}")
 
+# Raw-body upload (Content-Type is the file's type), piped to storage without buffering the whole file
+@router.post("/stream")
+async def add_image_stream(
+    request: Request,
+    filename: str = Query(...),
+    user_id: str = None,
+    metadata: Optional[str] = None,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    try:
+        metadata_dict = json.loads(metadata) if metadata else None
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid metadata format")
+    content_length = request.headers.get("content-length")
+    content_type = request.headers.get("content-type", "application/octet-stream").split(";")[0].strip()
+    try:
+        image_data = await create_image_stream(
+            current_user.id,
+            request.stream(),
+            filename,
+            content_type,
+            int(content_length) if content_length else None,
+            metadata_dict
+        )
+        await record_action(
+            user_id=current_user.id,
+            action="image_upload",
+            details={"image_id": str(image_data["id"]), "streamed": True}
+        )
+        # The file was never in memory here, so the COG rewrite happens as a background job
+        if needs_cog(content_type, image_data["file_type"]):
+            try:
+                job = await get_job_queue().submit("cog", current_user.id, {"image_id": str(image_data["id"]), "path": f"{current_user.id}/{filename}"})
+                image_data["cog_job_id"] = job["id"]
+            except Exception as e:
+                print(f"Could not queue COG conversion for image {image_data['id']}: {str(e)}")
+        return image_data
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to upload image: {str(e)}")
+
 @router.get("/{image_id}")
 async def get_image_by_id(
     image_id: UUID,
@@ -53,15 +115,64 @@ async def get_image_by_id(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve image: {str(e)}")
 
+@router.get("/{image_id}/preview")
+async def get_image_preview(
+    image_id: UUID,
+    request: Request,
+    size: Optional[int] = Query(None, ge=1, le=4096),
+    format: str = Query(PREVIEW_FORMAT, pattern=f"^({'|'.join(PREVIEW_FORMATS)})$"),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    try:
+        image = await get_image(image_id)
+        if str(image["user_id"]) != str(current_user.id) and not current_user.is_admin:
+            raise HTTPException(status_code=403, detail="Unauthorized: Image does not belong to this user")
+        etag, content = await get_preview(image, size, format, request.headers.get("if-none-match"))
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to render preview: {str(e)}")
+    # Previews are content-addressed, so the ETag only changes when the image does
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={PREVIEW_MAX_AGE}"}
+    if content is None:
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type=PREVIEW_FORMATS[format][0], headers=headers)
+
 @router.get("/")
 async def get_all_user_images(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    file_type: Optional[str] = Query(None, pattern="^(rgb|ndvi)$"),
+    classification: Optional[str] = None,
+    with_classification: bool = False,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
     current_user: UserResponse = Depends(get_current_user)  # Update type hint
 ):
+    filters = {"created_after": created_after, "created_before": created_before, "file_type": file_type, "classification": classification,
+               "with_classification": with_classification}
     try:
         # Admins can get all images (handled in admin router), regular users get their own
-        return await get_all_images(UUID(current_user.id))  # Update to current_user.id
+        if format == "ndjson":
+            rows = export_images(current_user.id, cursor, fields, **filters)
+            return StreamingResponse(ndjson_lines(rows, "images"), media_type="application/x-ndjson")
+        if limit is None and cursor is None:
+            # Without paging parameters the whole listing is returned, as before pagination
+            return [row async for row in export_images(current_user.id, None, fields, **filters)]
+        page = await get_all_images(current_user.id, limit or PAGE_SIZE_DEFAULT, cursor, fields, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve images: {str(e)}")
+    # The body stays a plain list; the next page starts at X-Next-Cursor
+    if page["next_cursor"]:
+        response.headers["X-Next-Cursor"] = page["next_cursor"]
+    return page["items"]
 
 @router.delete("/{image_id}")
 async def delete_image_by_id(
@@ -74,6 +185,10 @@ async def delete_image_by_id(
         if str(image["user_id"]) != str(current_user.id) and not current_user.is_admin:
             raise HTTPException(status_code=403, detail="Unauthorized: Image does not belong to this user")
         await delete_image(image_id)
+        try:
+            await delete_previews(image)
+        except Exception as e:
+            print(f"Could not delete previews of image {image_id}: {str(e)}")
         # Log the action
         await record_action(
             user_id=UUID(current_user.id),  # Update to current_user.id
@@ -1,17 +1,41 @@
 # routers/logs.py
-from fastapi import APIRouter, Depends, HTTPException
-from uuid import UUID
-from typing import List, Dict
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+from typing import List, Dict, Optional
 from utils.dependencies import get_current_user
-from services.log import get_logs
+from services.log import get_logs, export_logs
+from services.pagination import ndjson_lines
+from models import UserResponse
+from config import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
 
 router = APIRouter(prefix="/logs", tags=["Logs"])
 
 @router.get("/", response_model=List[Dict])
-async def get_user_logs(current_user: dict = Depends(get_current_user)):
+async def get_user_logs(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    action: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    filters = {"created_after": created_after, "created_before": created_before, "action": action}
     try:
-        user_id = UUID(current_user["user_id"])
-        logs = await get_logs(user_id)
-        return logs
+        if format == "ndjson":
+            rows = export_logs(current_user.id, cursor, fields, **filters)
+            return StreamingResponse(ndjson_lines(rows, "logs"), media_type="application/x-ndjson")
+        if limit is None and cursor is None:
+            # Without paging parameters the whole log is returned, as before pagination
+            return [row async for row in export_logs(current_user.id, None, fields, **filters)]
+        page = await get_logs(current_user.id, limit or PAGE_SIZE_DEFAULT, cursor, fields, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to retrieve logs: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve logs: {str(e)}")
+    if page["next_cursor"]:
+        response.headers["X-Next-Cursor"] = page["next_cursor"]
+    return page["items"]
@@ -0,0 +1,76 @@
+# routers/models.py
+from fastapi import APIRouter, HTTPException, Depends
+from utils.dependencies import get_current_admin_user
+from services.classification import register_model, activate_model, set_model_routing, unregister_model, get_registry_stats
+from services.log import record_action
+from models import ModelRegisterRequest, ModelRoutingRequest, UserResponse
+
+router = APIRouter(prefix="/models", tags=["Models"])
+
+@router.get("/")
+async def list_models(current_user: UserResponse = Depends(get_current_admin_user)):
+    return get_registry_stats()
+
+@router.post("/")
+async def register_model_route(
+    request: ModelRegisterRequest,
+    current_user: UserResponse = Depends(get_current_admin_user)
+):
+    try:
+        model = await register_model(request.version, request.backend, request.path, request.class_names, request.activate)
+        await record_action(
+            user_id=current_user.id,
+            action="model_registered",
+            details={"version": request.version, "backend": request.backend, "path": request.path, "activated": request.activate}
+        )
+        return model
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to register model: {str(e)}")
+
+@router.put("/routing")
+async def set_routing_route(
+    request: ModelRoutingRequest,
+    current_user: UserResponse = Depends(get_current_admin_user)
+):
+    try:
+        routing = set_model_routing(request.primary, request.canary, request.canary_fraction, request.shadow)
+        await record_action(user_id=current_user.id, action="model_routing", details=routing)
+        return routing
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to update routing: {str(e)}")
+
+@router.post("/{version}/activate")
+async def activate_model_route(
+    version: str,
+    current_user: UserResponse = Depends(get_current_admin_user)
+):
+    try:
+        routing = activate_model(version)
+        await record_action(user_id=current_user.id, action="model_activated", details={"version": version})
+        return routing
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to activate model: {str(e)}")
+
+@router.delete("/{version}")
+async def unregister_model_route(
+    version: str,
+    current_user: UserResponse = Depends(get_current_admin_user)
+):
+    try:
+        await unregister_model(version)
+        await record_action(user_id=current_user.id, action="model_unregistered", details={"version": version})
+        return {"message": f"Model version {version} unloaded"}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to unload model: {str(e)}")
@@ -0,0 +1,46 @@
+# routers/tiles.py
+from fastapi import APIRouter, HTTPException, Depends, Path, Request, Response
+from uuid import UUID
+from utils.dependencies import get_current_user
+from services.tiles import get_tile, get_tilejson
+from models import UserResponse
+from config import MAP_TILE_MAX_AGE
+
+router = APIRouter(prefix="/tiles", tags=["Tiles"])
+
+@router.get("/{image_id}/tilejson.json")
+async def get_tilejson_route(
+    image_id: UUID,
+    request: Request,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    # Tile URLs carry user_id like every other request from the dashboard
+    tile_url = str(request.url_for("get_tile_route", image_id=image_id, z="{z}", x="{x}", y="{y}"))
+    tile_url = tile_url.replace("%7B", "{").replace("%7D", "}") + f"?user_id={request.query_params.get('user_id', '')}"
+    try:
+        return await get_tilejson(image_id, current_user.id, tile_url)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to describe tiles: {str(e)}")
+
+@router.get("/{image_id}/{z}/{x}/{y}.png")
+async def get_tile_route(
+    image_id: UUID,
+    request: Request,
+    z: int = Path(..., ge=0, le=24),
+    x: int = Path(..., ge=0),
+    y: int = Path(..., ge=0),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    try:
+        etag, png = await get_tile(image_id, current_user.id, z, x, y, request.headers.get("if-none-match"))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to render tile: {str(e)}")
+    # Private: tiles are per-user data. Revalidation with the ETag is a 304 without a render
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={MAP_TILE_MAX_AGE}"}
+    if png is None:
+        return Response(status_code=304, headers=headers)
+    return Response(content=png, media_type="image/png", headers=headers)
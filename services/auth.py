@@ -1,12 +1,21 @@
-from database.supabase import get_supabase
+from database.supabase import get_supabase, supabase_auth
 from pydantic import EmailStr
 from uuid import UUID
+from typing import Dict, Optional
+import jwt
+from services.cache import ResultCache
+from config import JWT_SECRET, JWT_AUDIENCE, AUTH_USER_CACHE_MAX_ENTRIES, AUTH_USER_CACHE_TTL
+
+# users rows by auth_user_id, so authenticating a request doesn't need a users query each time
+USER_FIELDS = "id,auth_user_id,email,created_at,is_admin"
+_users = ResultCache(AUTH_USER_CACHE_MAX_ENTRIES, AUTH_USER_CACHE_TTL)
 
 async def signup(email: EmailStr, password: str,is_admin: bool = False) -> dict:
     supabase = await get_supabase()
     try:
         # Sign up with Supabase Auth
-        auth_response = await supabase.auth.sign_up({"email": email, "password": password})
+        async with supabase_auth() as auth:
+            auth_response = await auth.sign_up({"email": email, "password": password})
         if not auth_response.user:
             raise ValueError("Signup failed: User not created")
         
@@ -31,9 +40,9 @@ async def signup(email: EmailStr, password: str,is_admin: bool = False) -> dict:
         raise ValueError(f"Signup failed: {str(e)}")
 
 async def signin(email: EmailStr, password: str) -> dict:
-    supabase = await get_supabase()
     try:
-        auth_response = await supabase.auth.sign_in_with_password({"email": email, "password": password})
+        async with supabase_auth() as auth:
+            auth_response = await auth.sign_in_with_password({"email": email, "password": password})
         if not auth_response.user:
             raise ValueError("Signin failed: Invalid credentials")
         
@@ -45,9 +54,61 @@ async def signin(email: EmailStr, password: str) -> dict:
     except Exception as e:
         raise ValueError(f"Signin failed: {str(e)}")
 
+async def refresh(refresh_token: str) -> dict:
+    """Trade a refresh token for a new access token (and refresh token) before the old one expires."""
+    try:
+        async with supabase_auth() as auth:
+            auth_response = await auth.refresh_session(refresh_token)
+        return {
+            "user_id": auth_response.user.id,
+            "access_token": auth_response.session.access_token,
+            "refresh_token": auth_response.session.refresh_token
+        }
+    except Exception as e:
+        raise ValueError(f"Refresh failed: {str(e)}")
+
 async def logout(access_token: str):
-    supabase = await get_supabase()
     try:
-        await supabase.auth.sign_out()
+        # Revoke the caller's session; the service client itself holds none
+        async with supabase_auth() as auth:
+            await auth.admin.sign_out(access_token)
     except Exception as e:
-        raise ValueError(f"Logout failed: {str(e)}")
\ No newline at end of file
+        raise ValueError(f"Logout failed: {str(e)}")
+
+def verify_access_token(token: str) -> Dict:
+    """
+    Claims of a Supabase access token, checked locally against the project's JWT
+    secret (signature, expiry, audience) instead of asking Supabase Auth.
+    """
+    if not JWT_SECRET:
+        raise ValueError("JWT_SECRET is not configured")
+    try:
+        claims = jwt.decode(token, JWT_SECRET, algorithms=["HS256"], audience=JWT_AUDIENCE, options={"require": ["exp", "sub"]})
+    except jwt.ExpiredSignatureError:
+        raise ValueError("Token has expired")
+    except jwt.InvalidTokenError as e:
+        raise ValueError(f"Invalid token: {str(e)}")
+    return claims
+
+async def get_user_profile(auth_user_id: str) -> Optional[Dict]:
+    """The users row of an auth user, from the cache for up to AUTH_USER_CACHE_TTL seconds. None if there is none."""
+    user = _users.get(auth_user_id)
+    if user is None:
+        supabase = await get_supabase()
+        response = await supabase.table("users").select(USER_FIELDS).eq("auth_user_id", auth_user_id).limit(1).execute()
+        if not response.data:
+            # Not cached, so a user who signs up right after this is found
+            return None
+        user = response.data[0]
+        _users.set(auth_user_id, user)
+    return user
+
+def invalidate_user(auth_user_id: Optional[str] = None) -> None:
+    """Drop a cached user (all users when None) after it is deleted or its admin flag changes."""
+    if auth_user_id is None:
+        _users.clear()
+    else:
+        _users.invalidate(str(auth_user_id))
+
+def get_auth_cache_stats() -> Dict:
+    return {**_users.stats(), "jwt_verification": bool(JWT_SECRET)}
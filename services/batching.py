@@ -0,0 +1,125 @@
+# services/batching.py
+import asyncio
+import numpy as np
+from collections import Counter
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+PredictBatchFn = Callable[[np.ndarray], Awaitable[List[Tuple[int, float]]]]
+
+class BatchScheduler:
+    """
+    Collect preprocessed tensors from concurrent requests and run them through
+    the model as a single batch. Each caller awaits its own (class_idx, confidence).
+    The predict function is a coroutine so the forward pass can run on an executor
+    while the next batch accumulates.
+    """
+    def __init__(self, predict_batch_fn: PredictBatchFn, max_batch_size: int = 16, max_wait_ms: float = 10.0):
+        self._predict_batch = predict_batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._arrival: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        # Items taken off the queue for the batch being collected or predicted
+        self._inflight: List[Tuple[np.ndarray, asyncio.Future]] = []
+        self._batches = 0
+        self._items = 0
+        self._failed_batches = 0
+        self._batch_sizes = Counter()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._arrival = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="batch-scheduler")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # Fail anything still waiting, queued or already dequeued for a batch,
+        # so callers don't hang on shutdown
+        pending = self._inflight
+        self._inflight = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Batch scheduler stopped"))
+
+    async def submit(self, tensor: np.ndarray) -> Tuple[int, float]:
+        """Queue a single preprocessed sample and wait for its prediction."""
+        if not self.running:
+            raise RuntimeError("Batch scheduler is not running")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((tensor, future))
+        self._arrival.set()
+        return await future
+
+    async def _collect(self) -> List[Tuple[np.ndarray, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = self._inflight = []
+        batch.append(await self._queue.get())
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            self._arrival.clear()
+            try:
+                await asyncio.wait_for(self._arrival.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            # Callers that gave up (e.g. client disconnect) don't need a forward pass
+            batch = [(tensor, future) for tensor, future in batch if not future.done()]
+            if not batch:
+                continue
+            try:
+                stacked = np.stack([tensor for tensor, _ in batch])
+                results = await self._predict_batch(stacked)
+            except Exception as e:
+                self._failed_batches += 1
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self._batches += 1
+            self._items += len(batch)
+            self._batch_sizes[len(batch)] += 1
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self._batches,
+            "items": self._items,
+            "failed_batches": self._failed_batches,
+            "avg_batch_size": (self._items / self._batches) if self._batches else 0.0,
+            "batch_size_histogram": {str(size): count for size, count in sorted(self._batch_sizes.items())},
+        }
@@ -0,0 +1,155 @@
+# services/cache.py
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+def make_cache_key(digest: str, *parts: Any) -> str:
+    """
+    Combine a content digest with everything else that changes the result
+    (model version, preprocessing parameters, file type).
+    """
+    suffix = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(f"{digest}:{suffix}".encode()).hexdigest()
+
+class ResultCache:
+    """
+    Content-addressed result cache with an in-memory LRU tier and an optional
+    on-disk tier. Both tiers expire entries after ttl_seconds.
+    """
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 86400, disk_dir: Optional[str] = None):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl_seconds
+        self.disk_dir = disk_dir or None
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[Dict]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - record.get("stored_at", 0) > self.ttl:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            return None
+        return record["value"]
+
+    def _write_disk(self, key: str, value: Dict) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"stored_at": time.time(), "value": value}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Result cache disk write failed: {e}")
+
+    def _remember(self, key: str, value: Dict) -> None:
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: str) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if time.monotonic() < expires_at:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        value = self._read_disk(key)
+        if value is not None:
+            self._remember(key, value)
+            self.hits += 1
+            self.disk_hits += 1
+            return value
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Dict) -> None:
+        self._remember(key, value)
+        self._write_disk(key, value)
+
+    def invalidate(self, key: str) -> None:
+        self._entries.pop(key, None)
+        if self.disk_dir:
+            try:
+                os.unlink(self._disk_path(key))
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "disk_enabled": self.disk_dir is not None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+        }
+
+class BytesCache(ResultCache):
+    """ResultCache for rendered bytes (e.g. PNG tiles); the disk tier stores raw files and uses mtime for expiry."""
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.bin")
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.unlink(path)
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, key: str, value: bytes) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Bytes cache disk write failed: {e}")
@@ -1,45 +1,270 @@
+import asyncio
+import os
+import time
 import numpy as np
-import requests
+import httpx
 from PIL import Image
 from io import BytesIO
 from uuid import UUID
-from typing import Dict
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from database.supabase import get_supabase
-from services.image import get_image
-from model.image_processing import preprocess_image, preprocess_ndvi
-from model.model_script import load_model,predict
-from fastapi import UploadFile
+from services.image import get_image, download_image, LATEST_CLASSIFICATION, with_latest_classification, flatten_latest
+from services.log import record_action, record_actions
+from model.image_processing import preprocess_image, preprocess_ndvi, READ_OVERSAMPLE, READ_RESAMPLING
+from model.backends import load_backend, resolve_backend, warm_up, BACKENDS, FORK_SAFE_BACKENDS
+from model.tiling import SceneTiler, write_class_map, CLASS_MAP_NODATA
+from services.registry import ModelEntry, ModelRegistry
+from services.executor import run_io, inference_in_process, start_inference_processes
+from services.cache import ResultCache, content_hash, make_cache_key
+from utils.errors import InvalidInputError
+from config import BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS, BATCH_CLASSIFY_CONCURRENCY, INFERENCE_BACKEND, INFERENCE_BACKEND_PATH, INFERENCE_THREADS, INFERENCE_INTER_OP_THREADS, TFLITE_SHARED_WEIGHTS, MODEL_VARIANT, MODEL_VARIANTS_DIR, MODEL_LOAD_MODE, MODEL_WARMUP, MODEL_VERSION, MODEL_REGISTRY_DIR, SHADOW_MAX_PENDING, RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_TTL, RESULT_CACHE_DIR, TILE_SIZE, TILE_STRIDE, TILE_BATCH_SIZE, MAX_SCENE_TILES
 
-# Global variable to store the loaded model
-_model = None
+# Loaded model versions and the routing between them; the configured model is the first primary
+_registry = ModelRegistry(shadow_max_pending=SHADOW_MAX_PENDING)
+_load_task = None
+_load_seconds = None
+_warmed_up = False
+_preloaded = False
 CLASS_NAMES = ['Non-Plant', 'Unhealthy', 'Moderate', 'Healthy']
+# A quantized variant gives different outputs, so it is a different version
+PRIMARY_VERSION = MODEL_VERSION if MODEL_VARIANT == "float32" else f"{MODEL_VERSION}-{MODEL_VARIANT}"
 
-def load_model_wrapper():
+# Anything that changes the model input for the same bytes must be part of the cache key
+PREPROCESSING_PARAMS = {
+    "input_size": 299, "ndvi_blur_kernel": 5, "rgb_index": "vari",
+    # NDVI rasters are read decimated to a square of input_size * oversample before the blur
+    "ndvi_read": {"shape": "square", "oversample": READ_OVERSAMPLE, "resampling": READ_RESAMPLING.name},
+}
+_result_cache = ResultCache(RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_TTL, RESULT_CACHE_DIR)
+
+def result_cache_key(digest: str, file_type: str, version: str) -> str:
+    return make_cache_key(digest, file_type, version, PREPROCESSING_PARAMS)
+
+def load_model_wrapper(warmup: bool = MODEL_WARMUP):
     """
-    Load the machine learning model for image classification.
+    Load the machine learning model for image classification. A model that is
+    already loaded (e.g. preloaded before fork) is reused and only warmed up. With
+    INFERENCE_EXECUTOR=process only the inference processes load it, so this process
+    holds no copy and None is returned.
     """
-    global _model
+    global _load_seconds, _warmed_up
+    model_path = INFERENCE_BACKEND_PATH
     try:
-        model_path = "model/Inception.keras"
-        print(f"Loading model from: {model_path}")
-        _model = load_model(model_path=model_path)
-        print("Model loaded successfully")
-        return _model
+        start = time.perf_counter()
+        entry = _registry.primary
+        if entry is not None:
+            model = entry.model
+        elif inference_in_process():
+            # The worker processes load and warm up their own copy; one here would only add RSS
+            backend, model_path = resolve_backend(INFERENCE_BACKEND, INFERENCE_BACKEND_PATH, MODEL_VARIANT, MODEL_VARIANTS_DIR)
+            print(f"Loading {backend} model ({MODEL_VARIANT}) in the inference processes from: {model_path}")
+            start_inference_processes()
+            model = None
+        else:
+            backend, model_path = resolve_backend(INFERENCE_BACKEND, INFERENCE_BACKEND_PATH, MODEL_VARIANT, MODEL_VARIANTS_DIR)
+            print(f"Loading {backend} model ({MODEL_VARIANT}) from: {model_path}")
+            model = load_backend(
+                backend, model_path,
+                num_threads=INFERENCE_THREADS,
+                inter_op_threads=INFERENCE_INTER_OP_THREADS,
+                shared_weights=TFLITE_SHARED_WEIGHTS
+            )
+        if warmup and not _warmed_up and model is not None:
+            # Trace the batch shapes the scheduler uses so the first request doesn't pay for it
+            warm_up(model, sorted({1, BATCH_MAX_SIZE}))
+            _warmed_up = True
+        if entry is None:
+            _registry.add(ModelEntry(PRIMARY_VERSION, model, CLASS_NAMES, backend, model_path, in_process=inference_in_process()))
+        _load_seconds = (_load_seconds or 0) + time.perf_counter() - start
+        print(f"Model loaded successfully in {_load_seconds:.1f}s")
+        return model
     except FileNotFoundError as e:
         raise RuntimeError(f"Model file not found at {model_path}: {str(e)}")
     except Exception as e:
         raise RuntimeError(f"Failed to load model: {str(e)}")
 
-async def classify_image(image_id: UUID, user_id: UUID) -> Dict:
-    global _model
-    if _model is None:
-        raise RuntimeError("Model not loaded. Call load_model() first.")
+def preload_model() -> bool:
+    """
+    Load the model once in a parent process (the gunicorn master) so forked workers
+    inherit it copy-on-write. Warm-up is left to each worker, since running the model
+    would start runtime threads the children can't use. Returns False for backends
+    that aren't fork-safe; their workers load their own copy in the lifespan.
+    """
+    global _preloaded
+    if inference_in_process():
+        print("Inference runs in worker processes, which load their own model; nothing to preload")
+        return False
+    backend, _ = resolve_backend(INFERENCE_BACKEND, INFERENCE_BACKEND_PATH, MODEL_VARIANT, MODEL_VARIANTS_DIR)
+    if backend not in FORK_SAFE_BACKENDS:
+        print(f"The {backend} backend is not fork-safe; each worker will load its own model")
+        return False
+    load_model_wrapper(warmup=False)
+    _preloaded = True
+    return True
 
-    # Verify the image exists and belongs to the user
-    image = await get_image(image_id)
-    if str(image["user_id"]) != str(user_id):
-        raise ValueError("Unauthorized: Image does not belong to this user")
+def _report_load_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Background model load failed: {str(task.exception())}")
+
+def start_model_loading() -> asyncio.Task:
+    """
+    Load the model on the I/O executor without blocking the event loop. Returns the
+    in-flight load, or starts a new one if nothing is loaded and the last attempt failed.
+    """
+    global _load_task
+    if _load_task is None or (_load_task.done() and _registry.primary is None):
+        _load_task = asyncio.create_task(run_io(load_model_wrapper))
+        _load_task.add_done_callback(_report_load_failure)
+    return _load_task
+
+async def ensure_model():
+    """
+    Return the loaded model, waiting for (or, in lazy mode, starting) the load if needed.
+    """
+    if _registry.primary is not None:
+        return _registry.primary.model
+    return await asyncio.shield(start_model_loading())
+
+def model_status() -> Dict:
+    if _registry.primary is not None:
+        state = "ready"
+    elif _load_task is None:
+        state = "not_loaded"
+    elif not _load_task.done():
+        state = "loading"
+    else:
+        state = "failed"
+    status = {
+        "state": state,
+        "mode": MODEL_LOAD_MODE,
+        "backend": INFERENCE_BACKEND,
+        "variant": MODEL_VARIANT,
+        "version": _registry.primary.version if _registry.primary is not None else PRIMARY_VERSION,
+        "preloaded": _preloaded,
+        "load_seconds": _load_seconds
+    }
+    if state == "failed" and not _load_task.cancelled():
+        status["error"] = str(_load_task.exception())
+    return status
+
+async def start_batching():
+    """
+    Enable micro-batching. Each model version starts its scheduler on first use,
+    so the model may still be loading.
+    """
+    _registry.enable_batching(BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS)
+
+async def stop_batching():
+    await _registry.disable_batching()
+
+def get_batching_stats() -> Dict:
+    primary = _registry.primary
+    if primary is None or primary.scheduler is None:
+        return {"running": False}
+    return primary.scheduler.stats()
+
+def get_cache_stats() -> Dict:
+    return _result_cache.stats()
+
+def get_registry_stats() -> Dict:
+    return _registry.stats()
+
+def _load_version(version: str, backend: str, path: str, class_names: List[str]) -> ModelEntry:
+    """Load and warm up an additional model version. Runs on the I/O executor."""
+    model = load_backend(backend, path, num_threads=INFERENCE_THREADS, inter_op_threads=INFERENCE_INTER_OP_THREADS, shared_weights=TFLITE_SHARED_WEIGHTS)
+    if MODEL_WARMUP:
+        warm_up(model, sorted({1, BATCH_MAX_SIZE}))
+    return ModelEntry(version, model, class_names, backend, path)
+
+async def register_model(version: str, backend: str, path: str, class_names: Optional[List[str]] = None, activate: bool = False) -> Dict:
+    """
+    Load a model version next to the serving ones, then optionally make it the
+    primary. Loading and warm-up happen before any traffic is routed to it.
+    """
+    if inference_in_process():
+        raise ValueError("Loading extra model versions requires INFERENCE_EXECUTOR=thread")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unsupported inference backend: {backend}")
+    registry_dir = os.path.realpath(MODEL_REGISTRY_DIR)
+    model_path = os.path.realpath(path)
+    if os.path.commonpath([registry_dir, model_path]) != registry_dir:
+        raise ValueError(f"Model path must be inside {MODEL_REGISTRY_DIR}")
+    if not os.path.exists(model_path):
+        raise ValueError(f"Model file not found at {path}")
+    if version in _registry:
+        raise ValueError(f"Model version {version} is already loaded")
+    class_names = class_names or CLASS_NAMES
 
+    try:
+        entry = await run_io(_load_version, version, backend, model_path, class_names)
+    except Exception as e:
+        raise RuntimeError(f"Failed to load model version {version}: {str(e)}")
+    _registry.add(entry)
+    if activate:
+        _registry.activate(version)
+    print(f"Registered model version {version} ({backend}) from {model_path}")
+    return entry.describe()
+
+def activate_model(version: str) -> Dict:
+    """Atomically switch the primary model version."""
+    routing = _registry.activate(version)
+    print(f"Model version {version} is now primary")
+    return routing
+
+def set_model_routing(primary: Optional[str] = None, canary: Optional[str] = None, canary_fraction: float = 0.0, shadow: Optional[str] = None) -> Dict:
+    return _registry.set_routing(primary, canary, canary_fraction, shadow)
+
+async def unregister_model(version: str) -> None:
+    await _registry.remove(version)
+    print(f"Unloaded model version {version}")
+
+def _preprocess_content(content: bytes, content_type: str, file_type: str) -> np.ndarray:
+    """
+    Decode and preprocess downloaded bytes into a model-ready tensor. Runs on the I/O executor.
+    """
+    if file_type == "rgb":
+        print("Processing image as RGB...")
+        try:
+            print("Attempting to open image with PIL...")
+            img = Image.open(BytesIO(content))
+            print("Image opened successfully with PIL")
+
+            # Convert to RGB if necessary
+            if img.mode != "RGB":
+                print(f"Converting image mode from {img.mode} to RGB")
+                img = img.convert("RGB")
+            img_rgb = np.array(img)
+            print("Image converted to NumPy array successfully")
+
+            # Preprocess as RGB image using image_processing.py
+            print("Preprocessing RGB image...")
+            processed_data = preprocess_image(img_rgb)
+            print("RGB image preprocessed successfully")
+        except Exception as e:
+            raise ValueError(f"Failed to process RGB image: {str(e)}")
+
+    elif file_type == "ndvi":
+        print("Processing image as NDVI...")
+        try:
+            # TIFF and .npy payloads are decoded straight from the downloaded bytes
+            print("Preprocessing NDVI image...")
+            processed_data, _ = preprocess_ndvi(content)
+            print("NDVI image preprocessed successfully")
+        except Exception as e:
+            raise ValueError(f"Failed to process NDVI image: {str(e)}")
+
+    else:
+        raise ValueError(f"Unsupported file_type: {file_type}")
+
+    return processed_data
+
+async def _prepare_image(image: Dict, version: str, upload: Optional[Tuple[bytes, str]] = None) -> Tuple[str, Optional[Dict], Optional[np.ndarray]]:
+    """
+    Resolve an image row to (cache_key, cached_result, processed_data) for the model
+    version that will serve it. Exactly one of cached_result and processed_data is set.
+    upload is the (content, content_type) still in memory from create_image, which
+    replaces the download.
+    """
     # Get the file type from the database
     file_type = image.get("file_type", "rgb")  # Default to rgb if not specified
     print(f"Image file type from database: {file_type}")
@@ -48,94 +273,78 @@ async def classify_image(image_id: UUID, user_id: UUID) -> Dict:
     image_url = image["image_url"]
     print(f"Attempting to classify image from URL: {image_url}")
 
-    try:
-        headers = {}
-
-        print("Sending HTTP GET request to download the image...")
-        response = requests.get(image_url, headers=headers)
-        print(f"HTTP Status Code: {response.status_code}")
-        response.raise_for_status() 
+    # Same bytes + same model/preprocessing = same answer. The digest recorded at
+    # upload lets a cache hit skip the download entirely.
+    cache_key = None
+    digest = (image.get("metadata") or {}).get("content_sha256")
+    if digest:
+        cache_key = result_cache_key(digest, file_type, version)
+        cached = _result_cache.get(cache_key)
+        if cached is not None:
+            return cache_key, cached, None
 
-        content_type = response.headers.get("content-type", "unknown")
-        content_length = response.headers.get("content-length", "unknown")
-        print(f"Content-Type: {content_type}")
-        print(f"Content-Length: {content_length} bytes")
+    # Async streaming download; blocking decode and preprocessing stay off the event loop
+    if upload is not None:
+        content, content_type = upload
+    else:
+        try:
+            print("Downloading the image...")
+            content, content_type = await download_image(image_url)
+        except httpx.HTTPStatusError as e:
+            # A missing object stays missing; 5xx and transport errors propagate so jobs retry them
+            if e.response.status_code < 500:
+                raise InvalidInputError(f"Failed to download image: {str(e)}")
+            raise
 
-        if not content_type.startswith("image/"):
-            raise ValueError(f"URL does not point to an image. Content-Type: {content_type}")
+    if cache_key is None:
+        cache_key = result_cache_key(await run_io(content_hash, content), file_type, version)
+        cached = _result_cache.get(cache_key)
+        if cached is not None:
+            return cache_key, cached, None
 
+    try:
         if file_type == "rgb" and content_type == "image/tiff":
             print("Detected TIFF image, but file_type is rgb. Switching to ndvi processing as fallback...")
-            file_type = "ndvi" 
-
-        # Get the content
-        content = response.content
-        print(f"Downloaded content size: {len(content)} bytes")
-
-        # Verify the downloaded size matches the expected size
-        if content_length != "unknown" and len(content) != int(content_length):
-            raise ValueError(f"Downloaded content size ({len(content)}) does not match Content-Length ({content_length})")
-
-        # Log the first few bytes of the content to inspect it
-        first_bytes = content[:10]
-        print(f"First 10 bytes of content: {first_bytes}")
+            file_type = "ndvi"
+        processed_data = await run_io(_preprocess_content, content, content_type, file_type)
+    except Exception as e:
+        raise InvalidInputError(f"Failed to process image: {str(e)}")
+    return cache_key, None, processed_data
 
-        # Check if the content is empty
-        if not content:
-            raise ValueError("Downloaded content is empty")
+async def classify_image(image_id: UUID, user_id: UUID) -> Dict:
+    await ensure_model()
 
-        # Process the image based on file_type
-        if file_type == "rgb":
-            print("Processing image as RGB...")
-            try:
-                print("Attempting to open image with PIL...")
-                img = Image.open(BytesIO(content))
-                print("Image opened successfully with PIL")
-
-                # Convert to RGB if necessary
-                if img.mode != "RGB":
-                    print(f"Converting image mode from {img.mode} to RGB")
-                    img = img.convert("RGB")
-                img_rgb = np.array(img)
-                print("Image converted to NumPy array successfully")
-
-                # Preprocess as RGB image using image_processing.py
-                print("Preprocessing RGB image...")
-                processed_data = preprocess_image(img_rgb)
-                print("RGB image preprocessed successfully")
-            except Exception as e:
-                raise ValueError(f"Failed to process RGB image: {str(e)}")
+    # Verify the image exists and belongs to the user
+    image = await get_image(image_id)
+    if str(image["user_id"]) != str(user_id):
+        raise InvalidInputError("Unauthorized: Image does not belong to this user")
 
-        elif file_type == "ndvi":
-            print("Processing image as NDVI...")
-            try:
-                # Create a fake UploadFile for preprocess_ndvi
-                filename = "temp.tiff" if content_type == "image/tiff" else "temp.npy"
-                uploaded_file = UploadFile(filename=filename, file=BytesIO(content))
-                print("Preprocessing NDVI image...")
-                processed_data = await preprocess_ndvi(uploaded_file)
-                print("NDVI image preprocessed successfully")
-            except Exception as e:
-                raise ValueError(f"Failed to process NDVI image: {str(e)}")
+    return await _classify_row(image)
 
-        else:
-            raise ValueError(f"Unsupported file_type: {file_type}")
+async def _classify_row(image: Dict, upload: Optional[Tuple[bytes, str]] = None) -> Dict:
+    """Classify an image row the caller has already authorized and store the result."""
+    image_id = image["id"]
 
-    except requests.exceptions.RequestException as e:
-        raise ValueError(f"Failed to download image: {str(e)}")
-    except Exception as e:
-        raise ValueError(f"Failed to process image: {str(e)}")
+    # Sticky per image, so canary traffic is a stable subset of images
+    entry = _registry.route(str(image_id))
+    cache_key, cached, processed_data = await _prepare_image(image, entry.version, upload)
 
-    # Make a prediction using model_script.py
-    print("Making prediction with the model...")
-    try:
-        class_idx, confidence = predict(_model, processed_data)
-        print(f"Prediction successful: class_idx={class_idx}, confidence={confidence}")
-    except Exception as e:
-        raise ValueError(f"Prediction failed: {str(e)}")
+    if cached is not None:
+        print("Result cache hit, skipping preprocessing and prediction")
+        classification = cached["classification"]
+        confidence = cached["confidence"]
+    else:
+        # Make a prediction using model_script.py
+        print("Making prediction with the model...")
+        try:
+            class_idx, confidence = await _registry.predict(entry, processed_data)
+            print(f"Prediction successful: class_idx={class_idx}, confidence={confidence}")
+        except Exception as e:
+            raise ValueError(f"Prediction failed: {str(e)}")
 
-    classification = CLASS_NAMES[class_idx]
-    print(f"Mapped class_idx to classification: {classification}")
+        classification = entry.class_names[class_idx]
+        print(f"Mapped class_idx to classification: {classification}")
+        _result_cache.set(cache_key, {"classification": classification, "confidence": confidence})
 
     # Insert the classification into the database
     print("Inserting classification into the database...")
@@ -143,7 +352,8 @@ async def classify_image(image_id: UUID, user_id: UUID) -> Dict:
     insert_payload = {
         "image_id": str(image_id),
         "classification": classification,
-        "confidence": confidence
+        "confidence": confidence,
+        "model_version": entry.version
     }
     response = await supabase.table("classifications").insert(insert_payload).execute()
     if not response.data:
@@ -152,17 +362,240 @@ async def classify_image(image_id: UUID, user_id: UUID) -> Dict:
 
     return response.data[0]
 
-async def get_result(image_id: UUID, user_id: UUID) -> Dict:
+async def classify_upload(image: Dict, content: bytes, content_type: str) -> Optional[Dict]:
+    """
+    Classify a just-created image from the bytes create_image already holds, so the
+    result is stored without downloading the file back or looking the row up again.
+    Runs as a background task after the upload response, so failures are logged
+    rather than raised; the image can still be classified on demand.
+    """
+    try:
+        await ensure_model()
+        classification = await _classify_row(image, (content, content_type))
+        await record_action(
+            user_id=UUID(str(image["user_id"])),
+            action="classification",
+            details={"image_id": str(image["id"]), "classification_id": str(classification["id"]), "on_upload": True}
+        )
+        return classification
+    except Exception as e:
+        print(f"Classification on upload failed for image {image['id']}: {str(e)}")
+        return None
+
+async def classify_images(image_ids: List[UUID], user_id: UUID) -> AsyncIterator[Dict]:
+    """
+    Classify many images in one go: a single images query, concurrent downloads and
+    preprocessing, one batched forward pass and bulk inserts into classifications
+    and logs. Yields one status dict per image as it settles, then a summary.
+    """
+    await ensure_model()
+
+    ids = list(dict.fromkeys(str(image_id) for image_id in image_ids))
     supabase = await get_supabase()
-    
-    # Verify the image belongs to the user
+    response = await supabase.table("images").select("*").in_("id", ids).execute()
+    images = {image["id"]: image for image in response.data or []}
+
+    failed = 0
+    owned = []
+    for image_id in ids:
+        image = images.get(image_id)
+        if image is None:
+            failed += 1
+            yield {"image_id": image_id, "status": "error", "detail": "Image not found"}
+        elif str(image["user_id"]) != str(user_id):
+            failed += 1
+            yield {"image_id": image_id, "status": "error", "detail": "Unauthorized: Image does not belong to this user"}
+        else:
+            owned.append(image)
+
+    # Download and preprocess concurrently, reporting failures as they happen
+    semaphore = asyncio.Semaphore(BATCH_CLASSIFY_CONCURRENCY)
+
+    async def prepare(image):
+        async with semaphore:
+            try:
+                return image, await _prepare_image(image, routes[image["id"]].version), None
+            except Exception as e:
+                return image, None, e
+
+    routes = {image["id"]: _registry.route(image["id"]) for image in owned}
+
+    results = {}
+    to_predict = []
+    for next_done in asyncio.as_completed([prepare(image) for image in owned]):
+        image, prepared, error = await next_done
+        if error is not None:
+            failed += 1
+            yield {"image_id": image["id"], "status": "error", "detail": str(error)}
+            continue
+        cache_key, cached, processed_data = prepared
+        entry = routes[image["id"]]
+        if cached is not None:
+            results[image["id"]] = (cached["classification"], cached["confidence"], True, entry.version)
+        else:
+            to_predict.append((image["id"], cache_key, processed_data))
+        yield {"image_id": image["id"], "status": "preprocessed", "cached": cached is not None}
+
+    # One forward pass per model version for everything that missed the cache
+    by_version = {}
+    for item in to_predict:
+        by_version.setdefault(routes[item[0]].version, []).append(item)
+    for group in by_version.values():
+        entry = routes[group[0][0]]
+        try:
+            predictions = await _registry.predict_batch(entry, np.stack([data for _, _, data in group]))
+        except Exception as e:
+            for image_id, _, _ in group:
+                failed += 1
+                yield {"image_id": image_id, "status": "error", "detail": f"Prediction failed: {str(e)}"}
+            continue
+        for (image_id, cache_key, _), (class_idx, confidence) in zip(group, predictions):
+            classification = entry.class_names[class_idx]
+            _result_cache.set(cache_key, {"classification": classification, "confidence": confidence})
+            results[image_id] = (classification, confidence, False, entry.version)
+
+    stored = []
+    if results:
+        insert_payload = [
+            {"image_id": image_id, "classification": classification, "confidence": confidence, "model_version": version}
+            for image_id, (classification, confidence, _, version) in results.items()
+        ]
+        response = await supabase.table("classifications").insert(insert_payload).execute()
+        stored = response.data or []
+        await record_actions([
+            {
+                "user_id": str(user_id),
+                "action": "classification",
+                "details": {"image_id": row["image_id"], "classification_id": str(row["id"]), "batch": True}
+            }
+            for row in stored
+        ])
+
+    stored_ids = set()
+    for row in stored:
+        stored_ids.add(row["image_id"])
+        yield {"image_id": row["image_id"], "status": "classified", "cached": results[row["image_id"]][2], "classification": row}
+    for image_id in results:
+        if image_id not in stored_ids:
+            failed += 1
+            yield {"image_id": image_id, "status": "error", "detail": "Failed to store classification in database"}
+
+    yield {"status": "done", "requested": len(ids), "classified": len(stored_ids), "failed": failed}
+
+async def classify_scene(image_id: UUID, user_id: UUID, tile_size: int = TILE_SIZE, stride: Optional[int] = TILE_STRIDE) -> Dict:
+    """
+    Classify a full NDVI GeoTIFF tile by tile instead of squashing it to one label.
+    Windows are read straight from storage (HTTP range requests), batched through
+    the model, and the resulting class grid is stored as a georeferenced GeoTIFF.
+    """
+    await ensure_model()
+
     image = await get_image(image_id)
     if str(image["user_id"]) != str(user_id):
-        raise ValueError("Unauthorized: Image does not belong to this user")
+        raise InvalidInputError("Unauthorized: Image does not belong to this user")
+    if image.get("file_type", "rgb") != "ndvi":
+        raise InvalidInputError("Tiled inference is only supported for NDVI GeoTIFFs")
+
+    entry = _registry.route(str(image_id))
+    try:
+        tiler = await run_io(SceneTiler, image["image_url"], tile_size, stride, TILE_BATCH_SIZE, 299, MAX_SCENE_TILES)
+    except Exception as e:
+        raise ValueError(f"Failed to open scene: {str(e)}")
+
+    class_grid = np.full((tiler.rows, tiler.cols), CLASS_MAP_NODATA, dtype=np.uint8)
+    confidence_grid = np.full((tiler.rows, tiler.cols), np.nan, dtype=np.float32)
+    # Read the next batch of windows while the current one is on the model
+    pending = asyncio.ensure_future(run_io(tiler.next_batch))
+    try:
+        while True:
+            next_batch = await pending
+            if next_batch is None:
+                break
+            pending = asyncio.ensure_future(run_io(tiler.next_batch))
+            positions, batch = next_batch
+            predictions = await _registry.predict_batch(entry, batch)
+            for (row, col), (class_idx, confidence) in zip(positions, predictions):
+                class_grid[row, col] = class_idx
+                confidence_grid[row, col] = confidence
+        class_map = await run_io(write_class_map, class_grid, tiler.class_map_transform(), tiler.src.crs)
+    finally:
+        if not pending.done():
+            await asyncio.wait([pending])
+        await run_io(tiler.close)
+
+    supabase = await get_supabase()
+    storage_bucket = supabase.storage.from_("images")
+    class_map_path = f"{user_id}/classmaps/{image_id}.tif"
+    try:
+        await storage_bucket.upload(class_map_path, class_map, file_options={"content-type": "image/tiff", "upsert": "true"})
+    except Exception as e:
+        raise ValueError(f"Storage upload failed: {str(e)}")
+    class_map_url = await storage_bucket.get_public_url(class_map_path)
 
-    # Retrieve the latest classification for the image
-    response = await supabase.table("classifications").select("*").eq("image_id", str(image_id)).order("created_at", desc=True).limit(1).execute()
+    classified = class_grid != CLASS_MAP_NODATA
+    counts = np.bincount(class_grid[classified], minlength=len(entry.class_names))
+    return {
+        "image_id": str(image_id),
+        "tile_size": tiler.tile_size,
+        "stride": tiler.stride,
+        "rows": tiler.rows,
+        "cols": tiler.cols,
+        "model_version": entry.version,
+        "class_names": entry.class_names,
+        "grid": np.where(classified, class_grid.astype(np.int16), -1).tolist(),
+        "confidence": [[None if np.isnan(value) else round(float(value), 4) for value in row] for row in confidence_grid],
+        "class_counts": {name: int(count) for name, count in zip(entry.class_names, counts)},
+        "class_map_url": class_map_url,
+    }
+
+async def get_result(image_id: UUID, user_id: UUID) -> Dict:
+    supabase = await get_supabase()
+
+    # The image row (for the ownership check) and its latest classification in one request
+    query = supabase.table("images").select(f"id,user_id,{LATEST_CLASSIFICATION}").eq("id", str(image_id))
+    response = await with_latest_classification(query).execute()
     if not response.data:
+        raise ValueError("Image not found")
+    image = response.data[0]
+    if str(image["user_id"]) != str(user_id):
+        raise ValueError("Unauthorized: Image does not belong to this user")
+
+    classification = flatten_latest(image)
+    if classification is None:
         raise ValueError("No classification found for this image")
+    return classification
+
+async def get_results(image_ids: List[UUID], user_id: UUID) -> Dict[str, Optional[Dict]]:
+    """
+    Latest classification of each of the user's images, in one request however many
+    there are: {image_id: classification or None}. Images that don't exist or belong
+    to someone else are left out.
+    """
+    ids = list(dict.fromkeys(str(image_id) for image_id in image_ids))
+    if not ids:
+        return {}
+    supabase = await get_supabase()
+    query = supabase.table("images").select(f"id,{LATEST_CLASSIFICATION}").in_("id", ids).eq("user_id", str(user_id))
+    response = await with_latest_classification(query).execute()
+    return {row["id"]: flatten_latest(row) for row in response.data}
+
+# Handlers for the background job queue (services/jobs.py), keyed by job kind
+async def classification_job(job: Dict) -> Dict:
+    image_id, user_id = UUID(job["payload"]["image_id"]), UUID(job["user_id"])
+    classification = await classify_image(image_id, user_id)
+    await record_action(
+        user_id=user_id,
+        action="classification",
+        details={"image_id": str(image_id), "classification_id": str(classification["id"]), "job_id": job["id"]}
+    )
+    return classification
 
-    return response.data[0]
\ No newline at end of file
+async def scene_job(job: Dict) -> Dict:
+    image_id, user_id = UUID(job["payload"]["image_id"]), UUID(job["user_id"])
+    result = await classify_scene(image_id, user_id, tile_size=job["payload"]["tile_size"], stride=job["payload"]["stride"])
+    await record_action(
+        user_id=user_id,
+        action="scene_classification",
+        details={"image_id": str(image_id), "tiles": result["rows"] * result["cols"], "class_map_url": result["class_map_url"], "job_id": job["id"]}
+    )
+    return result
@@ -0,0 +1,106 @@
+# services/executor.py
+import asyncio
+import functools
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from config import EXECUTOR_IO_WORKERS, INFERENCE_EXECUTOR, INFERENCE_PROCESSES, INFERENCE_BACKEND, INFERENCE_BACKEND_PATH, INFERENCE_THREADS, INFERENCE_INTER_OP_THREADS, TFLITE_SHARED_WEIGHTS, MODEL_VARIANT, MODEL_VARIANTS_DIR, MODEL_WARMUP, BATCH_MAX_SIZE
+
+# Thread pool for blocking downloads, decoding and preprocessing
+_io_executor: Optional[ThreadPoolExecutor] = None
+# Dedicated inference thread, or a process pool that holds its own model copy
+_inference_executor: Optional[Executor] = None
+# Shadow model evaluations, kept off the inference executor so they never queue ahead of real requests
+_shadow_executor: Optional[ThreadPoolExecutor] = None
+
+# Model loaded inside an inference worker process (process mode only)
+_process_model = None
+
+def _init_inference_process(backend: str, model_path: str, num_threads: Optional[int], inter_op_threads: Optional[int]):
+    global _process_model
+    from model.backends import load_backend, warm_up
+    _process_model = load_backend(backend, model_path, num_threads=num_threads, inter_op_threads=inter_op_threads, shared_weights=TFLITE_SHARED_WEIGHTS)
+    if MODEL_WARMUP:
+        warm_up(_process_model, sorted({1, BATCH_MAX_SIZE}))
+
+def predict_in_worker(batch):
+    """Run a batch through the model owned by the current inference worker process."""
+    from model.backends import predict_batch
+    if _process_model is None:
+        raise RuntimeError("Inference worker has no model loaded")
+    return predict_batch(_process_model, batch)
+
+def _process_model_ready() -> bool:
+    return _process_model is not None
+
+def inference_in_process() -> bool:
+    return INFERENCE_EXECUTOR == "process"
+
+def start_inference_processes() -> None:
+    """
+    Start the inference worker processes, which load the model in their initializer,
+    and block until one answers. Raises if the model failed to load there.
+    """
+    global _inference_executor
+    start_executors()
+    try:
+        ready = _inference_executor.submit(_process_model_ready).result()
+    except Exception:
+        # A failed initializer breaks the pool; drop it so the next load attempt starts a fresh one
+        _inference_executor.shutdown(wait=False, cancel_futures=True)
+        _inference_executor = None
+        raise
+    if not ready:
+        raise RuntimeError("Inference worker has no model loaded")
+
+def start_executors():
+    """
+    Create the I/O and inference executors. Safe to call more than once.
+    """
+    global _io_executor, _inference_executor, _shadow_executor
+    if _io_executor is None:
+        _io_executor = ThreadPoolExecutor(max_workers=EXECUTOR_IO_WORKERS, thread_name_prefix="io")
+    if _shadow_executor is None:
+        _shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+    if _inference_executor is None:
+        if inference_in_process():
+            from model.backends import resolve_backend
+            backend, model_path = resolve_backend(INFERENCE_BACKEND, INFERENCE_BACKEND_PATH, MODEL_VARIANT, MODEL_VARIANTS_DIR)
+            _inference_executor = ProcessPoolExecutor(
+                max_workers=INFERENCE_PROCESSES,
+                initializer=_init_inference_process,
+                initargs=(backend, model_path, INFERENCE_THREADS, INFERENCE_INTER_OP_THREADS)
+            )
+        elif INFERENCE_EXECUTOR == "thread":
+            _inference_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+        else:
+            raise ValueError(f"Unsupported INFERENCE_EXECUTOR: {INFERENCE_EXECUTOR}")
+
+def shutdown_executors():
+    global _io_executor, _inference_executor, _shadow_executor
+    if _io_executor is not None:
+        _io_executor.shutdown(wait=True, cancel_futures=True)
+        _io_executor = None
+    if _inference_executor is not None:
+        _inference_executor.shutdown(wait=True, cancel_futures=True)
+        _inference_executor = None
+    if _shadow_executor is not None:
+        _shadow_executor.shutdown(wait=True, cancel_futures=True)
+        _shadow_executor = None
+
+async def run_io(fn: Callable, *args, **kwargs) -> Any:
+    """Run a blocking I/O, decode or preprocessing call on the I/O thread pool."""
+    start_executors()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_executor, functools.partial(fn, *args, **kwargs))
+
+async def run_inference(fn: Callable, *args, **kwargs) -> Any:
+    """Run a model call on the inference executor."""
+    start_executors()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_inference_executor, functools.partial(fn, *args, **kwargs))
+
+async def run_shadow(fn: Callable, *args, **kwargs) -> Any:
+    """Run a shadow model call on its own background thread."""
+    start_executors()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_shadow_executor, functools.partial(fn, *args, **kwargs))
@@ -1,29 +1,78 @@
 # services/image.py
+import os
+import tempfile
+from datetime import datetime
 from uuid import UUID
 from database.supabase import get_supabase
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple, Callable, Optional, AsyncIterator
 from fastapi import UploadFile
+from utils.http import get_http_client
+from services.cache import content_hash
+from services.executor import run_io
+from services.upload import stream_to_storage
+from utils.errors import InvalidInputError
+from services.pagination import projection, decode_cursor, fetch_page, iter_rows
+from model.cog import convert_to_cog, convert_file_to_cog
+from config import MAX_DOWNLOAD_BYTES, DOWNLOAD_CHUNK_SIZE, UPLOAD_CHUNK_SIZE, PAGE_SIZE_DEFAULT, COG_ON_INGEST, COG_BLOCK_SIZE, COG_COMPRESS, COG_OVERVIEW_RESAMPLING
 
-async def create_image(user_id: UUID, file: UploadFile, metadata: Dict[str, Any] = None) -> dict:
-    print(f"Creating image for user_id: {user_id}")
+# Content types that can be classified; .npy NDVI arrays are stored as octet-stream
+DOWNLOADABLE_TYPES = ("image/", "application/octet-stream")
+ALLOWED_TYPES = ["image/tiff", "image/jpeg", "image/png", "application/octet-stream"]
+
+# Columns a listing can project with fields=
+IMAGE_FIELDS = ("id", "user_id", "image_url", "file_type", "metadata", "created_at")
+
+# PostgREST embed of an image's classifications, cut down to the newest by with_latest_classification
+LATEST_CLASSIFICATION = "latest_classification:classifications(*)"
+
+# Post-upload pipeline stage: called with the new row and the bytes still in memory
+UploadStage = Callable[[Dict[str, Any], bytes, str], Any]
+
+def _file_type(content_type: str, metadata: Dict[str, Any] = None) -> str:
+    if content_type not in ALLOWED_TYPES:
+        raise ValueError(f"Unsupported file type: {content_type}. Allowed types: {ALLOWED_TYPES}")
 
-    # Validate file type
-    allowed_types = ["image/tiff", "image/jpeg", "image/png", "application/octet-stream"]
-    print(f"Uploaded file content-type: {file.content_type}")
-    if file.content_type not in allowed_types:
-        raise ValueError(f"Unsupported file type: {file.content_type}. Allowed types: {allowed_types}")
-    
     # Determine file_type (rgb or ndvi)
     file_type = "rgb"
-    if file.content_type == "image/tiff" or file.content_type == "image/npy":
+    if content_type == "image/tiff" or content_type == "image/npy":
         # For TIFF files, assume NDVI unless metadata indicates otherwise
         file_type = "ndvi"  # Default to NDVI for TIFF
         if metadata and metadata.get("is_rgb", False):
             file_type = "rgb"
     print(f"Assigned file_type: {file_type}")
+    return file_type
+
+def needs_cog(content_type: str, file_type: str) -> bool:
+    return COG_ON_INGEST and content_type == "image/tiff" and file_type == "ndvi"
+
+def _to_cog(content: bytes) -> Tuple[bytes, Optional[Dict[str, Any]]]:
+    """COG bytes and raster metadata, or the original bytes if GDAL can't rewrite them. Runs on the I/O executor."""
+    try:
+        return convert_to_cog(content, COG_BLOCK_SIZE, COG_COMPRESS, COG_OVERVIEW_RESAMPLING)
+    except Exception as e:
+        print(f"COG conversion failed, storing the upload as-is: {str(e)}")
+        return content, None
+
+async def create_image(user_id: UUID, file: UploadFile, metadata: Dict[str, Any] = None, on_stored: Optional[UploadStage] = None) -> dict:
+    print(f"Creating image for user_id: {user_id}")
+
+    # Validate file type
+    print(f"Uploaded file content-type: {file.content_type}")
+    file_type = _file_type(file.content_type, metadata)
     
     # Read the file contents into bytes
     file_contents = await file.read()
+    metadata = dict(metadata or {})
+
+    # Store NDVI GeoTIFFs as COGs so previews and classification read only the overview or tiles they need
+    if needs_cog(file.content_type, file_type):
+        file_contents, raster = await run_io(_to_cog, file_contents)
+        if raster is not None:
+            metadata["raster"] = raster
+            print(f"Converted to COG: {raster['source']['compression']} -> {raster['cog']['compression']}, overviews {raster['cog']['overviews']}")
+
+    # Record the content digest (of the stored bytes) so classification can hit the result cache without re-downloading
+    metadata["content_sha256"] = await run_io(content_hash, file_contents)
     
     # Initialize the Supabase client with service role key
     supabase = await get_supabase()
@@ -63,20 +112,165 @@ async def create_image(user_id: UUID, file: UploadFile, metadata: Dict[str, Any]
     
     if not response.data:
         raise ValueError("Failed to store image metadata in database")
+
+    if on_stored is not None:
+        on_stored(response.data[0], file_contents, file.content_type)
     
     return response.data[0]
 
+async def create_image_stream(user_id: UUID, chunks: AsyncIterator[bytes], filename: str, content_type: str,
+                              length: Optional[int] = None, metadata: Dict[str, Any] = None) -> dict:
+    """
+    Like create_image, but the body is piped to Storage chunk by chunk as it arrives
+    instead of being read into memory first, for large multi-band GeoTIFFs.
+    """
+    print(f"Creating streamed image for user_id: {user_id}")
+    file_type = _file_type(content_type, metadata)
+    if not filename or "/" in filename or filename in (".", ".."):
+        raise ValueError(f"Invalid filename: {filename}")
+
+    file_path = f"{user_id}/{filename}"
+    print(f"Streaming upload to Supabase Storage: {file_path}")
+    stored = await stream_to_storage(chunks, "images", file_path, content_type, length)
+    print(f"Streamed {stored['size_bytes']} bytes")
+
+    metadata = dict(metadata or {})
+    metadata["content_sha256"] = stored["content_sha256"]
+    metadata["size_bytes"] = stored["size_bytes"]
+
+    supabase = await get_supabase()
+    image_url = await supabase.storage.from_("images").get_public_url(file_path)
+    insert_payload = {
+        "user_id": str(user_id),
+        "image_url": image_url,
+        "metadata": metadata,
+        "file_type": file_type
+    }
+    try:
+        response = await supabase.table("images").insert(insert_payload).execute()
+    except Exception as e:
+        print(f"Database insert failed: {str(e)}")
+        raise ValueError(f"Database insert failed: {str(e)}")
+    if not response.data:
+        raise ValueError("Failed to store image metadata in database")
+    return response.data[0]
+
+async def _download_to_file(url: str, path: str) -> None:
+    client = await get_http_client()
+    async with client.stream("GET", url) as response:
+        response.raise_for_status()
+        with open(path, "wb") as f:
+            async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+
+async def _file_chunks(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = await run_io(f.read, UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+async def convert_image_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Background COG conversion for streamed uploads, which are never held in memory:
+    the stored file is spooled to disk, rewritten as a COG there and streamed back
+    over the original object.
+    """
+    image = await get_image(UUID(job["payload"]["image_id"]))
+    if str(image["user_id"]) != job["user_id"]:
+        raise InvalidInputError("Unauthorized: Image does not belong to this user")
+    with tempfile.TemporaryDirectory() as tmp:
+        source_path = os.path.join(tmp, "source.tif")
+        cog_path = os.path.join(tmp, "cog.tif")
+        await _download_to_file(image["image_url"], source_path)
+        try:
+            raster = await run_io(convert_file_to_cog, source_path, cog_path, COG_BLOCK_SIZE, COG_COMPRESS, COG_OVERVIEW_RESAMPLING)
+        except Exception as e:
+            raise InvalidInputError(f"COG conversion failed: {str(e)}")
+        stored = await stream_to_storage(
+            _file_chunks(cog_path), "images", job["payload"]["path"], "image/tiff",
+            os.path.getsize(cog_path), upsert=True
+        )
+
+    metadata = dict(image.get("metadata") or {})
+    metadata.update(content_sha256=stored["content_sha256"], size_bytes=stored["size_bytes"], raster=raster)
+    supabase = await get_supabase()
+    await supabase.table("images").update({"metadata": metadata}).eq("id", image["id"]).execute()
+    return {"image_id": image["id"], "raster": raster}
+
 async def get_image(image_id: UUID) -> dict:
     supabase = await get_supabase()
     response = await supabase.table("images").select("*").eq("id", str(image_id)).limit(1).execute()
     if not response.data:
-        raise ValueError("Image not found")
+        raise InvalidInputError("Image not found")
     return response.data[0]
 
-async def get_all_images(user_id: UUID) -> List[dict]:
+def with_latest_classification(query):
+    """Limit the LATEST_CLASSIFICATION embed of an images query to each image's newest row."""
+    return query.order("created_at", desc=True, foreign_table="latest_classification").limit(1, foreign_table="latest_classification")
+
+def flatten_latest(row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The embedded newest classification of an image row (a list of at most one), or None."""
+    embedded = row.get("latest_classification")
+    return embedded[0] if embedded else None
+
+def _images_query(supabase, user_id: Optional[UUID], fields: Optional[str], created_after: Optional[datetime] = None,
+                  created_before: Optional[datetime] = None, file_type: Optional[str] = None, classification: Optional[str] = None,
+                  with_classification: bool = False):
+    select = projection(fields, IMAGE_FIELDS)
+    if classification:
+        # Inner embed of the latest_classifications view (migration 003): only images whose newest label matches
+        select += ",current_classification:latest_classifications!inner(classification)"
+    if with_classification:
+        select += f",{LATEST_CLASSIFICATION}"
+    query = supabase.table("images").select(select)
+    if with_classification:
+        query = with_latest_classification(query)
+    if user_id is not None:
+        query = query.eq("user_id", str(user_id))
+    if created_after:
+        query = query.gte("created_at", created_after.isoformat())
+    if created_before:
+        query = query.lt("created_at", created_before.isoformat())
+    if file_type:
+        query = query.eq("file_type", file_type)
+    if classification:
+        query = query.eq("current_classification.classification", classification)
+    return query
+
+def _without_embed(row: Dict[str, Any]) -> Dict[str, Any]:
+    row.pop("current_classification", None)
+    if "latest_classification" in row:
+        row["latest_classification"] = flatten_latest(row)
+    return row
+
+async def get_all_images(user_id: Optional[UUID], limit: int = PAGE_SIZE_DEFAULT, cursor: Optional[str] = None,
+                         fields: Optional[str] = None, **filters) -> Dict[str, Any]:
+    """
+    One page of images, newest first: {"items": [...], "next_cursor": ...}. user_id None
+    lists every user's images (admin). filters: created_after, created_before, file_type, classification,
+    and with_classification to embed each image's newest classification in the same query.
+    """
     supabase = await get_supabase()
-    response = await supabase.table("images").select("*").eq("user_id", str(user_id)).execute()
-    return response.data
+    result = await fetch_page(_images_query(supabase, user_id, fields, **filters), cursor, limit)
+    result["items"] = [_without_embed(row) for row in result["items"]]
+    return result
+
+def export_images(user_id: Optional[UUID], cursor: Optional[str] = None, fields: Optional[str] = None, **filters) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Every matching image from the cursor on, fetched EXPORT_PAGE_SIZE rows at a time.
+    fields and cursor are checked here, before a streamed response has started.
+    """
+    projection(fields, IMAGE_FIELDS)
+    if cursor:
+        decode_cursor(cursor)
+    async def make_query():
+        return _images_query(await get_supabase(), user_id, fields, **filters)
+    async def rows():
+        async for row in iter_rows(make_query, cursor):
+            yield _without_embed(row)
+    return rows()
 
 async def delete_image(image_id: UUID) -> None:
     supabase = await get_supabase()
@@ -91,4 +285,45 @@ async def delete_image(image_id: UUID) -> None:
     await supabase.table("images").delete().eq("id", str(image_id)).execute()
 
 async def view_images(user_id: UUID) -> List[dict]:
-    return await get_all_images(user_id)
\ No newline at end of file
+    return [row async for row in export_images(user_id)]
+
+async def download_image(image_url: str, max_bytes: int = MAX_DOWNLOAD_BYTES) -> Tuple[bytes, str]:
+    """
+    Stream a stored image into memory. Content-Type and Content-Length are
+    validated before the body is read, and the body is capped at max_bytes.
+    """
+    client = await get_http_client()
+    async with client.stream("GET", image_url) as response:
+        print(f"HTTP Status Code: {response.status_code}")
+        response.raise_for_status()
+
+        content_type = response.headers.get("content-type", "unknown")
+        content_length = response.headers.get("content-length")
+        print(f"Content-Type: {content_type}")
+        print(f"Content-Length: {content_length} bytes")
+
+        if not content_type.startswith(DOWNLOADABLE_TYPES):
+            raise InvalidInputError(f"URL does not point to an image. Content-Type: {content_type}")
+        if content_length is not None and int(content_length) > max_bytes:
+            raise InvalidInputError(f"Image is too large ({content_length} bytes, limit {max_bytes})")
+
+        chunks = []
+        received = 0
+        async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+            received += len(chunk)
+            if received > max_bytes:
+                raise InvalidInputError(f"Image exceeds the download limit of {max_bytes} bytes")
+            chunks.append(chunk)
+        # Content-Length counts the bytes on the wire, before httpx decodes gzip/br
+        downloaded = response.num_bytes_downloaded
+
+    content = b"".join(chunks)
+    print(f"Downloaded content size: {len(content)} bytes")
+
+    # Verify the downloaded size matches the expected size
+    if content_length is not None and downloaded != int(content_length):
+        raise ValueError(f"Downloaded content size ({downloaded}) does not match Content-Length ({content_length})")
+    if not content:
+        raise ValueError("Downloaded content is empty")
+
+    return content, content_type
@@ -0,0 +1,354 @@
+# services/jobs.py
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Optional
+from services.executor import run_io
+from utils.errors import InvalidInputError
+from config import JOB_BACKEND, JOB_DB_PATH, JOB_WORKERS, JOB_MAX_PENDING, JOB_MAX_ATTEMPTS, JOB_RETRY_BACKOFF, JOB_RESULT_TTL, JOB_LEASE_SECONDS
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+class QueueFullError(Exception):
+    """Raised by submit() when the queue is at JOB_MAX_PENDING (backpressure)."""
+
+class MemoryJobBackend:
+    """
+    Jobs in this process only. Fast, but lost on restart and invisible to
+    other server workers, so status polling must hit the same process.
+    """
+    lease_seconds = None  # jobs die with the process, so there is nothing to renew
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict] = {}
+        self._queued: Dict[str, float] = {}  # job_id -> available_at
+        self._wakeup = asyncio.Event()
+
+    async def put(self, job: Dict) -> None:
+        self._jobs[job["id"]] = dict(job)
+        if job["status"] == "queued":
+            self._queued[job["id"]] = job["available_at"]
+            self._wakeup.set()
+
+    async def claim(self) -> Optional[Dict]:
+        now = time.time()
+        ready = [job_id for job_id, available_at in self._queued.items() if available_at <= now]
+        if not ready:
+            # Cleared here rather than in wait() so a put() in between isn't missed
+            self._wakeup.clear()
+            return None
+        job_id = min(ready, key=lambda job_id: self._jobs[job_id]["created_at"])
+        del self._queued[job_id]
+        job = self._jobs[job_id]
+        job.update(status="running", started_at=now, attempts=job["attempts"] + 1)
+        return dict(job)
+
+    async def renew(self, job: Dict) -> None:
+        pass
+
+    async def update(self, job: Dict) -> None:
+        await self.put(job)
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    async def counts(self) -> Dict[str, int]:
+        return dict(Counter(job["status"] for job in self._jobs.values()))
+
+    async def prune(self, older_than: float) -> None:
+        for job_id in [job_id for job_id, job in self._jobs.items() if job["status"] in ("succeeded", "failed") and job["finished_at"] < older_than]:
+            del self._jobs[job_id]
+
+    async def wait(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def close(self) -> None:
+        pass
+
+class SQLiteJobBackend:
+    """
+    Jobs in a local SQLite file. Survives restarts and is shared by every server
+    worker on the host, so any worker can answer a status poll. Workers claim jobs
+    with a single UPDATE ... RETURNING, which takes a lease of lease_seconds that
+    the worker renews while the job runs. A job whose lease ran out (its worker
+    died or hung) is claimed again; live workers' jobs are left alone.
+    """
+    def __init__(self, path: str, poll_interval: float = 0.5, lease_seconds: float = 60):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, available_at REAL NOT NULL, "
+            "created_at REAL NOT NULL, finished_at REAL, data TEXT NOT NULL)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "lease_until" not in columns:
+            # Files created before leases; their running jobs have none, so they are claimable again
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN lease_id TEXT")
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN lease_until REAL")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_claim_idx ON jobs (status, available_at, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_lease_idx ON jobs (status, lease_until)")
+        self._lock = threading.Lock()
+
+    def _execute(self, sql: str, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _write(self, job: Dict) -> None:
+        self._execute(
+            "INSERT OR REPLACE INTO jobs (id, status, available_at, created_at, finished_at, data) VALUES (?, ?, ?, ?, ?, ?)",
+            (job["id"], job["status"], job["available_at"], job["created_at"], job.get("finished_at"), json.dumps(job, default=str))
+        )
+
+    def _claim(self) -> Optional[Dict]:
+        now = time.time()
+        lease_id = uuid.uuid4().hex
+        # attempts is counted here, so a job that keeps killing its worker still runs out of them
+        rows = self._execute(
+            "UPDATE jobs SET status = 'running', lease_id = ?, lease_until = ?, "
+            "data = json_set(data, '$.status', 'running', '$.started_at', ?, '$.lease_id', ?, "
+            "'$.attempts', json_extract(data, '$.attempts') + 1) "
+            "WHERE id = (SELECT id FROM jobs WHERE (status = 'queued' AND available_at <= ?) "
+            "OR (status = 'running' AND (lease_until IS NULL OR lease_until < ?)) ORDER BY created_at LIMIT 1) "
+            "RETURNING data",
+            (lease_id, now + self.lease_seconds, now, lease_id, now, now)
+        )
+        return json.loads(rows[0][0]) if rows else None
+
+    def _update(self, job: Dict) -> bool:
+        # Only the worker still holding the lease may record the outcome; one whose
+        # lease ran out has been superseded by whichever worker reclaimed the job
+        rows = self._execute(
+            "UPDATE jobs SET status = ?, available_at = ?, finished_at = ?, data = ?, lease_id = NULL, lease_until = NULL "
+            "WHERE id = ? AND lease_id = ? RETURNING id",
+            (job["status"], job["available_at"], job.get("finished_at"), json.dumps(job, default=str), job["id"], job.get("lease_id"))
+        )
+        return bool(rows)
+
+    def _renew(self, job: Dict) -> None:
+        self._execute(
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND lease_id = ?",
+            (time.time() + self.lease_seconds, job["id"], job.get("lease_id"))
+        )
+
+    async def put(self, job: Dict) -> None:
+        await run_io(self._write, job)
+
+    async def claim(self) -> Optional[Dict]:
+        return await run_io(self._claim)
+
+    async def renew(self, job: Dict) -> None:
+        await run_io(self._renew, job)
+
+    async def update(self, job: Dict) -> None:
+        if not await run_io(self._update, job):
+            print(f"Dropped update of job {job['id']}: lease {job.get('lease_id')} is no longer held")
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        rows = await run_io(self._execute, "SELECT data FROM jobs WHERE id = ?", (job_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    async def counts(self) -> Dict[str, int]:
+        rows = await run_io(self._execute, "SELECT status, COUNT(*) FROM jobs GROUP BY status")
+        return {status: count for status, count in rows}
+
+    async def prune(self, older_than: float) -> None:
+        await run_io(self._execute, "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?", (older_than,))
+
+    async def wait(self, timeout: float) -> None:
+        # Other processes can enqueue too, so poll
+        await asyncio.sleep(min(timeout, self.poll_interval))
+
+    async def close(self) -> None:
+        await run_io(self._conn.close)
+
+class JobQueue:
+    """
+    Background job runner: a fixed pool of worker tasks pulling from a backend.
+    Failures other than InvalidInputError (bad input, which won't fix itself) are retried
+    with exponential backoff up to max_attempts. submit() refuses new jobs once
+    max_pending jobs are waiting, so callers can shed load instead of queueing forever.
+    """
+    def __init__(self, backend, handlers: Dict[str, JobHandler], concurrency: int = 2, max_pending: int = 100,
+                 max_attempts: int = 3, retry_backoff: float = 2.0, result_ttl: float = 3600):
+        self.backend = backend
+        self.handlers = handlers
+        self.concurrency = max(1, concurrency)
+        self.max_pending = max_pending
+        self.max_attempts = max(1, max_attempts)
+        self.retry_backoff = retry_backoff
+        self.result_ttl = result_ttl
+        self._workers = []
+        self._running = 0
+        self._stats = Counter()
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
+
+    async def start(self) -> None:
+        if self._workers:
+            return
+        self._workers = [asyncio.create_task(self._work(), name=f"job-worker-{i}") for i in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        await self.backend.close()
+
+    async def submit(self, kind: str, user_id: str, payload: Dict[str, Any]) -> Dict:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        counts = await self.backend.counts()
+        if counts.get("queued", 0) >= self.max_pending:
+            self._stats["rejected"] += 1
+            raise QueueFullError(f"Job queue is full ({self.max_pending} pending)")
+        now = time.time()
+        job = {
+            "id": str(uuid.uuid4()),
+            "kind": kind,
+            "user_id": str(user_id),
+            "payload": payload,
+            "status": "queued",
+            "attempts": 0,
+            "max_attempts": self.max_attempts,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "available_at": now,
+            "started_at": None,
+            "finished_at": None,
+        }
+        await self.backend.put(job)
+        self._stats["submitted"] += 1
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        return await self.backend.get(job_id)
+
+    async def _work(self) -> None:
+        last_prune = 0.0
+        while True:
+            # A worker that dies here stops draining the queue without a trace, so
+            # every step is guarded and the loop carries on
+            try:
+                job = await self.backend.claim()
+                if job is None:
+                    if time.time() - last_prune > 60:
+                        last_prune = time.time()
+                        await self.backend.prune(time.time() - self.result_ttl)
+                    await self.backend.wait(1.0)
+                    continue
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Job worker error: {str(e)}")
+                await asyncio.sleep(1.0)
+
+    async def _renew_lease(self, job: Dict) -> None:
+        while True:
+            await asyncio.sleep(self.backend.lease_seconds / 3)
+            try:
+                await self.backend.renew(job)
+            except Exception as e:
+                print(f"Lease renewal of job {job['id']} failed: {str(e)}")
+
+    async def _run(self, job: Dict) -> None:
+        self._running += 1
+        start = time.time()
+        self._wait_seconds += start - job["available_at"]
+        heartbeat = asyncio.create_task(self._renew_lease(job)) if self.backend.lease_seconds else None
+        try:
+            if job["attempts"] > job["max_attempts"]:
+                # Claimed again after its lease ran out on the last attempt
+                raise InvalidInputError("Job was interrupted on its final attempt")
+            result = await self.handlers[job["kind"]](job)
+            job.update(status="succeeded", result=result, error=None)
+            self._stats["succeeded"] += 1
+        except Exception as e:
+            job["error"] = str(e)
+            if isinstance(e, InvalidInputError) or job["attempts"] >= job["max_attempts"]:
+                job["status"] = "failed"
+                self._stats["failed"] += 1
+            else:
+                job["status"] = "queued"
+                job["available_at"] = time.time() + self.retry_backoff * 2 ** (job["attempts"] - 1)
+                self._stats["retried"] += 1
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+            self._running -= 1
+            self._run_seconds += time.time() - start
+            if job["status"] != "queued":
+                job["finished_at"] = time.time()
+        try:
+            await self.backend.update(job)
+        except Exception as e:
+            print(f"Recording the outcome of job {job['id']} failed: {str(e)}")
+
+    async def stats(self) -> Dict:
+        finished = self._stats["succeeded"] + self._stats["failed"] + self._stats["retried"]
+        counts = await self.backend.counts()
+        return {
+            "backend": type(self.backend).__name__,
+            "workers": len(self._workers),
+            "running": self._running,
+            "queue_depth": counts.get("queued", 0),
+            "max_pending": self.max_pending,
+            "status_counts": counts,
+            "submitted": self._stats["submitted"],
+            "succeeded": self._stats["succeeded"],
+            "failed": self._stats["failed"],
+            "retried": self._stats["retried"],
+            "rejected": self._stats["rejected"],
+            "avg_wait_seconds": (self._wait_seconds / finished) if finished else 0.0,
+            "avg_run_seconds": (self._run_seconds / finished) if finished else 0.0,
+        }
+
+# Process-wide queue, created in the lifespan
+_queue: Optional[JobQueue] = None
+
+def create_backend(kind: str, path: str):
+    if kind == "memory":
+        return MemoryJobBackend()
+    if kind == "sqlite":
+        return SQLiteJobBackend(path, lease_seconds=JOB_LEASE_SECONDS)
+    raise ValueError(f"Unsupported JOB_BACKEND: {kind}")
+
+async def start_jobs(handlers: Dict[str, JobHandler]) -> JobQueue:
+    global _queue
+    if _queue is None:
+        _queue = JobQueue(
+            create_backend(JOB_BACKEND, JOB_DB_PATH),
+            handlers,
+            concurrency=JOB_WORKERS,
+            max_pending=JOB_MAX_PENDING,
+            max_attempts=JOB_MAX_ATTEMPTS,
+            retry_backoff=JOB_RETRY_BACKOFF,
+            result_ttl=JOB_RESULT_TTL
+        )
+        await _queue.start()
+    return _queue
+
+async def stop_jobs() -> None:
+    global _queue
+    if _queue is not None:
+        await _queue.stop()
+        _queue = None
+
+def get_job_queue() -> JobQueue:
+    if _queue is None:
+        raise RuntimeError("Job queue is not running")
+    return _queue
@@ -1,23 +1,86 @@
 # services/log.py
 from uuid import UUID
-from typing import List, Dict, Any
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, AsyncIterator
 from database.supabase import get_supabase
+from services.pagination import projection, decode_cursor, fetch_page, iter_rows
+from services.logsink import LogSink
+from config import (PAGE_SIZE_DEFAULT, LOG_SINK_ENABLED, LOG_QUEUE_MAX, LOG_QUEUE_POLICY, LOG_FLUSH_SIZE,
+                    LOG_FLUSH_INTERVAL, LOG_WRITE_RETRIES, LOG_SPILL_PATH)
 
-async def record_action(user_id: UUID, action: str, details: Dict[str, Any] = None) -> None:
-    supabase = await get_supabase()
-    insert_payload = {
+# Columns a listing can project with fields=
+LOG_FIELDS = ("id", "user_id", "action", "details", "created_at")
+
+def _log_row(user_id: UUID, action: str, details: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    # Stamped here rather than by the table default, so a queued or spilled entry keeps the time it happened
+    return {
         "user_id": str(user_id),
         "action": action,
-        "details": details or {}
+        "details": details or {},
+        "created_at": datetime.now(timezone.utc).isoformat()
     }
+
+async def _insert_logs(rows: List[Dict[str, Any]]) -> None:
+    supabase = await get_supabase()
+    # A failed insert raises; skip echoing the rows back
+    await supabase.table("logs").insert(rows, returning="minimal").execute()
+
+_sink = LogSink(_insert_logs, LOG_QUEUE_MAX, LOG_FLUSH_SIZE, LOG_FLUSH_INTERVAL, LOG_QUEUE_POLICY, LOG_WRITE_RETRIES, LOG_SPILL_PATH)
+
+async def start_log_sink() -> None:
+    if LOG_SINK_ENABLED:
+        await _sink.start()
+
+async def stop_log_sink() -> None:
+    """Write out queued entries on shutdown."""
+    await _sink.stop()
+
+def get_log_sink_stats() -> Dict[str, Any]:
+    return _sink.stats()
+
+async def record_action(user_id: UUID, action: str, details: Dict[str, Any] = None) -> None:
+    """
+    Queue a log entry for the background writer. Without a running writer (LOG_SINK_ENABLED=false,
+    scripts, tests) the entry is inserted inline and failures raise ValueError as before.
+    """
+    await record_actions([{"user_id": user_id, "action": action, "details": details}])
+
+async def record_actions(entries: List[Dict[str, Any]]) -> None:
+    """Record several log entries, inserted together in one request."""
+    if not entries:
+        return
+    rows = [_log_row(entry["user_id"], entry["action"], entry.get("details")) for entry in entries]
+    if _sink.accepting:
+        for row in rows:
+            await _sink.put(row)
+        return
     try:
-        response = await supabase.table("logs").insert(insert_payload).execute()
-        if not response.data:
-            raise ValueError("Failed to record log entry")
+        await _insert_logs(rows)
     except Exception as e:
-        raise ValueError(f"Failed to record log: {str(e)}")
+        raise ValueError(f"Failed to record logs: {str(e)}")
+
+def _logs_query(supabase, user_id: UUID, fields: Optional[str], created_after: Optional[datetime] = None,
+                created_before: Optional[datetime] = None, action: Optional[str] = None):
+    query = supabase.table("logs").select(projection(fields, LOG_FIELDS)).eq("user_id", str(user_id))
+    if created_after:
+        query = query.gte("created_at", created_after.isoformat())
+    if created_before:
+        query = query.lt("created_at", created_before.isoformat())
+    if action:
+        query = query.eq("action", action)
+    return query
 
-async def get_logs(user_id: UUID) -> List[Dict]:
+async def get_logs(user_id: UUID, limit: int = PAGE_SIZE_DEFAULT, cursor: Optional[str] = None,
+                   fields: Optional[str] = None, **filters) -> Dict[str, Any]:
+    """One page of a user's log entries, newest first. filters: created_after, created_before, action."""
     supabase = await get_supabase()
-    response = await supabase.table("logs").select("*").eq("user_id", str(user_id)).execute()
-    return response.data
\ No newline at end of file
+    return await fetch_page(_logs_query(supabase, user_id, fields, **filters), cursor, limit)
+
+def export_logs(user_id: UUID, cursor: Optional[str] = None, fields: Optional[str] = None, **filters) -> AsyncIterator[Dict[str, Any]]:
+    """Every matching log entry from the cursor on, fetched EXPORT_PAGE_SIZE rows at a time."""
+    projection(fields, LOG_FIELDS)
+    if cursor:
+        decode_cursor(cursor)
+    async def make_query():
+        return _logs_query(await get_supabase(), user_id, fields, **filters)
+    return iter_rows(make_query, cursor)
@@ -0,0 +1,233 @@
+# services/logsink.py
+import asyncio
+import glob
+import json
+import os
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+WriteBatchFn = Callable[[List[Dict[str, Any]]], Awaitable[None]]
+
+LOG_QUEUE_POLICIES = ("drop", "block", "spill")
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class LogSink:
+    """
+    Queue log entries in memory and write them in bulk, when flush_size entries
+    have built up or the oldest has waited flush_interval seconds, so callers
+    never wait on the database. A batch that still fails after the retries is
+    appended to a local JSONL spill file, which is replayed once writes succeed
+    again. When the queue is full, policy decides: drop the entry, block the
+    caller until there is room (backpressure), or spill it straight to the file.
+    """
+    def __init__(self, write_batch: WriteBatchFn, max_pending: int = 10000, flush_size: int = 200,
+                 flush_interval: float = 1.0, policy: str = "spill", retries: int = 2, spill_path: Optional[str] = None):
+        if policy not in LOG_QUEUE_POLICIES:
+            raise ValueError(f"Unsupported log queue policy: {policy}. Allowed policies: {list(LOG_QUEUE_POLICIES)}")
+        self._write_batch = write_batch
+        self.max_pending = max(1, max_pending)
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = max(0.0, flush_interval)
+        self.policy = policy
+        self.retries = max(0, retries)
+        self.spill_path = spill_path or None
+        self._queue: Optional[asyncio.Queue] = None
+        self._arrival: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.queued = 0
+        self.written = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.replayed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def accepting(self) -> bool:
+        return self.running and not self._closing
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(self.max_pending)
+        self._arrival = asyncio.Event()
+        self._closing = False
+        self._task = asyncio.create_task(self._run(), name="log-sink")
+
+    async def stop(self) -> None:
+        """Stop taking entries and write out everything still queued."""
+        if self._task is None:
+            return
+        self._closing = True
+        self._arrival.set()
+        await self._task
+        self._task = None
+
+    async def put(self, entry: Dict[str, Any]) -> None:
+        if not self.accepting:
+            raise RuntimeError("Log sink is not running")
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            if self.policy == "drop":
+                self.dropped += 1
+                return
+            if self.policy == "spill":
+                self._spill([entry])
+                return
+            await self._queue.put(entry)
+        self.queued += 1
+        self._arrival.set()
+
+    async def _collect(self) -> List[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        batch = []
+        deadline = None
+        while len(batch) < self.flush_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                if deadline is None:
+                    deadline = loop.time() + self.flush_interval
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            if self._closing:
+                break
+            # Nothing queued: wait for an entry. Something queued: wait until the oldest is due
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                break
+            self._arrival.clear()
+            try:
+                await asyncio.wait_for(self._arrival.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        await self._replay()
+        while True:
+            batch = await self._collect()
+            if batch:
+                if await self._write(batch):
+                    await self._replay()
+                else:
+                    self._spill(batch)
+            elif self._closing:
+                return
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> bool:
+        for attempt in range(self.retries + 1):
+            try:
+                await self._write_batch(batch)
+                self.batches += 1
+                self.written += len(batch)
+                return True
+            except Exception as e:
+                print(f"Log write of {len(batch)} entries failed (attempt {attempt + 1}): {str(e)}")
+                if attempt < self.retries:
+                    await asyncio.sleep(0.5 * (attempt + 1))
+        self.failed_batches += 1
+        return False
+
+    def _spill(self, entries: List[Dict[str, Any]]) -> None:
+        if not self.spill_path:
+            self.dropped += len(entries)
+            print(f"Dropped {len(entries)} log entries (no spill file)")
+            return
+        try:
+            # One write per batch, appended, so workers sharing the file don't interleave lines
+            with open(self.spill_path, "a") as f:
+                f.write("".join(json.dumps(entry, default=str) + "\n" for entry in entries))
+            self.spilled += len(entries)
+        except OSError as e:
+            self.dropped += len(entries)
+            print(f"Log spill to {self.spill_path} failed, dropped {len(entries)} entries: {str(e)}")
+
+    def _claims(self) -> List[str]:
+        """
+        Spill files to replay: the current spill file, claimed by renaming it so only one
+        worker replays it, plus claims this process or a worker that died mid-replay left behind.
+        """
+        pid = os.getpid()
+        try:
+            os.replace(self.spill_path, f"{self.spill_path}.{pid}.{uuid.uuid4().hex}.replay")
+        except FileNotFoundError:
+            pass
+        claims = []
+        for path in glob.glob(glob.escape(self.spill_path) + ".*.*.replay"):
+            owner = int(path[len(self.spill_path) + 1:].split(".")[0])
+            if owner != pid:
+                if _alive(owner):
+                    continue
+                # Take the orphan over; if another worker got there first the rename fails
+                claimed = f"{self.spill_path}.{pid}.{uuid.uuid4().hex}.replay"
+                try:
+                    os.replace(path, claimed)
+                except FileNotFoundError:
+                    continue
+                path = claimed
+            claims.append(path)
+        return claims
+
+    async def _replay(self) -> None:
+        """
+        Write spilled entries back in flush_size batches. A claimed file is removed only
+        once all its entries are written; on failure it is rewritten with the rest and
+        left for the next replay, so a crash or outage mid-replay loses nothing.
+        """
+        if not self.spill_path:
+            return
+        for path in self._claims():
+            try:
+                with open(path) as f:
+                    entries = [json.loads(line) for line in f if line.strip()]
+            except (OSError, ValueError) as e:
+                print(f"Could not read log spill file {path}: {str(e)}")
+                continue
+            for start in range(0, len(entries), self.flush_size):
+                chunk = entries[start:start + self.flush_size]
+                if not await self._write(chunk):
+                    self._rewrite(path, entries[start:])
+                    return
+                self.replayed += len(chunk)
+            os.unlink(path)
+            if entries:
+                print(f"Replayed {len(entries)} spilled log entries")
+
+    def _rewrite(self, path: str, entries: List[Dict[str, Any]]) -> None:
+        # Replace atomically, so a crash here leaves either the old or the new list
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write("".join(json.dumps(entry, default=str) + "\n" for entry in entries))
+        os.replace(tmp, path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "policy": self.policy,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "max_pending": self.max_pending,
+            "flush_size": self.flush_size,
+            "flush_interval_seconds": self.flush_interval,
+            "queued": self.queued,
+            "written": self.written,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+        }
@@ -0,0 +1,70 @@
+# services/pagination.py
+import base64
+import json
+from datetime import datetime
+from uuid import UUID
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+from config import EXPORT_PAGE_SIZE
+
+# Listings are ordered newest first by (created_at, id); id breaks ties between rows created together
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Opaque cursor for the row after which the next page starts."""
+    raw = json.dumps([str(row["created_at"]), str(row["id"])])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        datetime.fromisoformat(created_at)
+        UUID(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return created_at, row_id
+
+def projection(fields: Optional[str], allowed: Iterable[str], default: str = "*") -> str:
+    """
+    PostgREST select list for a comma-separated fields= parameter. id and created_at
+    are always included because the cursor is built from them.
+    """
+    if not fields:
+        return default
+    allowed = set(allowed)
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {unknown}. Allowed fields: {sorted(allowed)}")
+    return ",".join(dict.fromkeys(["id", "created_at", *requested]))
+
+def keyset(query, cursor: Optional[str], limit: int):
+    """Order newest first and start after the cursor; one extra row tells whether there is a next page."""
+    query = query.order("created_at", desc=True).order("id", desc=True)
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{row_id})')
+    return query.limit(limit + 1)
+
+def page(rows: List[Dict[str, Any]], limit: int) -> Dict[str, Any]:
+    items = rows[:limit]
+    return {"items": items, "next_cursor": encode_cursor(items[-1]) if len(rows) > limit else None}
+
+async def fetch_page(query, cursor: Optional[str], limit: int) -> Dict[str, Any]:
+    response = await keyset(query, cursor, limit).execute()
+    return page(response.data, limit)
+
+async def iter_rows(make_query: Callable[[], Any], cursor: Optional[str] = None, page_size: int = EXPORT_PAGE_SIZE) -> AsyncIterator[Dict[str, Any]]:
+    """Every row from the cursor on, one bounded query at a time. make_query builds a fresh filtered query."""
+    while True:
+        result = await fetch_page(await make_query(), cursor, page_size)
+        for row in result["items"]:
+            yield row
+        cursor = result["next_cursor"]
+        if cursor is None:
+            return
+
+async def ndjson_lines(rows: AsyncIterator[Dict[str, Any]], what: str) -> AsyncIterator[str]:
+    """One JSON object per line; a failure mid-export ends the stream with an error line."""
+    try:
+        async for row in rows:
+            yield json.dumps(row, default=str) + "\n"
+    except Exception as e:
+        yield json.dumps({"status": "error", "detail": f"Failed to export {what}: {str(e)}"}) + "\n"
@@ -0,0 +1,107 @@
+# services/preview.py
+from typing import Dict, Any, Optional, Tuple
+from database.supabase import get_supabase
+from utils.http import get_http_client
+from services.image import download_image
+from services.cache import BytesCache, make_cache_key
+from services.executor import run_io
+from model.preview import render_previews, PREVIEW_FORMATS
+from config import PREVIEW_SIZES, PREVIEW_FORMAT, PREVIEW_CACHE_MAX_ENTRIES, PREVIEW_CACHE_TTL, PREVIEW_CACHE_DIR, PREVIEW_MAX_AGE
+
+# Bump when the colormap or resizing changes, so stored previews and ETags turn over
+PREVIEW_RENDER_PARAMS = {"colormap": "ndvi-5stop", "value_range": [-1, 1], "resize": "area"}
+
+_preview_cache = BytesCache(PREVIEW_CACHE_MAX_ENTRIES, PREVIEW_CACHE_TTL, PREVIEW_CACHE_DIR)
+
+def preview_size(size: Optional[int]) -> int:
+    """Snap a requested size up to a configured one, so each image has a handful of renders."""
+    if size is None:
+        return PREVIEW_SIZES[len(PREVIEW_SIZES) // 2]
+    return next((s for s in PREVIEW_SIZES if s >= size), PREVIEW_SIZES[-1])
+
+def preview_key(image: Dict[str, Any], size: int, fmt: str) -> str:
+    digest = (image.get("metadata") or {}).get("content_sha256") or image["image_url"]
+    return make_cache_key(digest, image.get("file_type", "rgb"), size, fmt, PREVIEW_RENDER_PARAMS)
+
+def preview_path(image: Dict[str, Any], size: int, fmt: str) -> str:
+    # Keyed by content, so a rewritten original (e.g. after COG conversion) gets new previews
+    return f"{image['user_id']}/previews/{preview_key(image, size, fmt)[:32]}.{fmt}"
+
+async def _fetch_stored(path: str) -> Optional[bytes]:
+    supabase = await get_supabase()
+    url = await supabase.storage.from_("images").get_public_url(path)
+    client = await get_http_client()
+    response = await client.get(url)
+    return response.content if response.status_code == 200 else None
+
+async def _store(path: str, content: bytes, fmt: str) -> None:
+    supabase = await get_supabase()
+    await supabase.storage.from_("images").upload(
+        path, content,
+        file_options={"content-type": PREVIEW_FORMATS[fmt][0], "cache-control": str(PREVIEW_MAX_AGE), "upsert": "true"}
+    )
+
+async def _render(image: Dict[str, Any], sizes, fmt: str, content: Optional[bytes] = None) -> Dict[int, bytes]:
+    if content is None:
+        if image.get("file_type", "rgb") == "ndvi":
+            # GDAL reads only the header and the overview it needs from the stored file
+            content = image["image_url"]
+        else:
+            content, _ = await download_image(image["image_url"])
+    try:
+        return await run_io(render_previews, content, image.get("file_type", "rgb"), sizes, fmt)
+    except Exception as e:
+        raise ValueError(f"Cannot render a preview of this image: {str(e)}")
+
+async def render_and_store(image: Dict[str, Any], sizes=None, fmt: str = PREVIEW_FORMAT, content: Optional[bytes] = None) -> Dict[int, bytes]:
+    """Render previews at the given sizes, upload them next to the original and warm the cache."""
+    sizes = sorted(set(sizes or PREVIEW_SIZES))
+    rendered = await _render(image, sizes, fmt, content)
+    for size, encoded in rendered.items():
+        try:
+            await _store(preview_path(image, size, fmt), encoded, fmt)
+        except Exception as e:
+            print(f"Could not store {size}px preview of image {image['id']}: {str(e)}")
+        _preview_cache.set(preview_key(image, size, fmt), encoded)
+    return rendered
+
+async def render_upload_previews(image: Dict[str, Any], content: bytes, content_type: str) -> None:
+    """Background task after an upload: render every preview size from the bytes already in memory."""
+    try:
+        await render_and_store(image, content=content)
+        print(f"Rendered previews of image {image['id']}")
+    except Exception as e:
+        print(f"Preview rendering failed for image {image['id']}: {str(e)}")
+
+async def get_preview(image: Dict[str, Any], size: Optional[int] = None, fmt: str = PREVIEW_FORMAT,
+                      if_none_match: Optional[str] = None) -> Tuple[str, Optional[bytes]]:
+    """
+    Return (etag, bytes) of an image preview: from the cache, else the copy stored
+    next to the original, else rendered now and stored for next time. bytes is None
+    when the client's If-None-Match already matches.
+    """
+    if fmt not in PREVIEW_FORMATS:
+        raise ValueError(f"Unsupported preview format: {fmt}. Allowed formats: {list(PREVIEW_FORMATS)}")
+    size = preview_size(size)
+    key = preview_key(image, size, fmt)
+    etag = f'"{key[:32]}"'
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return etag, None
+
+    content = _preview_cache.get(key)
+    if content is None:
+        content = await _fetch_stored(preview_path(image, size, fmt))
+        if content is not None:
+            _preview_cache.set(key, content)
+        else:
+            content = (await render_and_store(image, [size], fmt))[size]
+    return etag, content
+
+async def delete_previews(image: Dict[str, Any]) -> None:
+    """Remove every stored preview of an image along with it."""
+    paths = [preview_path(image, size, fmt) for size in PREVIEW_SIZES for fmt in PREVIEW_FORMATS]
+    supabase = await get_supabase()
+    await supabase.storage.from_("images").remove(paths)
+
+def get_preview_stats() -> Dict:
+    return _preview_cache.stats()
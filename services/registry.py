@@ -0,0 +1,222 @@
+# services/registry.py
+import asyncio
+import hashlib
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from model.backends import predict_batch
+from services.batching import BatchScheduler
+from services.executor import run_inference, run_shadow, predict_in_worker
+
+class ModelEntry:
+    """
+    One loaded model version. Each version gets its own micro-batching scheduler,
+    started on first use, so batches never mix outputs from different models.
+    """
+    def __init__(self, version: str, model, class_names: List[str], backend: str, path: str, in_process: bool = False):
+        self.version = version
+        self.model = model
+        self.class_names = list(class_names)
+        self.backend = backend
+        self.path = path
+        # In process mode the model lives in the inference worker processes, not here
+        self.in_process = in_process
+        self.loaded_at = time.time()
+        self.scheduler: Optional[BatchScheduler] = None
+        self.requests = 0
+        self.inflight = 0
+
+    async def predict_batch(self, batch: np.ndarray) -> List[Tuple[int, float]]:
+        """Run a stacked batch on the inference executor."""
+        self.inflight += 1
+        try:
+            if self.in_process:
+                return await run_inference(predict_in_worker, batch)
+            return await run_inference(predict_batch, self.model, batch)
+        finally:
+            self.inflight -= 1
+            self.requests += len(batch)
+
+    async def predict(self, processed_data: np.ndarray, batching: Optional[Dict] = None) -> Tuple[int, float]:
+        """
+        Predict one sample, through the version's batching scheduler when batching
+        is configured, otherwise as a batch of one.
+        """
+        if batching is None:
+            results = await self.predict_batch(np.expand_dims(processed_data, axis=0))
+            return results[0]
+        if self.scheduler is None:
+            self.scheduler = BatchScheduler(self.predict_batch, **batching)
+        await self.scheduler.start()
+        # Counts time queued for a batch too, so remove() doesn't stop the scheduler under it
+        self.inflight += 1
+        try:
+            return await self.scheduler.submit(processed_data)
+        finally:
+            self.inflight -= 1
+
+    async def stop(self):
+        if self.scheduler is not None:
+            await self.scheduler.stop()
+            self.scheduler = None
+
+    def describe(self) -> Dict:
+        return {
+            "version": self.version,
+            "backend": self.backend,
+            "path": self.path,
+            "class_names": self.class_names,
+            "loaded_at": self.loaded_at,
+            "requests": self.requests,
+            "inflight": self.inflight,
+        }
+
+def _bucket(key: str) -> float:
+    """Stable position of a routing key in [0, 1), so an image always hits the same version."""
+    return int(hashlib.sha256(key.encode()).hexdigest()[:8], 16) / 2**32
+
+class ModelRegistry:
+    """
+    Loaded model versions plus the routing that picks one per request. Routing
+    is replaced as a whole dict, so a request sees either the old or the new
+    assignment, never a mix; versions stay loaded until explicitly removed, so
+    requests already holding an entry finish on it during a swap.
+    """
+    def __init__(self, shadow_max_pending: int = 4):
+        self._entries: Dict[str, ModelEntry] = {}
+        self._routing = {"primary": None, "canary": None, "canary_fraction": 0.0, "shadow": None}
+        self._batching: Optional[Dict] = None
+        self._shadow_max_pending = shadow_max_pending
+        self._shadow_tasks = set()
+        self._shadow_stats = Counter()
+
+    def __contains__(self, version: str) -> bool:
+        return version in self._entries
+
+    @property
+    def primary(self) -> Optional[ModelEntry]:
+        return self._entries.get(self._routing["primary"])
+
+    def get(self, version: str) -> ModelEntry:
+        entry = self._entries.get(version)
+        if entry is None:
+            raise KeyError(f"Model version {version} is not loaded")
+        return entry
+
+    def add(self, entry: ModelEntry) -> ModelEntry:
+        """Register a loaded version. The first version becomes the primary."""
+        if entry.version in self._entries:
+            raise ValueError(f"Model version {entry.version} is already loaded")
+        self._entries = {**self._entries, entry.version: entry}
+        if self._routing["primary"] is None:
+            self._routing = {**self._routing, "primary": entry.version}
+        return entry
+
+    def set_routing(self, primary: Optional[str] = None, canary: Optional[str] = None, canary_fraction: float = 0.0, shadow: Optional[str] = None) -> Dict:
+        """
+        Atomically switch routing. primary defaults to the current one; canary takes
+        canary_fraction of traffic; shadow re-runs primary traffic in the background.
+        """
+        primary = primary or self._routing["primary"]
+        for version in (primary, canary, shadow):
+            if version is not None:
+                self.get(version)
+        if not 0.0 <= canary_fraction <= 1.0:
+            raise ValueError("canary_fraction must be between 0 and 1")
+        if canary is None:
+            canary_fraction = 0.0
+        if shadow != self._routing["shadow"]:
+            self._shadow_stats.clear()
+        self._routing = {"primary": primary, "canary": canary, "canary_fraction": canary_fraction, "shadow": shadow}
+        return dict(self._routing)
+
+    def activate(self, version: str) -> Dict:
+        """Hot-swap the primary; canary and shadow routing pointing at it are cleared."""
+        routing = self._routing
+        canary = None if routing["canary"] == version else routing["canary"]
+        shadow = None if routing["shadow"] == version else routing["shadow"]
+        return self.set_routing(version, canary, routing["canary_fraction"], shadow)
+
+    async def remove(self, version: str, drain_timeout: float = 30.0) -> None:
+        """Unload a version that no route points at, after its in-flight requests finish."""
+        entry = self.get(version)
+        if version in (self._routing["primary"], self._routing["canary"], self._routing["shadow"]):
+            raise ValueError(f"Model version {version} is still routed; change routing first")
+        self._entries = {name: other for name, other in self._entries.items() if name != version}
+        deadline = time.monotonic() + drain_timeout
+        while entry.inflight and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        await entry.stop()
+
+    def route(self, key: str) -> ModelEntry:
+        """Pick the version that serves a request, sticky per key."""
+        routing = self._routing
+        if routing["canary"] is not None and _bucket(key) < routing["canary_fraction"]:
+            return self._entries[routing["canary"]]
+        primary = self._entries.get(routing["primary"])
+        if primary is None:
+            raise RuntimeError("No model version loaded")
+        return primary
+
+    def enable_batching(self, max_batch_size: int, max_wait_ms: float) -> None:
+        self._batching = {"max_batch_size": max_batch_size, "max_wait_ms": max_wait_ms}
+
+    async def disable_batching(self) -> None:
+        self._batching = None
+        for entry in self._entries.values():
+            await entry.stop()
+
+    async def predict(self, entry: ModelEntry, processed_data: np.ndarray) -> Tuple[int, float]:
+        result = await entry.predict(processed_data, self._batching)
+        self.shadow(entry, np.expand_dims(processed_data, axis=0), [result])
+        return result
+
+    async def predict_batch(self, entry: ModelEntry, batch: np.ndarray) -> List[Tuple[int, float]]:
+        results = await entry.predict_batch(batch)
+        self.shadow(entry, batch, results)
+        return results
+
+    def shadow(self, served_by: ModelEntry, batch: np.ndarray, results: List[Tuple[int, float]]) -> None:
+        """
+        Fire-and-forget the same batch through the shadow version on the shadow
+        executor and count agreement with what was served. Never awaited by the request;
+        dropped when too many shadow runs are already pending.
+        """
+        shadow = self._entries.get(self._routing["shadow"])
+        if shadow is None or shadow is served_by or shadow.in_process:
+            return
+        if len(self._shadow_tasks) >= self._shadow_max_pending:
+            self._shadow_stats["dropped"] += len(batch)
+            return
+        task = asyncio.create_task(self._run_shadow(shadow, served_by, batch, results))
+        self._shadow_tasks.add(task)
+        task.add_done_callback(self._shadow_tasks.discard)
+
+    async def _run_shadow(self, shadow: ModelEntry, served_by: ModelEntry, batch: np.ndarray, results: List[Tuple[int, float]]) -> None:
+        try:
+            shadow_results = await run_shadow(predict_batch, shadow.model, batch)
+        except Exception as e:
+            self._shadow_stats["errors"] += len(batch)
+            print(f"Shadow run on {shadow.version} failed: {str(e)}")
+            return
+        shadow.requests += len(batch)
+        for (served_idx, _), (shadow_idx, _) in zip(results, shadow_results):
+            # Compare labels, since versions may order classes differently
+            agree = served_by.class_names[served_idx] == shadow.class_names[shadow_idx]
+            self._shadow_stats["agreed" if agree else "disagreed"] += 1
+
+    def stats(self) -> Dict:
+        compared = self._shadow_stats["agreed"] + self._shadow_stats["disagreed"]
+        return {
+            "routing": dict(self._routing),
+            "versions": [entry.describe() for entry in self._entries.values()],
+            "shadow": {
+                "pending": len(self._shadow_tasks),
+                "agreed": self._shadow_stats["agreed"],
+                "disagreed": self._shadow_stats["disagreed"],
+                "dropped": self._shadow_stats["dropped"],
+                "errors": self._shadow_stats["errors"],
+                "agreement_rate": (self._shadow_stats["agreed"] / compared) if compared else None,
+            },
+        }
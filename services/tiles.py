@@ -0,0 +1,78 @@
+# services/tiles.py
+from uuid import UUID
+from typing import Dict, Optional, Tuple
+from services.image import get_image
+from services.cache import ResultCache, BytesCache, make_cache_key
+from services.executor import run_io
+from model.maptiles import TileSourcePool, MAP_TILE_SIZE
+from config import MAP_TILE_CACHE_MAX_ENTRIES, MAP_TILE_CACHE_TTL, MAP_TILE_CACHE_DIR, MAP_TILE_SOURCES_MAX_OPEN
+
+# Bump when the colormap or resampling changes, so cached tiles and ETags turn over
+TILE_RENDER_PARAMS = {"colormap": "ndvi-5stop", "value_range": [-1, 1], "resampling": "average", "size": MAP_TILE_SIZE}
+
+_tile_cache = BytesCache(MAP_TILE_CACHE_MAX_ENTRIES, MAP_TILE_CACHE_TTL, MAP_TILE_CACHE_DIR)
+# A map view fetches a dozen tiles at once; look the image row up once, not per tile
+_image_rows = ResultCache(1024, 60)
+_sources = TileSourcePool(MAP_TILE_SOURCES_MAX_OPEN)
+
+async def _tile_image(image_id: UUID, user_id: UUID) -> Dict:
+    image = _image_rows.get(str(image_id))
+    if image is None:
+        image = await get_image(image_id)
+        _image_rows.set(str(image_id), image)
+    if str(image["user_id"]) != str(user_id):
+        raise ValueError("Unauthorized: Image does not belong to this user")
+    if image.get("file_type", "rgb") != "ndvi":
+        raise ValueError("Map tiles are only available for NDVI GeoTIFFs")
+    return image
+
+def _source_key(image: Dict) -> str:
+    # Content digest, so a rewritten file (e.g. after COG conversion) gets fresh tiles
+    return (image.get("metadata") or {}).get("content_sha256") or image["image_url"]
+
+def tile_cache_key(image: Dict, z: int, x: int, y: int) -> str:
+    return make_cache_key(_source_key(image), z, x, y, TILE_RENDER_PARAMS)
+
+def _render(image: Dict, z: int, x: int, y: int) -> bytes:
+    with _sources.lease(_source_key(image), image["image_url"]) as source:
+        return source.render(z, x, y)
+
+def _tilejson(image: Dict, tile_url: str) -> Dict:
+    with _sources.lease(_source_key(image), image["image_url"]) as source:
+        return source.tilejson(tile_url)
+
+async def get_tile(image_id: UUID, user_id: UUID, z: int, x: int, y: int, if_none_match: Optional[str] = None) -> Tuple[str, Optional[bytes]]:
+    """
+    Return (etag, png) for tile z/x/y of an NDVI image. png is None when the client's
+    If-None-Match already matches, so nothing is read or rendered.
+    """
+    if not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise ValueError(f"Tile {z}/{x}/{y} does not exist")
+    image = await _tile_image(image_id, user_id)
+    key = tile_cache_key(image, z, x, y)
+    etag = f'"{key[:32]}"'
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return etag, None
+
+    png = _tile_cache.get(key)
+    if png is None:
+        try:
+            png = await run_io(_render, image, z, x, y)
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError(f"Failed to render tile: {str(e)}")
+        _tile_cache.set(key, png)
+    return etag, png
+
+async def get_tilejson(image_id: UUID, user_id: UUID, tile_url: str) -> Dict:
+    image = await _tile_image(image_id, user_id)
+    try:
+        return await run_io(_tilejson, image, tile_url)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Failed to open image: {str(e)}")
+
+def get_tile_stats() -> Dict:
+    return {**_tile_cache.stats(), "open_sources": len(_sources)}
@@ -0,0 +1,177 @@
+# services/upload.py
+import base64
+import hashlib
+from typing import AsyncIterator, Dict, Optional
+import httpx
+from utils.http import get_http_client
+from config import SUPABASE_URL, SUPABASE_KEY, UPLOAD_CHUNK_SIZE, UPLOAD_RETRIES, MAX_UPLOAD_BYTES
+
+TUS_VERSION = "1.0.0"
+
+# Leading bytes of the formats uploads may contain; .npy arrays are stored as octet-stream
+MAGIC_NUMBERS = (
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+    (b"II+\x00", "image/tiff"),  # BigTIFF
+    (b"MM\x00+", "image/tiff"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x93NUMPY", "application/octet-stream"),
+)
+
+class UploadTooLargeError(ValueError):
+    pass
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    """Content type from the file's magic number, or None if it isn't a supported format."""
+    for magic, content_type in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return content_type
+    return None
+
+async def _body(data: bytes) -> AsyncIterator[bytes]:
+    # httpx keeps the request on a response reference cycle until the next GC pass;
+    # an exhausted generator has already dropped the chunk, a bytes body would pin it
+    yield data
+
+def _encode_metadata(values: Dict[str, str]) -> str:
+    return ",".join(f"{key} {base64.b64encode(value.encode()).decode()}" for key, value in values.items())
+
+class ResumableUpload:
+    """
+    Client side of a TUS upload to Supabase Storage's resumable endpoint. Each
+    chunk is a PATCH at the current offset; when one fails, the server's offset
+    is re-read with HEAD and only the part it hasn't stored is sent again.
+    """
+    def __init__(self, client: httpx.AsyncClient, bucket: str, object_name: str, content_type: str, length: Optional[int] = None, upsert: bool = False):
+        self.client = client
+        self.bucket = bucket
+        self.object_name = object_name
+        self.content_type = content_type
+        self.length = length
+        self.location = None
+        self.offset = 0
+        self.headers = {
+            "Authorization": f"Bearer {SUPABASE_KEY}",
+            "apikey": SUPABASE_KEY,
+            "Tus-Resumable": TUS_VERSION,
+        }
+        if upsert:
+            self.headers["x-upsert"] = "true"
+
+    async def create(self) -> None:
+        headers = {
+            **self.headers,
+            "Upload-Metadata": _encode_metadata({
+                "bucketName": self.bucket,
+                "objectName": self.object_name,
+                "contentType": self.content_type,
+            }),
+        }
+        if self.length is None:
+            headers["Upload-Defer-Length"] = "1"
+        else:
+            headers["Upload-Length"] = str(self.length)
+        response = await self.client.post(f"{SUPABASE_URL}/storage/v1/upload/resumable", headers=headers)
+        if response.status_code != 201:
+            raise ValueError(f"Storage upload failed: {response.status_code} {response.text}")
+        self.location = str(response.url.join(response.headers["Location"]))
+
+    async def _server_offset(self) -> int:
+        response = await self.client.head(self.location, headers=self.headers)
+        response.raise_for_status()
+        return int(response.headers["Upload-Offset"])
+
+    async def write(self, chunk: bytes, final: bool = False) -> None:
+        start = self.offset
+        end = start + len(chunk)
+        for attempt in range(UPLOAD_RETRIES + 1):
+            data = chunk[self.offset - start:]
+            headers = {
+                **self.headers,
+                "Upload-Offset": str(self.offset),
+                "Content-Type": "application/offset+octet-stream",
+                "Content-Length": str(len(data)),
+            }
+            if final and self.length is None:
+                headers["Upload-Length"] = str(end)
+            try:
+                response = await self.client.patch(self.location, content=_body(data), headers=headers)
+                if response.status_code == 204:
+                    self.offset = int(response.headers["Upload-Offset"])
+                    if self.offset == end:
+                        return
+                elif response.status_code < 500 and response.status_code != 409:
+                    raise ValueError(f"Storage upload failed: {response.status_code} {response.text}")
+            except httpx.TransportError as e:
+                print(f"Upload chunk at offset {self.offset} failed (attempt {attempt + 1}): {str(e)}")
+            if attempt == UPLOAD_RETRIES:
+                break
+            # Resume from whatever the server actually stored
+            try:
+                self.offset = await self._server_offset()
+            except httpx.HTTPError as e:
+                print(f"Reading upload offset failed: {str(e)}")
+            if self.offset == end:
+                return
+            if not start <= self.offset < end:
+                raise ValueError(f"Storage upload offset {self.offset} is outside the chunk being sent ({start}-{end})")
+        raise ValueError(f"Storage upload failed at offset {self.offset} after {UPLOAD_RETRIES + 1} attempts")
+
+    async def abort(self) -> None:
+        if self.location is None:
+            return
+        try:
+            await self.client.delete(self.location, headers=self.headers)
+        except httpx.HTTPError as e:
+            print(f"Aborting upload {self.location} failed: {str(e)}")
+
+async def stream_to_storage(chunks: AsyncIterator[bytes], bucket: str, object_name: str, content_type: str,
+                            length: Optional[int] = None, max_bytes: int = MAX_UPLOAD_BYTES, upsert: bool = False) -> Dict:
+    """
+    Pipe an incoming byte stream to Storage in UPLOAD_CHUNK_SIZE pieces, hashing and
+    sniffing it on the way, so an upload holds at most about one chunk in memory
+    whatever the file size. The declared content type must match the file's magic
+    number; nothing is sent to Storage until it does. upsert replaces an existing object.
+    """
+    if length is not None and length > max_bytes:
+        raise UploadTooLargeError(f"Upload is too large ({length} bytes, limit {max_bytes})")
+    client = await get_http_client()
+    upload = ResumableUpload(client, bucket, object_name, content_type, length, upsert)
+    digest = hashlib.sha256()
+    buffer = bytearray()
+    received = 0
+
+    async def flush(data: bytes, final: bool) -> None:
+        if upload.location is None:
+            sniffed = sniff_content_type(data[:16])
+            if sniffed is None:
+                raise ValueError("Unrecognized file format")
+            if sniffed != content_type:
+                raise ValueError(f"File content is {sniffed} but was uploaded as {content_type}")
+            await upload.create()
+        await upload.write(data, final=final)
+
+    try:
+        async for chunk in chunks:
+            received += len(chunk)
+            if received > max_bytes:
+                raise UploadTooLargeError(f"Upload exceeds the limit of {max_bytes} bytes")
+            digest.update(chunk)
+            buffer += chunk
+            # Strictly greater, so the last PATCH always carries data and can finalize a deferred length
+            while len(buffer) > UPLOAD_CHUNK_SIZE:
+                with memoryview(buffer) as view:
+                    data = bytes(view[:UPLOAD_CHUNK_SIZE])
+                del buffer[:UPLOAD_CHUNK_SIZE]
+                await flush(data, final=False)
+        if not received:
+            raise ValueError("Upload is empty")
+        if length is not None and received != length:
+            raise ValueError(f"Received {received} bytes but Content-Length was {length}")
+        await flush(bytes(buffer), final=True)
+    except Exception:
+        await upload.abort()
+        raise
+
+    return {"content_sha256": digest.hexdigest(), "size_bytes": received, "content_type": content_type}
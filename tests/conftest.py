@@ -0,0 +1,16 @@
+# tests/conftest.py
+import asyncio
+import os
+import pytest
+from cryptography.fernet import Fernet
+
+# config.py reads these at import time; nothing here talks to a real Supabase project
+os.environ.setdefault("ENCRYPTION_KEY", Fernet.generate_key().decode())
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("SUPABASE_KEY", "test.test.test")
+os.environ.setdefault("MODEL_LOAD_MODE", "lazy")
+
+@pytest.fixture
+def run():
+    """Run a coroutine to completion on a fresh event loop."""
+    return asyncio.run
@@ -0,0 +1,146 @@
+# tests/test_auth.py
+import time
+import uuid
+import jwt
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+import services.auth as auth
+import utils.dependencies as dependencies
+from services.cache import ResultCache
+
+SECRET = "test-secret-with-at-least-32-bytes!!"
+USER_ID = str(uuid.uuid4())
+USER_ROW = {"id": USER_ID, "auth_user_id": USER_ID, "email": "grower@example.com", "created_at": "2026-03-01T12:00:00+00:00", "is_admin": False}
+
+class FakeUsersTable:
+    """The users table behind get_supabase(); counts the queries that reach it."""
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+        self._auth_user_id = None
+
+    def table(self, name):
+        assert name == "users"
+        return self
+
+    def select(self, fields):
+        return self
+
+    def eq(self, column, value):
+        self._auth_user_id = value
+        return self
+
+    def limit(self, count):
+        return self
+
+    async def execute(self):
+        self.queries += 1
+        rows = [row for row in self.rows if row["auth_user_id"] == self._auth_user_id]
+        return type("Response", (), {"data": rows})
+
+@pytest.fixture
+def users(monkeypatch):
+    table = FakeUsersTable([dict(USER_ROW)])
+    async def get_supabase():
+        return table
+    monkeypatch.setattr(auth, "get_supabase", get_supabase)
+    monkeypatch.setattr(auth, "_users", ResultCache(100, 30))
+    return table
+
+@pytest.fixture
+def secret(monkeypatch):
+    monkeypatch.setattr(auth, "JWT_SECRET", SECRET)
+    monkeypatch.setattr(dependencies, "JWT_SECRET", SECRET)
+
+def token(**overrides):
+    claims = {"sub": USER_ID, "aud": "authenticated", "exp": int(time.time()) + 3600, **overrides}
+    claims = {key: value for key, value in claims.items() if value is not None}
+    return jwt.encode(claims, SECRET, algorithm="HS256")
+
+def bearer(value):
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=value)
+
+def test_valid_token_names_the_user(secret):
+    assert auth.verify_access_token(token())["sub"] == USER_ID
+
+@pytest.mark.parametrize("overrides, message", [
+    ({"exp": int(time.time()) - 10}, "Token has expired"),
+    ({"aud": "anon"}, "Invalid token"),
+    ({"sub": None}, "Invalid token"),
+    ({"exp": None}, "Invalid token"),
+])
+def test_bad_tokens_are_rejected(secret, overrides, message):
+    with pytest.raises(ValueError, match=message):
+        auth.verify_access_token(token(**overrides))
+
+def test_token_signed_with_another_key_is_rejected(secret):
+    forged = jwt.encode({"sub": USER_ID, "aud": "authenticated", "exp": int(time.time()) + 60}, "another-secret-of-at-least-32-bytes", algorithm="HS256")
+    with pytest.raises(ValueError, match="Invalid token"):
+        auth.verify_access_token(forged)
+
+def test_profile_is_cached_until_invalidated(run, users):
+    async def scenario():
+        first = await auth.get_user_profile(USER_ID)
+        second = await auth.get_user_profile(USER_ID)
+        queries_while_cached = users.queries
+        auth.invalidate_user(USER_ID)
+        await auth.get_user_profile(USER_ID)
+        return first, second, queries_while_cached
+
+    first, second, queries_while_cached = run(scenario())
+    assert first == second == USER_ROW
+    assert queries_while_cached == 1
+    assert users.queries == 2
+
+def test_missing_user_is_not_cached(run, users):
+    missing = str(uuid.uuid4())
+
+    async def scenario():
+        before = await auth.get_user_profile(missing)
+        # Signs up right after the failed lookup
+        users.rows.append({**USER_ROW, "id": missing, "auth_user_id": missing})
+        return before, await auth.get_user_profile(missing)
+
+    before, after = run(scenario())
+    assert before is None
+    assert after["id"] == missing
+
+def test_profile_expires_after_ttl(run, users):
+    auth._users.ttl = 0.05
+
+    async def scenario():
+        await auth.get_user_profile(USER_ID)
+        time.sleep(0.1)
+        await auth.get_user_profile(USER_ID)
+
+    run(scenario())
+    assert users.queries == 2
+
+def test_current_user_from_bearer_token(run, users, secret):
+    user = run(dependencies.get_current_user(None, bearer(token())))
+    assert str(user.id) == USER_ID
+
+def test_current_user_rejects_user_id_of_someone_else(run, users, secret):
+    with pytest.raises(HTTPException) as error:
+        run(dependencies.get_current_user(str(uuid.uuid4()), bearer(token())))
+    assert error.value.status_code == 401
+
+def test_current_user_rejects_expired_token(run, users, secret):
+    with pytest.raises(HTTPException) as error:
+        run(dependencies.get_current_user(USER_ID, bearer(token(exp=int(time.time()) - 10))))
+    assert error.value.status_code == 401
+    assert error.value.detail == "Token has expired"
+
+def test_without_secret_user_id_names_the_user(run, users, monkeypatch):
+    monkeypatch.setattr(dependencies, "JWT_SECRET", "")
+    user = run(dependencies.get_current_user(USER_ID, bearer("not-a-jwt")))
+    assert str(user.id) == USER_ID
+    with pytest.raises(HTTPException) as error:
+        run(dependencies.get_current_user(None, None))
+    assert error.value.status_code == 401
+
+@pytest.mark.parametrize("value, expected", [(None, False), ("", False), (SECRET, True)])
+def test_stats_report_whether_tokens_are_verified(monkeypatch, value, expected):
+    monkeypatch.setattr(auth, "JWT_SECRET", value)
+    assert auth.get_auth_cache_stats()["jwt_verification"] is expected
@@ -0,0 +1,115 @@
+# tests/test_batching.py
+import asyncio
+import numpy as np
+import pytest
+from services.batching import BatchScheduler
+
+def sample(value):
+    return np.full((2, 2), value, dtype=np.float32)
+
+def test_concurrent_submits_share_one_batch(run):
+    batches = []
+    async def predict(batch):
+        batches.append(len(batch))
+        return [(int(item[0, 0]), 1.0) for item in batch]
+
+    async def scenario():
+        scheduler = BatchScheduler(predict, max_batch_size=8, max_wait_ms=50)
+        await scheduler.start()
+        results = await asyncio.gather(*(scheduler.submit(sample(i)) for i in range(5)))
+        stats = scheduler.stats()
+        await scheduler.stop()
+        return results, stats
+
+    results, stats = run(scenario())
+    # Each caller gets its own row back, in order
+    assert results == [(i, 1.0) for i in range(5)]
+    assert batches == [5]
+    assert stats["batches"] == 1 and stats["items"] == 5
+
+def test_batch_is_capped_at_max_batch_size(run):
+    batches = []
+    async def predict(batch):
+        batches.append(len(batch))
+        return [(0, 1.0)] * len(batch)
+
+    async def scenario():
+        scheduler = BatchScheduler(predict, max_batch_size=3, max_wait_ms=50)
+        await scheduler.start()
+        await asyncio.gather(*(scheduler.submit(sample(i)) for i in range(7)))
+        await scheduler.stop()
+
+    run(scenario())
+    assert batches == [3, 3, 1]
+
+def test_lone_request_waits_at_most_max_wait(run):
+    async def predict(batch):
+        return [(0, 1.0)] * len(batch)
+
+    async def scenario():
+        scheduler = BatchScheduler(predict, max_batch_size=16, max_wait_ms=20)
+        await scheduler.start()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await scheduler.submit(sample(0))
+        elapsed = loop.time() - start
+        await scheduler.stop()
+        return elapsed
+
+    assert run(scenario()) < 0.5
+
+def test_failed_batch_fails_every_caller(run):
+    async def predict(batch):
+        raise RuntimeError("out of memory")
+
+    async def scenario():
+        scheduler = BatchScheduler(predict, max_batch_size=4, max_wait_ms=20)
+        await scheduler.start()
+        results = await asyncio.gather(*(scheduler.submit(sample(i)) for i in range(3)), return_exceptions=True)
+        stats = scheduler.stats()
+        await scheduler.stop()
+        return results, stats
+
+    results, stats = run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert stats["failed_batches"] == 1
+
+def test_stop_fails_the_batch_being_predicted(run):
+    async def predict(batch):
+        await asyncio.sleep(10)
+
+    async def scenario():
+        scheduler = BatchScheduler(predict, max_batch_size=2, max_wait_ms=0)
+        await scheduler.start()
+        submits = [asyncio.create_task(scheduler.submit(sample(i))) for i in range(3)]
+        # Two items are in the forward pass, the third is still queued
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+        return await asyncio.wait_for(asyncio.gather(*submits, return_exceptions=True), 1.0)
+
+    results = run(scenario())
+    assert len(results) == 3
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+def test_stop_fails_a_batch_still_being_collected(run):
+    async def predict(batch):
+        return [(0, 1.0)] * len(batch)
+
+    async def scenario():
+        scheduler = BatchScheduler(predict, max_batch_size=8, max_wait_ms=5000)
+        await scheduler.start()
+        submit = asyncio.create_task(scheduler.submit(sample(0)))
+        # Dequeued and waiting for the batch to fill
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+        return await asyncio.wait_for(asyncio.gather(submit, return_exceptions=True), 1.0)
+
+    [result] = run(scenario())
+    assert isinstance(result, RuntimeError)
+
+def test_submit_requires_a_running_scheduler(run):
+    async def predict(batch):
+        return []
+
+    with pytest.raises(RuntimeError):
+        run(BatchScheduler(predict).submit(sample(0)))
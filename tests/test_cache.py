@@ -0,0 +1,89 @@
+# tests/test_cache.py
+import os
+import pytest
+import services.cache
+from services.cache import ResultCache, make_cache_key
+
+class Clock:
+    """Stands in for the time module so entries can be aged without sleeping."""
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(services.cache, "time", clock)
+    return clock
+
+def test_cache_key_covers_every_part():
+    params = {"input_size": 299, "ndvi_read": {"oversample": 2}}
+    key = make_cache_key("digest", "ndvi", "v1", params)
+    assert key == make_cache_key("digest", "ndvi", "v1", {"ndvi_read": {"oversample": 2}, "input_size": 299})
+    assert key != make_cache_key("digest", "ndvi", "v2", params)
+    assert key != make_cache_key("digest", "rgb", "v1", params)
+    assert key != make_cache_key("digest", "ndvi", "v1", {**params, "ndvi_read": {"oversample": 4}})
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", {"label": "a"})
+    cache.set("b", {"label": "b"})
+    # Reading "a" makes "b" the oldest
+    assert cache.get("a") == {"label": "a"}
+    cache.set("c", {"label": "c"})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"label": "a"} and cache.get("c") == {"label": "c"}
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["evictions"] == 1
+    assert stats["hits"] == 3 and stats["misses"] == 1
+
+def test_entries_expire_after_ttl(clock):
+    cache = ResultCache(max_entries=10, ttl_seconds=60)
+    cache.set("a", {"label": "a"})
+    clock.now += 59
+    assert cache.get("a") == {"label": "a"}
+    clock.now += 2
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    first = ResultCache(max_entries=10, ttl_seconds=60, disk_dir=str(tmp_path))
+    key = make_cache_key("digest", "ndvi", "v1")
+    first.set(key, {"label": "Healthy", "confidence": 0.9})
+    second = ResultCache(max_entries=10, ttl_seconds=60, disk_dir=str(tmp_path))
+    assert second.get(key) == {"label": "Healthy", "confidence": 0.9}
+    assert second.stats()["disk_hits"] == 1
+    # Promoted to memory, so the next read doesn't touch the disk
+    assert second.get(key) is not None
+    assert second.stats()["disk_hits"] == 1
+
+def test_expired_disk_entry_is_deleted(tmp_path, clock):
+    cache = ResultCache(max_entries=10, ttl_seconds=60, disk_dir=str(tmp_path))
+    cache.set("ab12", {"label": "a"})
+    path = cache._disk_path("ab12")
+    assert os.path.exists(path)
+    clock.now += 61
+    cache.clear()
+    assert cache.get("ab12") is None
+    assert not os.path.exists(path)
+
+def test_invalidate_drops_both_tiers(tmp_path):
+    cache = ResultCache(max_entries=10, ttl_seconds=60, disk_dir=str(tmp_path))
+    cache.set("ab12", {"label": "a"})
+    cache.invalidate("ab12")
+    assert cache.get("ab12") is None
+    assert not os.path.exists(cache._disk_path("ab12"))
+
+def test_unreadable_disk_entry_is_a_miss(tmp_path):
+    cache = ResultCache(max_entries=10, ttl_seconds=60, disk_dir=str(tmp_path))
+    path = cache._disk_path("ab12")
+    os.makedirs(os.path.dirname(path))
+    with open(path, "w") as f:
+        f.write("{truncated")
+    assert cache.get("ab12") is None
+    assert cache.stats()["misses"] == 1
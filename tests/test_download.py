@@ -0,0 +1,47 @@
+# tests/test_download.py
+import gzip
+import httpx
+import pytest
+import services.image
+from services.image import download_image
+from utils.errors import InvalidInputError
+
+BODY = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 64
+
+def serve(monkeypatch, handler):
+    async def get_http_client():
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(services.image, "get_http_client", get_http_client)
+
+def test_plain_download(run, monkeypatch):
+    serve(monkeypatch, lambda request: httpx.Response(200, headers={"content-type": "image/png"}, stream=httpx.ByteStream(BODY)))
+    assert run(download_image("http://storage/image.png")) == (BODY, "image/png")
+
+def test_compressed_download_is_checked_against_the_wire_size(run, monkeypatch):
+    compressed = gzip.compress(BODY)
+    headers = {"content-type": "image/png", "content-encoding": "gzip", "content-length": str(len(compressed))}
+    serve(monkeypatch, lambda request: httpx.Response(200, headers=headers, stream=httpx.ByteStream(compressed)))
+    # Content-Length is the gzip size; the body comes back decoded and larger
+    content, _ = run(download_image("http://storage/image.png"))
+    assert content == BODY
+    assert len(compressed) < len(BODY)
+
+def test_truncated_download_is_rejected(run, monkeypatch):
+    headers = {"content-type": "image/png", "content-length": str(len(BODY) + 10)}
+    serve(monkeypatch, lambda request: httpx.Response(200, headers=headers, stream=httpx.ByteStream(BODY)))
+    with pytest.raises(ValueError, match="does not match Content-Length"):
+        run(download_image("http://storage/image.png"))
+
+def test_download_limits(run, monkeypatch):
+    serve(monkeypatch, lambda request: httpx.Response(200, headers={"content-type": "text/html"}, content=b"<html>"))
+    with pytest.raises(InvalidInputError, match="does not point to an image"):
+        run(download_image("http://storage/page.html"))
+    headers = {"content-type": "image/png", "content-length": str(len(BODY))}
+    serve(monkeypatch, lambda request: httpx.Response(200, headers=headers, stream=httpx.ByteStream(BODY)))
+    with pytest.raises(InvalidInputError, match="too large"):
+        run(download_image("http://storage/image.png", max_bytes=1024))
+    # A compressed body can be small on the wire and still decode past the limit
+    headers = {"content-type": "image/png", "content-encoding": "gzip"}
+    serve(monkeypatch, lambda request: httpx.Response(200, headers=headers, stream=httpx.ByteStream(gzip.compress(bytes(1 << 20)))))
+    with pytest.raises(InvalidInputError, match="exceeds the download limit"):
+        run(download_image("http://storage/image.png", max_bytes=1024))
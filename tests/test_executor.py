@@ -0,0 +1,52 @@
+# tests/test_executor.py
+from concurrent.futures import Future
+import pytest
+import services.classification as classification
+import services.executor as executor
+from services.registry import ModelRegistry
+
+@pytest.fixture
+def process_mode(monkeypatch):
+    started = []
+    def fail(*args, **kwargs):
+        raise AssertionError("the parent must not load or run the model in process mode")
+    monkeypatch.setattr(classification, "inference_in_process", lambda: True)
+    monkeypatch.setattr(classification, "start_inference_processes", lambda: started.append(True))
+    monkeypatch.setattr(classification, "resolve_backend", lambda *args: ("keras", "model.keras"))
+    monkeypatch.setattr(classification, "load_backend", fail)
+    monkeypatch.setattr(classification, "warm_up", fail)
+    monkeypatch.setattr(classification, "_registry", ModelRegistry())
+    monkeypatch.setattr(classification, "_warmed_up", False)
+    return started
+
+def test_process_mode_loads_the_model_only_in_the_workers(process_mode):
+    assert classification.load_model_wrapper(warmup=True) is None
+    entry = classification._registry.primary
+    assert entry.in_process and entry.model is None
+    assert process_mode == [True]
+
+def test_process_mode_has_nothing_to_preload(process_mode):
+    assert classification.preload_model() is False
+    assert classification._registry.primary is None
+    assert process_mode == []
+
+def test_failed_worker_start_drops_the_pool(monkeypatch):
+    class BrokenPool:
+        shut_down = False
+
+        def submit(self, fn):
+            future = Future()
+            future.set_exception(RuntimeError("Model file not found"))
+            return future
+
+        def shutdown(self, wait=True, cancel_futures=False):
+            self.shut_down = True
+
+    pool = BrokenPool()
+    monkeypatch.setattr(executor, "_inference_executor", pool)
+    monkeypatch.setattr(executor, "start_executors", lambda: None)
+    with pytest.raises(RuntimeError, match="Model file not found"):
+        executor.start_inference_processes()
+    # The next load attempt starts a fresh pool instead of reusing the broken one
+    assert pool.shut_down
+    assert executor._inference_executor is None
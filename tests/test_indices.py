@@ -0,0 +1,79 @@
+# tests/test_indices.py
+import threading
+import numpy as np
+import pytest
+import model.indices
+from model.indices import vari, pseudo_ndvi, ndvi, to_model_channels, _scratch, _workspace
+
+@pytest.fixture
+def img():
+    return np.random.default_rng(0).integers(0, 256, size=(64, 48, 3), dtype=np.uint8)
+
+def reference_vari(img):
+    r, g, b = (img[..., i].astype(np.float64) for i in range(3))
+    denominator = r + g - b
+    denominator[denominator == 0] = 1e-10
+    return np.clip((g - r) / denominator, -1, 1)
+
+def test_kernels_match_the_float64_formulas_on_uint8_input(img):
+    # uint8 channels would wrap around if the kernels subtracted before casting
+    np.testing.assert_allclose(vari(img), reference_vari(img), rtol=1e-5, atol=1e-6)
+    r, g = img[..., 0].astype(np.float64), img[..., 1].astype(np.float64)
+    np.testing.assert_allclose(pseudo_ndvi(img), np.clip((g - r) / (g + r + 1e-8), -1, 1), rtol=1e-5, atol=1e-6)
+
+def test_bgr_order_reads_the_same_bands(img):
+    bgr = np.ascontiguousarray(img[..., ::-1])
+    np.testing.assert_array_equal(vari(bgr, channel_order="bgr"), vari(img))
+    np.testing.assert_array_equal(pseudo_ndvi(bgr, channel_order="bgr"), pseudo_ndvi(img))
+    with pytest.raises(ValueError, match="Unsupported channel order"):
+        vari(img, channel_order="hsv")
+
+def test_ndvi_is_zero_where_both_bands_are_zero():
+    nir = np.array([[0, 200], [100, 0]], dtype=np.uint16)
+    red = np.array([[0, 100], [100, 50]], dtype=np.uint16)
+    np.testing.assert_allclose(ndvi(nir, red), [[0, 1 / 3], [0, -1]], rtol=1e-6)
+
+def test_out_is_filled_in_place_and_checked(img):
+    out = np.empty(img.shape[:2], dtype=np.float32)
+    assert vari(img, out=out) is out
+    with pytest.raises(ValueError, match="out must be float32"):
+        vari(img, out=np.empty(img.shape[:2], dtype=np.float64))
+    with pytest.raises(ValueError, match="out must be float32"):
+        vari(img, out=np.empty((2, 2), dtype=np.float32))
+
+def test_scratch_is_reused_by_a_thread_and_not_shared_across_threads(img):
+    vari(img)
+    first = _workspace.buffers["denominator"]
+    pseudo_ndvi(img)
+    assert _workspace.buffers["denominator"] is first
+
+    others = []
+    def worker():
+        vari(img)
+        others.append(_workspace.buffers["denominator"])
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    assert others[0] is not first
+
+def test_scratch_follows_the_shape():
+    assert _scratch("test", (4, 4)) is _scratch("test", (4, 4))
+    assert _scratch("test", (8, 4)).shape == (8, 4)
+
+def test_oversized_scratch_is_not_kept(monkeypatch):
+    monkeypatch.setattr(model.indices, "SCRATCH_MAX_PIXELS", 100)
+    kept = _scratch("oversized", (10, 10))
+    assert _scratch("oversized", (10, 10)) is kept
+    big = _scratch("oversized", (20, 20))
+    assert big.shape == (20, 20)
+    # The thread keeps its small buffer rather than holding on to the big one
+    assert _workspace.buffers["oversized"] is kept
+    assert _scratch("oversized", (20, 20)) is not big
+
+def test_model_channels_is_a_read_only_view():
+    index = np.arange(6, dtype=np.float32).reshape(2, 3)
+    channels = to_model_channels(index)
+    assert channels.shape == (2, 3, 3)
+    assert np.shares_memory(channels, index)
+    assert not channels.flags.writeable
+    np.testing.assert_array_equal(channels[..., 2], index)
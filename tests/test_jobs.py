@@ -0,0 +1,218 @@
+# tests/test_jobs.py
+import asyncio
+import time
+import httpx
+import pytest
+from services.jobs import JobQueue, MemoryJobBackend, SQLiteJobBackend, QueueFullError
+from utils.errors import InvalidInputError
+
+def make_queue(backend, handler, **kwargs):
+    return JobQueue(backend, {"test": handler}, concurrency=1, retry_backoff=0.01, **kwargs)
+
+async def claim_and_run(queue):
+    job = await queue.backend.claim()
+    await queue._run(job)
+    return await queue.get(job["id"])
+
+def test_transient_failure_is_retried_then_succeeds(run):
+    calls = []
+    async def handler(job):
+        calls.append(job["attempts"])
+        if len(calls) < 2:
+            raise httpx.ConnectError("storage unreachable")
+        return {"ok": True}
+
+    async def scenario():
+        queue = make_queue(MemoryJobBackend(), handler, max_attempts=3)
+        job = await queue.submit("test", "user", {})
+        first = await claim_and_run(queue)
+        assert first["status"] == "queued"
+        assert first["error"] == "storage unreachable"
+        assert first["available_at"] > job["available_at"]
+        # Make the retry due now instead of waiting out the backoff
+        await queue.backend.put({**first, "available_at": time.time()})
+        return await claim_and_run(queue)
+
+    job = run(scenario())
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"ok": True}
+    assert job["attempts"] == 2
+    assert calls == [1, 2]
+
+def test_invalid_input_fails_without_retry(run):
+    async def handler(job):
+        raise InvalidInputError("Image not found")
+
+    async def scenario():
+        queue = make_queue(MemoryJobBackend(), handler, max_attempts=3)
+        await queue.submit("test", "user", {})
+        return await claim_and_run(queue), await queue.stats()
+
+    job, stats = run(scenario())
+    assert job["status"] == "failed"
+    assert job["attempts"] == 1
+    assert stats["failed"] == 1 and stats["retried"] == 0
+
+def test_plain_value_error_is_retried(run):
+    async def handler(job):
+        raise ValueError("Failed to store classification in database")
+
+    async def scenario():
+        queue = make_queue(MemoryJobBackend(), handler, max_attempts=2)
+        job = await queue.submit("test", "user", {})
+        await claim_and_run(queue)
+        retry = await queue.get(job["id"])
+        await queue.backend.put({**retry, "available_at": time.time()})
+        return await claim_and_run(queue)
+
+    job = run(scenario())
+    assert job["status"] == "failed"
+    assert job["attempts"] == 2
+    assert job["finished_at"] is not None
+
+def test_submit_refuses_jobs_past_max_pending(run):
+    async def handler(job):
+        return None
+
+    async def scenario():
+        queue = make_queue(MemoryJobBackend(), handler, max_pending=2)
+        await queue.submit("test", "user", {})
+        await queue.submit("test", "user", {})
+        with pytest.raises(QueueFullError):
+            await queue.submit("test", "user", {})
+        with pytest.raises(ValueError):
+            await queue.submit("unknown", "user", {})
+        return await queue.stats()
+
+    assert run(scenario())["rejected"] == 1
+
+def test_sqlite_open_leaves_other_workers_jobs_running(run, tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+
+    async def scenario():
+        first = SQLiteJobBackend(path, lease_seconds=60)
+        queue = make_queue(first, None)
+        job = await queue.submit("test", "user", {})
+        claimed = await first.claim()
+        # A second worker starting up must not hand the running job out again
+        second = SQLiteJobBackend(path, lease_seconds=60)
+        stolen = await second.claim()
+        counts = await second.counts()
+        await first.close()
+        await second.close()
+        return job, claimed, stolen, counts
+
+    job, claimed, stolen, counts = run(scenario())
+    assert claimed["id"] == job["id"] and claimed["attempts"] == 1
+    assert stolen is None
+    assert counts == {"running": 1}
+
+def test_sqlite_expired_lease_is_claimed_again(run, tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+
+    async def scenario():
+        first = SQLiteJobBackend(path, lease_seconds=0.2)
+        queue = make_queue(first, None)
+        await queue.submit("test", "user", {})
+        claimed = await first.claim()
+        second = SQLiteJobBackend(path, lease_seconds=0.2)
+        # Renewed leases keep the job with its worker
+        for _ in range(3):
+            time.sleep(0.1)
+            await first.renew(claimed)
+        while_renewed = await second.claim()
+        # The worker stops renewing (it died); once the lease runs out another one takes over
+        time.sleep(0.3)
+        reclaimed = await second.claim()
+        await first.close()
+        await second.close()
+        return claimed, while_renewed, reclaimed
+
+    claimed, while_renewed, reclaimed = run(scenario())
+    assert while_renewed is None
+    assert reclaimed["id"] == claimed["id"]
+    assert reclaimed["attempts"] == 2
+    assert reclaimed["lease_id"] != claimed["lease_id"]
+
+def test_job_reclaimed_after_its_final_attempt_fails(run, tmp_path):
+    calls = []
+    async def handler(job):
+        calls.append(job)
+
+    async def scenario():
+        backend = SQLiteJobBackend(str(tmp_path / "jobs.sqlite3"), lease_seconds=0.1)
+        queue = make_queue(backend, handler, max_attempts=1)
+        await queue.submit("test", "user", {})
+        await backend.claim()
+        time.sleep(0.2)
+        job = await claim_and_run(queue)
+        await backend.close()
+        return job
+
+    job = run(scenario())
+    assert job["status"] == "failed"
+    assert job["error"] == "Job was interrupted on its final attempt"
+    assert calls == []
+
+def test_sqlite_update_from_expired_lease_is_dropped(run, tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+
+    async def scenario():
+        first = SQLiteJobBackend(path, lease_seconds=0.1)
+        queue = make_queue(first, None)
+        await queue.submit("test", "user", {})
+        stale = await first.claim()
+        time.sleep(0.2)
+        second = SQLiteJobBackend(path, lease_seconds=60)
+        current = await second.claim()
+        # The first worker comes back late; its outcome must not overwrite the reclaimed job
+        await first.update({**stale, "status": "failed", "error": "too late", "finished_at": time.time()})
+        after_stale = await second.get(stale["id"])
+        await second.update({**current, "status": "succeeded", "result": {"ok": True}, "finished_at": time.time()})
+        after_current = await second.get(stale["id"])
+        await first.close()
+        await second.close()
+        return after_stale, after_current
+
+    after_stale, after_current = run(scenario())
+    assert after_stale["status"] == "running" and after_stale["attempts"] == 2
+    assert after_current["status"] == "succeeded"
+    assert after_current["result"] == {"ok": True}
+
+def test_worker_survives_backend_errors(run):
+    calls = []
+    async def handler(job):
+        calls.append(job["id"])
+        return None
+
+    class FlakyBackend(MemoryJobBackend):
+        failures = 0
+
+        async def update(self, job):
+            if not self.failures:
+                self.failures += 1
+                raise RuntimeError("database is locked")
+            await super().update(job)
+
+        async def prune(self, older_than):
+            raise RuntimeError("database is locked")
+
+    async def scenario():
+        queue = make_queue(FlakyBackend(), handler)
+        first = await queue.submit("test", "user", {})
+        worker = asyncio.create_task(queue._work())
+        # The first outcome is lost and prune keeps failing, but the worker keeps going
+        await asyncio.sleep(0.1)
+        second = await queue.submit("test", "user", {})
+        for _ in range(50):
+            if (await queue.get(second["id"]))["status"] == "succeeded":
+                break
+            await asyncio.sleep(0.1)
+        alive = not worker.done()
+        worker.cancel()
+        return first, second, alive, await queue.get(second["id"])
+
+    first, second, alive, job = run(scenario())
+    assert alive
+    assert calls == [first["id"], second["id"]]
+    assert job["status"] == "succeeded"
@@ -0,0 +1,234 @@
+# tests/test_logsink.py
+import asyncio
+import glob
+import json
+import os
+import pytest
+import services.log as log
+from services.logsink import LogSink
+
+class FakeLogsTable:
+    """Records inserted batches; fails while down is set."""
+    def __init__(self, delay=0.0):
+        self.batches = []
+        self.down = False
+        self.delay = delay
+
+    async def write(self, rows):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.down:
+            raise RuntimeError("database unavailable")
+        self.batches.append(list(rows))
+
+    @property
+    def rows(self):
+        return [row for batch in self.batches for row in batch]
+
+def entries(count, start=0):
+    return [{"action": "test", "details": {"i": i}} for i in range(start, start + count)]
+
+def spill_files(path):
+    return sorted(glob.glob(path + "*"))
+
+def test_flushes_full_batches_and_drains_on_stop(run):
+    table = FakeLogsTable()
+
+    async def scenario():
+        sink = LogSink(table.write, flush_size=10, flush_interval=60)
+        await sink.start()
+        for entry in entries(25):
+            await sink.put(entry)
+        await asyncio.sleep(0.05)
+        # Two full batches went out without waiting for the interval
+        full_batches = [len(batch) for batch in table.batches]
+        await sink.stop()
+        return sink, full_batches
+
+    sink, full_batches = run(scenario())
+    assert full_batches == [10, 10]
+    assert [len(batch) for batch in table.batches] == [10, 10, 5]
+    assert [row["details"]["i"] for row in table.rows] == list(range(25))
+    assert sink.stats()["written"] == 25 and not sink.running
+
+def test_flushes_partial_batch_after_interval(run):
+    table = FakeLogsTable()
+
+    async def scenario():
+        sink = LogSink(table.write, flush_size=100, flush_interval=0.05)
+        await sink.start()
+        for entry in entries(3):
+            await sink.put(entry)
+        await asyncio.sleep(0.2)
+        written_before_stop = len(table.rows)
+        await sink.stop()
+        return written_before_stop
+
+    assert run(scenario()) == 3
+    assert len(table.batches) == 1
+
+def test_drop_policy_discards_entries_when_full(run):
+    table = FakeLogsTable(delay=0.05)
+
+    async def scenario():
+        sink = LogSink(table.write, max_pending=5, flush_size=5, flush_interval=0, policy="drop")
+        await sink.start()
+        for entry in entries(50):
+            await sink.put(entry)
+        await sink.stop()
+        return sink.stats()
+
+    stats = run(scenario())
+    assert stats["dropped"] > 0
+    assert stats["written"] + stats["dropped"] == 50
+    assert len(table.rows) == stats["written"]
+
+def test_block_policy_applies_backpressure(run):
+    table = FakeLogsTable(delay=0.02)
+
+    async def scenario():
+        sink = LogSink(table.write, max_pending=5, flush_size=5, flush_interval=0, policy="block")
+        await sink.start()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for entry in entries(50):
+            await sink.put(entry)
+        waited = loop.time() - start
+        await sink.stop()
+        return sink.stats(), waited
+
+    stats, waited = run(scenario())
+    assert stats["written"] == 50 and stats["dropped"] == 0
+    # Callers waited for the writer instead of losing entries
+    assert waited >= 0.1
+
+def test_spill_policy_writes_overflow_to_file_and_replays_it(run, tmp_path):
+    spill = str(tmp_path / "spill.jsonl")
+    table = FakeLogsTable(delay=0.05)
+
+    async def scenario():
+        sink = LogSink(table.write, max_pending=5, flush_size=5, flush_interval=0, policy="spill", spill_path=spill)
+        await sink.start()
+        for entry in entries(30):
+            await sink.put(entry)
+        spilled = sink.stats()["spilled"]
+        await sink.stop()
+        return sink.stats(), spilled
+
+    stats, spilled = run(scenario())
+    assert spilled > 0
+    assert stats["replayed"] == spilled
+    assert sorted(row["details"]["i"] for row in table.rows) == list(range(30))
+    assert spill_files(spill) == []
+
+def test_failed_batch_is_spilled_and_replayed_after_recovery(run, tmp_path):
+    spill = str(tmp_path / "spill.jsonl")
+    table = FakeLogsTable()
+
+    async def scenario():
+        sink = LogSink(table.write, flush_size=5, flush_interval=0.01, retries=1, spill_path=spill)
+        await sink.start()
+        table.down = True
+        for entry in entries(5):
+            await sink.put(entry)
+        while sink.stats()["spilled"] < 5:
+            await asyncio.sleep(0.05)
+        with open(spill) as f:
+            on_disk = [json.loads(line) for line in f]
+        table.down = False
+        # The next successful flush replays the spill file
+        for entry in entries(1, start=5):
+            await sink.put(entry)
+        await sink.stop()
+        return sink.stats(), on_disk
+
+    stats, on_disk = run(scenario())
+    assert [entry["details"]["i"] for entry in on_disk] == list(range(5))
+    assert stats["failed_batches"] == 1 and stats["replayed"] == 5
+    assert sorted(row["details"]["i"] for row in table.rows) == list(range(6))
+    assert spill_files(spill) == []
+
+def test_failed_replay_keeps_unwritten_entries(run, tmp_path):
+    spill = str(tmp_path / "spill.jsonl")
+    with open(spill, "w") as f:
+        f.writelines(json.dumps(entry) + "\n" for entry in entries(7))
+    table = FakeLogsTable()
+    writes = []
+
+    async def fail_after_first_batch(rows):
+        writes.append(rows)
+        if len(writes) > 1:
+            raise RuntimeError("database unavailable")
+        await table.write(rows)
+
+    async def scenario():
+        sink = LogSink(fail_after_first_batch, flush_size=3, retries=0, spill_path=spill)
+        await sink._replay()
+        return sink
+
+    sink = run(scenario())
+    assert len(table.rows) == 3
+    (claimed,) = spill_files(spill)
+    with open(claimed) as f:
+        assert [json.loads(line)["details"]["i"] for line in f] == [3, 4, 5, 6]
+
+    # Back up: the claim is finished off and removed, with nothing written twice
+    sink._write_batch = table.write
+    run(sink._replay())
+    assert [row["details"]["i"] for row in table.rows] == list(range(7))
+    assert spill_files(spill) == []
+
+def test_claim_of_a_dead_worker_is_taken_over(run, tmp_path):
+    spill = str(tmp_path / "spill.jsonl")
+    # No process has this pid (above the kernel's pid_max)
+    orphan = f"{spill}.{2 ** 23}.0123abcd.replay"
+    with open(orphan, "w") as f:
+        f.writelines(json.dumps(entry) + "\n" for entry in entries(2))
+    table = FakeLogsTable()
+    run(LogSink(table.write, spill_path=spill)._replay())
+    assert len(table.rows) == 2
+    assert spill_files(spill) == []
+
+def test_claim_of_a_live_worker_is_left_alone(run, tmp_path):
+    spill = str(tmp_path / "spill.jsonl")
+    other = f"{spill}.{os.getppid()}.0123abcd.replay"
+    with open(other, "w") as f:
+        f.write(json.dumps(entries(1)[0]) + "\n")
+    table = FakeLogsTable()
+    run(LogSink(table.write, spill_path=spill)._replay())
+    assert table.rows == []
+    assert spill_files(spill) == [other]
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError, match="Unsupported log queue policy"):
+        LogSink(FakeLogsTable().write, policy="ignore")
+
+def test_put_requires_a_running_sink(run):
+    with pytest.raises(RuntimeError):
+        run(LogSink(FakeLogsTable().write).put(entries(1)[0]))
+
+def test_record_action_inserts_inline_without_a_sink(run, monkeypatch):
+    table = FakeLogsTable()
+    monkeypatch.setattr(log, "_insert_logs", table.write)
+    run(log.record_action("user", "image_upload", {"image_id": "x"}))
+    (row,) = table.rows
+    assert row["user_id"] == "user" and row["action"] == "image_upload" and row["details"] == {"image_id": "x"}
+    assert row["created_at"]
+
+    table.down = True
+    with pytest.raises(ValueError, match="Failed to record logs"):
+        run(log.record_action("user", "image_upload"))
+
+def test_record_actions_queue_while_the_sink_runs(run, monkeypatch):
+    table = FakeLogsTable()
+    monkeypatch.setattr(log, "_sink", LogSink(table.write, flush_size=10, flush_interval=60))
+
+    async def scenario():
+        await log.start_log_sink()
+        await log.record_actions([{"user_id": "user", "action": "classification", "details": {"i": i}} for i in range(3)])
+        queued = log.get_log_sink_stats()["pending"]
+        await log.stop_log_sink()
+        return queued
+
+    assert run(scenario()) == 3
+    assert [len(batch) for batch in table.batches] == [3]
@@ -0,0 +1,96 @@
+# tests/test_maptiles.py
+import threading
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+from model.maptiles import TileSource, TileSourcePool, tile_bounds, EMPTY_TILE, MERCATOR_ORIGIN
+
+def write_scene(path, georeferenced=True):
+    ndvi = np.linspace(-1, 1, 64 * 64, dtype=np.float32).reshape(64, 64)
+    profile = {"driver": "GTiff", "height": 64, "width": 64, "count": 1, "dtype": "float32", "nodata": np.nan}
+    if georeferenced:
+        # About 640 m square near Cairo
+        profile.update(transform=from_origin(31.2, 30.05, 0.0001, 0.0001), crs="EPSG:4326")
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(ndvi, 1)
+    return str(path)
+
+@pytest.fixture
+def scenes(tmp_path):
+    return [write_scene(tmp_path / f"scene{i}.tif") for i in range(3)]
+
+def test_tile_bounds_cover_the_world_at_zoom_zero():
+    assert tile_bounds(0, 0, 0) == (-MERCATOR_ORIGIN, -MERCATOR_ORIGIN, MERCATOR_ORIGIN, MERCATOR_ORIGIN)
+    left, bottom, right, top = tile_bounds(1, 1, 0)
+    assert (left, bottom, right, top) == (0, 0, MERCATOR_ORIGIN, MERCATOR_ORIGIN)
+
+def test_tiles_inside_and_outside_the_scene(scenes):
+    source = TileSource(scenes[0])
+    try:
+        z = source.max_zoom
+        west, south, east, north = source.lonlat_bounds
+        # The tile holding the scene's centre has data; one on the other side of the world doesn't
+        n = 2 ** z
+        x = int(((west + east) / 2 + 180) / 360 * n)
+        lat = np.radians((south + north) / 2)
+        y = int((1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / np.pi) / 2 * n)
+        assert source.render(z, x, y) != EMPTY_TILE
+        assert source.render(z, (x + n // 2) % n, y) == EMPTY_TILE
+        assert source.min_zoom <= source.max_zoom
+    finally:
+        source.close()
+
+def test_raster_without_a_crs_is_refused(tmp_path):
+    with pytest.raises(ValueError, match="not georeferenced"):
+        TileSource(write_scene(tmp_path / "plain.tif", georeferenced=False))
+
+def test_pool_reuses_open_sources_and_closes_the_least_recent(scenes):
+    pool = TileSourcePool(max_open=2)
+    with pool.lease("a", scenes[0]) as a:
+        pass
+    with pool.lease("a", scenes[0]) as again:
+        assert again is a
+    with pool.lease("b", scenes[1]):
+        pass
+    with pool.lease("a", scenes[0]):
+        pass
+    # "b" is now the least recently used
+    with pool.lease("c", scenes[2]) as c:
+        pass
+    assert len(pool) == 2
+    assert not a.src.closed and not c.src.closed
+    assert set(pool._sources) == {"a", "c"}
+
+def test_evicted_source_stays_open_until_its_lease_ends(scenes):
+    pool = TileSourcePool(max_open=1)
+    with pool.lease("a", scenes[0]) as a:
+        with pool.lease("b", scenes[1]) as b:
+            # "a" was evicted while this lease still reads from it
+            assert not a.src.closed
+            a.render(a.max_zoom, 0, 0)
+        assert not a.src.closed and not b.src.closed
+    assert a.src.closed
+    assert not b.src.closed
+    assert pool._evicted == set() and list(pool._leases) == [id(b)]
+
+def test_concurrent_leases_with_constant_eviction(scenes):
+    pool = TileSourcePool(max_open=1)
+    errors = []
+    def worker(offset):
+        for i in range(30):
+            key = (offset + i) % len(scenes)
+            try:
+                with pool.lease(key, scenes[key]) as source:
+                    source.render(source.min_zoom, 0, 0)
+            except Exception as e:
+                errors.append(e)
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    # Only the source still in the pool is open and nothing is left leased
+    assert len(pool) == 1 and pool._evicted == set()
+    assert list(pool._leases.values()) == [0]
@@ -0,0 +1,141 @@
+# tests/test_pagination.py
+import base64
+import json
+import uuid
+import pytest
+from fastapi import Response
+from postgrest import AsyncPostgrestClient
+from services.pagination import encode_cursor, decode_cursor, projection, keyset, page, iter_rows, ndjson_lines
+from config import EXPORT_PAGE_SIZE
+import routers.images
+import services.image
+
+ROW_ID = str(uuid.uuid4())
+CREATED_AT = "2026-03-01T12:30:00.123456+00:00"
+
+class FakeQuery:
+    """Stands in for a PostgREST query: serves rows in keyset order after the cursor."""
+    def __init__(self, rows):
+        self.rows = sorted(rows, key=lambda row: (row["created_at"], row["id"]), reverse=True)
+        self.after = None
+        self.limit_to = None
+
+    def select(self, columns):
+        return self
+
+    def eq(self, column, value):
+        return self
+
+    def order(self, column, desc=False):
+        return self
+
+    def or_(self, filters):
+        created_at = filters.split('"')[1]
+        row_id = filters.rsplit("id.lt.", 1)[1].rstrip(")")
+        self.after = (created_at, row_id)
+        return self
+
+    def limit(self, count):
+        self.limit_to = count
+        return self
+
+    async def execute(self):
+        rows = [row for row in self.rows if self.after is None or (row["created_at"], row["id"]) < self.after]
+        return type("Response", (), {"data": rows[:self.limit_to]})
+
+async def _query(rows):
+    return FakeQuery(rows)
+
+def make_rows(count, same_timestamp=False):
+    return [
+        {"id": str(uuid.UUID(int=i + 1)), "created_at": CREATED_AT if same_timestamp else f"2026-03-01T12:{i:02d}:00+00:00"}
+        for i in range(count)
+    ]
+
+def test_cursor_round_trip():
+    cursor = encode_cursor({"created_at": CREATED_AT, "id": ROW_ID})
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (CREATED_AT, ROW_ID)
+
+@pytest.mark.parametrize("cursor", [
+    "not-base64!",
+    base64.urlsafe_b64encode(b"{}").decode(),
+    base64.urlsafe_b64encode(json.dumps(["yesterday", ROW_ID]).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps([CREATED_AT, "1; drop table images"]).encode()).decode(),
+])
+def test_decode_cursor_rejects_tampered_cursors(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
+
+def test_projection_always_keeps_cursor_columns():
+    assert projection(None, ["id", "email"]) == "*"
+    assert projection("email, id", ["id", "email", "created_at"]) == "id,created_at,email"
+    with pytest.raises(ValueError, match="Unknown fields"):
+        projection("password", ["id", "email"])
+
+def test_page_sets_next_cursor_only_when_a_row_is_left():
+    rows = make_rows(3)
+    assert page(rows, 3)["next_cursor"] is None
+    result = page(rows, 2)
+    assert result["items"] == rows[:2]
+    assert decode_cursor(result["next_cursor"]) == (rows[1]["created_at"], rows[1]["id"])
+
+def test_keyset_filters_after_the_cursor():
+    query = AsyncPostgrestClient("http://127.0.0.1:9").from_("images").select("*")
+    params = keyset(query, encode_cursor({"created_at": CREATED_AT, "id": ROW_ID}), 10).params
+    assert params["order"] == "created_at.desc,id.desc"
+    assert params["limit"] == "11"
+    assert params["or"] == f'(created_at.lt."{CREATED_AT}",and(created_at.eq."{CREATED_AT}",id.lt.{ROW_ID}))'
+
+@pytest.mark.parametrize("same_timestamp", [False, True])
+def test_iter_rows_visits_every_row_once(run, same_timestamp):
+    rows = make_rows(7, same_timestamp)
+
+    async def collect():
+        return [row async for row in iter_rows(lambda: _query(rows), page_size=3)]
+
+    seen = run(collect())
+    assert sorted(row["id"] for row in seen) == sorted(row["id"] for row in rows)
+    assert len(seen) == len(rows)
+
+def test_ndjson_lines_ends_with_an_error_line_on_failure(run):
+    async def rows():
+        yield {"id": ROW_ID}
+        raise RuntimeError("connection reset")
+
+    async def collect():
+        return [line async for line in ndjson_lines(rows(), "images")]
+
+    lines = run(collect())
+    assert json.loads(lines[0]) == {"id": ROW_ID}
+    assert json.loads(lines[1]) == {"status": "error", "detail": "Failed to export images: connection reset"}
+
+class FakeSupabase:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def table(self, name):
+        return FakeQuery(self.rows)
+
+def test_image_listing_without_paging_parameters_returns_every_image(run, monkeypatch):
+    rows = make_rows(EXPORT_PAGE_SIZE + 5)
+    async def get_supabase():
+        return FakeSupabase([dict(row) for row in rows])
+    monkeypatch.setattr(services.image, "get_supabase", get_supabase)
+    user = type("User", (), {"id": ROW_ID})
+
+    async def scenario():
+        listing = routers.images.get_all_user_images
+        unpaged = Response()
+        everything = await listing(unpaged, limit=None, cursor=None, fields=None, created_after=None, created_before=None,
+                                   file_type=None, classification=None, with_classification=False, format="json", current_user=user)
+        paged = Response()
+        first_page = await listing(paged, limit=10, cursor=None, fields=None, created_after=None, created_before=None,
+                                   file_type=None, classification=None, with_classification=False, format="json", current_user=user)
+        return everything, unpaged, first_page, paged, await services.image.view_images(ROW_ID)
+
+    everything, unpaged, first_page, paged, viewed = run(scenario())
+    # Existing clients that never pass limit or cursor still get the whole listing
+    assert len(everything) == len(rows) and "x-next-cursor" not in unpaged.headers
+    assert len(viewed) == len(rows)
+    assert len(first_page) == 10 and "x-next-cursor" in paged.headers
@@ -0,0 +1,102 @@
+# tests/test_preview.py
+import cv2
+import numpy as np
+import pytest
+from rasterio.io import MemoryFile
+from rasterio.transform import from_origin
+import services.preview
+from model.preview import render_previews
+from services.cache import BytesCache
+from services.preview import preview_size, preview_key, get_preview
+from config import PREVIEW_SIZES
+
+IMAGE = {"id": "img-1", "user_id": "user-1", "image_url": "http://storage/images/user-1/field.png", "file_type": "rgb",
+         "metadata": {"content_sha256": "a" * 64}}
+
+def png(height, width):
+    pixels = np.random.default_rng(0).integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    return cv2.imencode(".png", pixels)[1].tobytes()
+
+def geotiff(height, width):
+    ndvi = np.linspace(-1, 1, height * width, dtype=np.float32).reshape(height, width)
+    profile = {"driver": "GTiff", "height": height, "width": width, "count": 1, "dtype": "float32",
+               "transform": from_origin(0, 0, 10, 10), "crs": "EPSG:32636"}
+    with MemoryFile() as memfile:
+        with memfile.open(**profile) as dst:
+            dst.write(ndvi, 1)
+        return memfile.read()
+
+def decoded_shape(encoded):
+    return cv2.imdecode(np.frombuffer(encoded, dtype=np.uint8), cv2.IMREAD_UNCHANGED).shape
+
+def test_requested_sizes_snap_to_configured_ones():
+    assert preview_size(None) == PREVIEW_SIZES[len(PREVIEW_SIZES) // 2]
+    assert preview_size(1) == PREVIEW_SIZES[0]
+    assert preview_size(PREVIEW_SIZES[0] + 1) == PREVIEW_SIZES[1]
+    assert preview_size(10 ** 6) == PREVIEW_SIZES[-1]
+
+def test_preview_key_follows_content_size_and_format():
+    key = preview_key(IMAGE, 256, "png")
+    assert key == preview_key({**IMAGE, "image_url": "http://storage/moved.png"}, 256, "png")
+    assert key != preview_key({**IMAGE, "metadata": {"content_sha256": "b" * 64}}, 256, "png")
+    assert key != preview_key(IMAGE, 512, "png")
+    assert key != preview_key(IMAGE, 256, "webp")
+
+def test_rgb_previews_keep_the_aspect_ratio():
+    rendered = render_previews(png(300, 600), "rgb", [64, 256, 1024], "png")
+    assert decoded_shape(rendered[64]) == (32, 64, 3)
+    assert decoded_shape(rendered[256]) == (128, 256, 3)
+    # Never upscaled
+    assert decoded_shape(rendered[1024]) == (300, 600, 3)
+
+def test_ndvi_previews_are_colour_mapped_rgba():
+    rendered = render_previews(geotiff(100, 200), "ndvi", [50], "png")
+    assert decoded_shape(rendered[50]) == (25, 50, 4)
+
+def test_undecodable_image_is_refused():
+    with pytest.raises(ValueError, match="Unsupported file format"):
+        render_previews(b"not an image", "rgb", [64])
+
+@pytest.fixture
+def storage(monkeypatch):
+    stored, fetched = {}, []
+    async def fetch_stored(path):
+        fetched.append(path)
+        return stored.get(path)
+    async def store(path, content, fmt):
+        stored[path] = content
+    async def download_image(url):
+        return png(300, 600), "image/png"
+    monkeypatch.setattr(services.preview, "_fetch_stored", fetch_stored)
+    monkeypatch.setattr(services.preview, "_store", store)
+    monkeypatch.setattr(services.preview, "download_image", download_image)
+    monkeypatch.setattr(services.preview, "_preview_cache", BytesCache(16, 60))
+    return stored, fetched
+
+def test_preview_is_rendered_once_then_served_from_cache_or_storage(run, storage):
+    stored, fetched = storage
+
+    async def scenario():
+        etag, first = await get_preview(IMAGE, 256, "png")
+        _, cached = await get_preview(IMAGE, 256, "png")
+        services.preview._preview_cache.clear()
+        _, from_storage = await get_preview(IMAGE, 256, "png")
+        return etag, first, cached, from_storage
+
+    etag, first, cached, from_storage = run(scenario())
+    assert decoded_shape(first) == (128, 256, 3)
+    assert cached == first and from_storage == first
+    assert list(stored) == [services.preview.preview_path(IMAGE, 256, "png")]
+    # Storage is asked on the first miss and after the cache was cleared, not on the cache hit
+    assert len(fetched) == 2
+    assert etag == f'"{preview_key(IMAGE, 256, "png")[:32]}"'
+
+def test_matching_etag_skips_the_body(run, storage):
+    stored, fetched = storage
+    etag = f'"{preview_key(IMAGE, 512, "webp")[:32]}"'
+    assert run(get_preview(IMAGE, 512, "webp", if_none_match=f'"other", {etag}')) == (etag, None)
+    assert fetched == [] and stored == {}
+
+def test_unknown_format_is_refused(run, storage):
+    with pytest.raises(ValueError, match="Unsupported preview format"):
+        run(get_preview(IMAGE, 256, "gif"))
@@ -0,0 +1,131 @@
+# tests/test_registry.py
+import asyncio
+import time
+import numpy as np
+import pytest
+import services.executor
+from services.registry import ModelEntry, ModelRegistry
+
+CLASS_NAMES = ["Non-Plant", "Unhealthy", "Moderate", "Healthy"]
+
+class FixedModel:
+    """Predicts the same class for every sample, optionally slowly."""
+    def __init__(self, class_idx, delay=0.0):
+        self.class_idx = class_idx
+        self.delay = delay
+
+    def predict_on_batch(self, batch):
+        if self.delay:
+            time.sleep(self.delay)
+        probs = np.full((len(batch), len(CLASS_NAMES)), 0.1, dtype=np.float32)
+        probs[:, self.class_idx] = 0.7
+        return probs
+
+@pytest.fixture(autouse=True)
+def executors():
+    yield
+    services.executor.shutdown_executors()
+
+def entry(version, class_idx=3, class_names=CLASS_NAMES, delay=0.0):
+    return ModelEntry(version, FixedModel(class_idx, delay), class_names, "keras", f"{version}.keras")
+
+def sample():
+    return np.zeros((8, 8, 3), dtype=np.float32)
+
+def test_first_version_is_primary_and_versions_are_unique():
+    registry = ModelRegistry()
+    registry.add(entry("v1"))
+    registry.add(entry("v2"))
+    assert registry.primary.version == "v1"
+    assert registry.route("any-image").version == "v1"
+    with pytest.raises(ValueError, match="already loaded"):
+        registry.add(entry("v1"))
+
+def test_canary_takes_its_fraction_and_is_sticky_per_key():
+    registry = ModelRegistry()
+    registry.add(entry("v1"))
+    registry.add(entry("v2"))
+    registry.set_routing(canary="v2", canary_fraction=0.25)
+    keys = [f"image-{i}" for i in range(2000)]
+    routed = {key: registry.route(key).version for key in keys}
+    share = sum(version == "v2" for version in routed.values()) / len(keys)
+    assert 0.2 < share < 0.3
+    assert all(registry.route(key).version == version for key, version in routed.items())
+
+def test_routing_is_validated():
+    registry = ModelRegistry()
+    registry.add(entry("v1"))
+    with pytest.raises(KeyError):
+        registry.set_routing(canary="v9", canary_fraction=0.5)
+    registry.add(entry("v2"))
+    with pytest.raises(ValueError, match="canary_fraction"):
+        registry.set_routing(canary="v2", canary_fraction=1.5)
+    assert registry.set_routing(canary=None, canary_fraction=0.5)["canary_fraction"] == 0.0
+
+def test_activate_promotes_the_canary():
+    registry = ModelRegistry()
+    registry.add(entry("v1"))
+    registry.add(entry("v2"))
+    registry.set_routing(canary="v2", canary_fraction=0.1, shadow="v2")
+    routing = registry.activate("v2")
+    assert routing["primary"] == "v2"
+    assert routing["canary"] is None and routing["shadow"] is None
+
+def test_shadow_counts_agreement_by_label(run):
+    # v2 orders its classes differently but says "Healthy" too; v3 says "Unhealthy"
+    registry = ModelRegistry()
+    primary = registry.add(entry("v1", class_idx=3))
+    registry.add(entry("v2", class_idx=0, class_names=list(reversed(CLASS_NAMES))))
+    registry.add(entry("v3", class_idx=1))
+
+    async def scenario(shadow):
+        registry.set_routing(shadow=shadow)
+        result = await registry.predict(primary, sample())
+        await asyncio.gather(*registry._shadow_tasks)
+        return result, registry.stats()["shadow"]
+
+    result, shadow = run(scenario("v2"))
+    assert result == (3, pytest.approx(0.7))
+    assert shadow["agreed"] == 1 and shadow["disagreed"] == 0
+    # Switching the shadow starts the comparison over
+    _, shadow = run(scenario("v3"))
+    assert shadow["agreed"] == 0 and shadow["disagreed"] == 1
+
+def test_shadow_runs_are_dropped_when_too_many_are_pending(run):
+    registry = ModelRegistry(shadow_max_pending=1)
+    primary = registry.add(entry("v1"))
+    registry.add(entry("v2", delay=0.2))
+    registry.set_routing(shadow="v2")
+
+    async def scenario():
+        await registry.predict(primary, sample())
+        await registry.predict(primary, sample())
+        await asyncio.gather(*registry._shadow_tasks)
+        return registry.stats()["shadow"]
+
+    shadow = run(scenario())
+    assert shadow["agreed"] == 1 and shadow["dropped"] == 1
+
+def test_remove_refuses_a_routed_version(run):
+    registry = ModelRegistry()
+    registry.add(entry("v1"))
+    with pytest.raises(ValueError, match="still routed"):
+        run(registry.remove("v1"))
+
+def test_remove_drains_in_flight_requests(run):
+    registry = ModelRegistry()
+    registry.add(entry("v1"))
+    old = registry.add(entry("v2", class_idx=2, delay=0.2))
+    registry.enable_batching(max_batch_size=4, max_wait_ms=5)
+
+    async def scenario():
+        request = asyncio.create_task(registry.predict(old, sample()))
+        await asyncio.sleep(0.05)
+        await registry.remove("v2", drain_timeout=5)
+        # The request finished on the removed version before its scheduler stopped
+        return request.done(), await request
+
+    done, result = run(scenario())
+    assert done
+    assert result[0] == 2
+    assert "v2" not in registry and old.scheduler is None
@@ -0,0 +1,82 @@
+# tests/test_tiling.py
+import numpy as np
+import pytest
+import rasterio
+from rasterio.io import MemoryFile
+from rasterio.transform import from_origin
+from model.tiling import SceneTiler, write_class_map, CLASS_MAP_NODATA
+
+TRANSFORM = from_origin(500000, 4000000, 10, 10)
+
+def write_scene(path, ndvi):
+    profile = {"driver": "GTiff", "height": ndvi.shape[0], "width": ndvi.shape[1], "count": 1, "dtype": "float32",
+               "nodata": np.nan, "transform": TRANSFORM, "crs": "EPSG:32636"}
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(ndvi.astype(np.float32), 1)
+    return str(path)
+
+def scene(height, width):
+    return np.linspace(-1, 1, height * width, dtype=np.float32).reshape(height, width)
+
+def collect(tiler):
+    positions, batches = [], []
+    while (batch := tiler.next_batch()) is not None:
+        positions += batch[0]
+        batches.append(len(batch[1]))
+    return positions, batches
+
+def test_grid_covers_a_scene_that_is_not_a_multiple_of_the_tile(tmp_path):
+    path = write_scene(tmp_path / "scene.tif", scene(130, 70))
+    with SceneTiler(path, tile_size=50, batch_size=4, input_size=32) as tiler:
+        assert (tiler.rows, tiler.cols) == (3, 2)
+        positions, batches = collect(tiler)
+    assert positions == [(row, col) for row in range(3) for col in range(2)]
+    assert batches == [4, 2]
+
+def test_edge_tile_is_padded_with_nan(tmp_path):
+    path = write_scene(tmp_path / "scene.tif", scene(130, 70))
+    with SceneTiler(path, tile_size=50, input_size=32) as tiler:
+        corner = tiler.read_tile(2, 1)
+    assert corner.shape == (50, 50)
+    # Rows 100-129 and columns 50-69 are inside the raster, the rest is padding
+    assert not np.isnan(corner[:30, :20]).any()
+    assert np.isnan(corner[30:, :]).all() and np.isnan(corner[:, 20:]).all()
+
+def test_overlapping_stride_adds_tiles(tmp_path):
+    path = write_scene(tmp_path / "scene.tif", scene(100, 100))
+    with SceneTiler(path, tile_size=50, stride=25, input_size=32) as tiler:
+        assert (tiler.rows, tiler.cols) == (4, 4)
+        positions, _ = collect(tiler)
+    assert len(positions) == 16
+
+def test_nodata_tiles_are_skipped(tmp_path):
+    ndvi = scene(100, 100)
+    ndvi[:50, 50:] = np.nan
+    path = write_scene(tmp_path / "scene.tif", ndvi)
+    with SceneTiler(path, tile_size=50, input_size=32) as tiler:
+        positions, _ = collect(tiler)
+    assert positions == [(0, 0), (1, 0), (1, 1)]
+
+def test_batches_are_model_ready(tmp_path):
+    path = write_scene(tmp_path / "scene.tif", scene(60, 60))
+    with SceneTiler(path, tile_size=50, input_size=32) as tiler:
+        _, batch = tiler.next_batch()
+    assert batch.shape == (4, 32, 32, 3)
+    assert not np.isnan(batch).any()
+
+def test_too_many_tiles_is_refused(tmp_path):
+    path = write_scene(tmp_path / "scene.tif", scene(100, 100))
+    with pytest.raises(ValueError, match="needs 16 tiles, limit is 10"):
+        SceneTiler(path, tile_size=25, max_tiles=10)
+
+def test_class_map_is_georeferenced_per_tile(tmp_path):
+    path = write_scene(tmp_path / "scene.tif", scene(130, 70))
+    with SceneTiler(path, tile_size=50, input_size=32) as tiler:
+        transform, crs = tiler.class_map_transform(), tiler.src.crs
+    grid = np.array([[0, 1], [2, 3], [CLASS_MAP_NODATA, 1]])
+    with MemoryFile(write_class_map(grid, transform, crs)) as memfile, memfile.open() as src:
+        assert src.read(1).tolist() == grid.tolist()
+        assert src.nodata == CLASS_MAP_NODATA
+        # One class map pixel spans a 50-pixel stride of the 10 m scene
+        assert src.transform.a == 500 and src.transform.e == -500
+        assert (src.transform.c, src.transform.f) == (TRANSFORM.c, TRANSFORM.f)
@@ -0,0 +1,115 @@
+# tests/test_upload.py
+import hashlib
+import httpx
+import pytest
+import services.upload
+from services.upload import stream_to_storage, UploadTooLargeError
+
+TIFF = b"II*\x00" + bytes(range(256)) * 40  # 10244 bytes
+
+class FakeTus:
+    """
+    Stands in for Storage's resumable endpoint. fail(n, keep) makes the n-th PATCH
+    store only `keep` bytes of its body and then drop the connection.
+    """
+    def __init__(self):
+        self.stored = bytearray()
+        self.length = None
+        self.created = 0
+        self.deleted = 0
+        self.patches = []
+        self.failures = {}
+
+    def fail(self, patch_number, keep):
+        self.failures[patch_number] = keep
+
+    async def __call__(self, request):
+        if request.method == "POST":
+            self.created += 1
+            self.length = request.headers.get("Upload-Length")
+            return httpx.Response(201, headers={"Location": "/storage/v1/upload/resumable/abc"})
+        if request.method == "HEAD":
+            return httpx.Response(200, headers={"Upload-Offset": str(len(self.stored))})
+        if request.method == "DELETE":
+            self.deleted += 1
+            return httpx.Response(204)
+        body = await request.aread()
+        offset = int(request.headers["Upload-Offset"])
+        self.patches.append((offset, len(body)))
+        if offset != len(self.stored):
+            return httpx.Response(409)
+        if "Upload-Length" in request.headers:
+            self.length = request.headers["Upload-Length"]
+        keep = self.failures.pop(len(self.patches), None)
+        if keep is not None:
+            self.stored += body[:keep]
+            raise httpx.ReadError("connection reset by peer")
+        self.stored += body
+        return httpx.Response(204, headers={"Upload-Offset": str(len(self.stored))})
+
+@pytest.fixture
+def tus(monkeypatch):
+    server = FakeTus()
+    async def get_http_client():
+        return httpx.AsyncClient(transport=httpx.MockTransport(server))
+    monkeypatch.setattr(services.upload, "get_http_client", get_http_client)
+    monkeypatch.setattr(services.upload, "UPLOAD_CHUNK_SIZE", 4096)
+    monkeypatch.setattr(services.upload, "UPLOAD_RETRIES", 2)
+    return server
+
+async def pieces(data, size=1000):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+def upload(run, data=TIFF, content_type="image/tiff", **kwargs):
+    return run(stream_to_storage(pieces(data), "images", "user/scene.tif", content_type, **kwargs))
+
+def test_stream_is_sent_in_chunks_with_a_deferred_length(run, tus):
+    result = upload(run)
+    assert bytes(tus.stored) == TIFF
+    assert tus.patches == [(0, 4096), (4096, 4096), (8192, 2052)]
+    # The length isn't known up front, so the last PATCH declares it
+    assert tus.length == str(len(TIFF))
+    assert result == {"content_sha256": hashlib.sha256(TIFF).hexdigest(), "size_bytes": len(TIFF), "content_type": "image/tiff"}
+
+def test_failed_chunk_resumes_from_the_server_offset(run, tus):
+    tus.fail(2, keep=1000)
+    upload(run, length=len(TIFF))
+    assert bytes(tus.stored) == TIFF
+    # Only the 3096 bytes the server didn't store are sent again
+    assert tus.patches == [(0, 4096), (4096, 4096), (5096, 3096), (8192, 2052)]
+    assert tus.length == str(len(TIFF))
+
+def test_failed_chunk_with_nothing_stored_is_resent(run, tus):
+    tus.fail(1, keep=0)
+    upload(run)
+    assert bytes(tus.stored) == TIFF
+    assert tus.patches[:2] == [(0, 4096), (0, 4096)]
+
+def test_upload_gives_up_after_its_retries_and_terminates(run, tus):
+    for patch_number in (1, 2, 3):
+        tus.fail(patch_number, keep=10)
+    with pytest.raises(ValueError, match="after 3 attempts"):
+        upload(run)
+    assert tus.patches == [(0, 4096), (10, 4086), (20, 4076)]
+    assert tus.deleted == 1
+
+def test_mismatched_content_type_is_refused_before_anything_is_stored(run, tus):
+    with pytest.raises(ValueError, match="File content is image/tiff but was uploaded as image/png"):
+        upload(run, content_type="image/png")
+    with pytest.raises(ValueError, match="Unrecognized file format"):
+        upload(run, data=b"<html>" * 2000)
+    assert tus.created == 0 and tus.patches == []
+
+def test_oversized_stream_is_aborted(run, tus):
+    with pytest.raises(UploadTooLargeError, match="exceeds the limit of 6000 bytes"):
+        upload(run, max_bytes=6000)
+    assert tus.created == 1 and tus.deleted == 1
+    with pytest.raises(UploadTooLargeError, match="too large"):
+        upload(run, length=len(TIFF), max_bytes=6000)
+    assert tus.created == 1
+
+def test_short_body_is_rejected(run, tus):
+    with pytest.raises(ValueError, match="Content-Length was"):
+        upload(run, length=len(TIFF) + 1)
+    assert tus.deleted == 1
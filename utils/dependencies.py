@@ -1,29 +1,40 @@
 # dependencies.py
 from fastapi import HTTPException,Depends,status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from typing import Optional
 from uuid import UUID
 from models import UserResponse
-from database.supabase import get_supabase
+from services.auth import verify_access_token, get_user_profile
+from config import JWT_SECRET
 
+bearer = HTTPBearer(auto_error=False)
 
-async def get_current_user(user_id: str = None) -> UserResponse:
+async def get_current_user(user_id: str = None, credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer)) -> UserResponse:
+    # With JWT_SECRET set, a bearer token is verified locally and names the user; no Auth or DB round trip
+    if credentials is not None and JWT_SECRET:
+        try:
+            claims = verify_access_token(credentials.credentials)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e))
+        if user_id and user_id != claims["sub"]:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token does not belong to this user")
+        user_id = claims["sub"]
     if not user_id:
         raise HTTPException(status_code=401, detail="User ID not provided")
-    supabase = await get_supabase()
     try:
-        user_response = await supabase.table("users").select("*").eq("auth_user_id", user_id).execute()
-        if not user_response.data:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-        user_data = user_response.data[0]
-        return UserResponse(
-            id=user_data["id"],
-            auth_user_id=user_data["auth_user_id"],
-            email=user_data["email"],
-            created_at=user_data["created_at"],
-            is_admin=user_data.get("is_admin", False)
-        )
-        # return {"user_id": str(UUID(user_id))}
+        UUID(user_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid user_id format")
+    user_data = await get_user_profile(user_id)
+    if user_data is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return UserResponse(
+        id=user_data["id"],
+        auth_user_id=user_data["auth_user_id"],
+        email=user_data["email"],
+        created_at=user_data["created_at"],
+        is_admin=user_data.get("is_admin", False)
+    )
     
 async def get_current_admin_user(current_user: UserResponse = Depends(get_current_user)) -> UserResponse:
     """
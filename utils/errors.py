@@ -0,0 +1,8 @@
+# utils/errors.py
+
+class InvalidInputError(ValueError):
+    """
+    Bad input that won't fix itself: a missing or foreign image, a file that can't
+    be decoded. Jobs raising it fail at once; anything else is retried. A ValueError,
+    so routers still answer it with a 4xx.
+    """
@@ -0,0 +1,32 @@
+# utils/http.py
+import asyncio
+import httpx
+from typing import Optional
+from config import HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE, HTTP_TIMEOUT
+
+# Pooled client for fetching stored objects (e.g. image downloads for classification)
+_client: Optional[httpx.AsyncClient] = None
+_client_lock = asyncio.Lock()
+
+async def init_http_client() -> httpx.AsyncClient:
+    global _client
+    async with _client_lock:
+        if _client is None:
+            _client = httpx.AsyncClient(
+                timeout=HTTP_TIMEOUT,
+                limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE),
+                follow_redirects=True,
+            )
+    return _client
+
+async def close_http_client() -> None:
+    global _client
+    async with _client_lock:
+        if _client is not None:
+            await _client.aclose()
+            _client = None
+
+async def get_http_client() -> httpx.AsyncClient:
+    if _client is None:
+        return await init_http_client()
+    return _client
@@ -0,0 +1,37 @@
+# utils/process.py
+import os
+import resource
+from typing import Dict, Optional
+
+def _smaps_rollup(pid) -> Optional[Dict[str, int]]:
+    """Parse /proc/<pid>/smaps_rollup into byte counts (Linux 4.14+)."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.readlines()[1:]
+    except OSError:
+        return None
+    values = {}
+    for line in lines:
+        key, value = line.split(":", 1)
+        values[key] = int(value.split()[0]) * 1024
+    return values
+
+def memory_usage(pid="self") -> Dict:
+    """
+    Memory of one worker process. rss counts shared pages in full for every worker;
+    pss splits them between the processes sharing them, so summing pss over all
+    workers gives the real footprint.
+    """
+    usage = {"pid": os.getpid() if pid == "self" else pid}
+    rollup = _smaps_rollup(pid)
+    if rollup is not None:
+        usage.update(
+            rss_bytes=rollup.get("Rss"),
+            pss_bytes=rollup.get("Pss"),
+            shared_bytes=rollup.get("Shared_Clean", 0) + rollup.get("Shared_Dirty", 0),
+            private_bytes=rollup.get("Private_Clean", 0) + rollup.get("Private_Dirty", 0),
+        )
+    if pid == "self":
+        # ru_maxrss is in KiB on Linux
+        usage["peak_rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return usage